@@ -1,6 +1,11 @@
 from django.contrib import admin
 
-from data_collector.models import MemoryMap
+from data_collector.models import (
+    CollectionReport,
+    CollectorInstance,
+    CollectorLease,
+    MemoryMap,
+)
 
 
 @admin.register(MemoryMap)
@@ -14,3 +19,20 @@ class MemoryMapAdmin(admin.ModelAdmin):
         "created_at",
         "updated_at",
     ]
+
+
+@admin.register(CollectorInstance)
+class CollectorInstanceAdmin(admin.ModelAdmin):
+    list_display = ["id", "name", "started_at", "heartbeat_at"]
+
+
+@admin.register(CollectorLease)
+class CollectorLeaseAdmin(admin.ModelAdmin):
+    list_display = ["id", "transductor", "data_group", "instance", "slot", "claimed_at"]
+    list_filter = ["data_group", "instance"]
+
+
+@admin.register(CollectionReport)
+class CollectionReportAdmin(admin.ModelAdmin):
+    list_display = ["id", "instance", "slot", "started_at", "finished_at", "concurrency", "missed"]
+    list_filter = ["instance"]
@@ -0,0 +1,80 @@
+import multiprocessing
+
+from django.conf import settings
+
+from data_collector.models import CollectionReport
+
+# Workers added after a cycle that went well (additive increase)
+INCREASE_STEP = 2
+# Share of the workers kept after a cycle with more failures than the one before (multiplicative decrease)
+DECREASE_FACTOR = 0.5
+# Failed share of the due collections, above that of the previous cycle, taken as device timeouts
+ERROR_RATE_TOLERANCE = 0.05
+# Failed share of the due collections taken as device timeouts whatever the previous cycle
+# (meters offline for good fail in every cycle and should stay below it)
+ERROR_RATE_LIMIT = 0.25
+# Slowdown of the time per session, against the previous cycle, taken as a sign of too many workers
+SLOWDOWN_TOLERANCE = 0.1
+# Cycles kept at the level stepped back to after a slowdown before trying a higher one again
+HOLD_CYCLES = 10
+
+
+def clamp_concurrency(concurrency: int) -> int:
+    return max(settings.COLLECTOR_CONCURRENCY_MIN, min(settings.COLLECTOR_CONCURRENCY_MAX, int(concurrency)))
+
+
+def initial_concurrency() -> int:
+    return clamp_concurrency(multiprocessing.cpu_count() * 4)
+
+
+def recent_reports(name: str = None, count: int = HOLD_CYCLES + 2) -> list[CollectionReport]:
+    """The latest finished reports of the collector instance with a concurrency, newest first."""
+    reports = CollectionReport.objects.filter(
+        instance=name or settings.COLLECTOR_INSTANCE, finished_at__isnull=False, concurrency__isnull=False
+    )
+    return list(reports.order_by("-started_at")[:count])
+
+
+def slowed_down(report: CollectionReport, before: CollectionReport) -> bool:
+    """Whether the run of `report` raised the concurrency of `before` and made the sessions slower."""
+    return (
+        report.concurrency > before.concurrency
+        and report.session_time is not None
+        and before.session_time is not None
+        and report.session_time > before.session_time * (1 + SLOWDOWN_TOLERANCE)
+    )
+
+
+def next_concurrency(reports: list[CollectionReport]) -> int:
+    """
+    Gateway lanes polled at a time in the next cycle, from the latest reports (AIMD):
+    halved when the failures rose or stay above ERROR_RATE_LIMIT, as the devices or gateways
+    time out, back to the previous level when the last increase made the sessions slower
+    (e.g. the database is the bottleneck) and held there for HOLD_CYCLES, otherwise raised
+    by INCREASE_STEP. Bounded by COLLECTOR_CONCURRENCY_MIN/MAX.
+    """
+    if not reports:
+        return initial_concurrency()
+
+    last = reports[0]
+    if len(reports) < 2:
+        return clamp_concurrency(last.concurrency + INCREASE_STEP)
+
+    previous = reports[1]
+    if last.error_rate > ERROR_RATE_LIMIT or last.error_rate > previous.error_rate + ERROR_RATE_TOLERANCE:
+        return clamp_concurrency(last.concurrency * DECREASE_FACTOR)
+
+    if slowed_down(last, previous):
+        return clamp_concurrency(previous.concurrency)
+
+    for report, before in zip(reports[1:], reports[2 : HOLD_CYCLES + 2]):
+        if slowed_down(report, before) and last.concurrency == before.concurrency:
+            return clamp_concurrency(last.concurrency)
+
+    return clamp_concurrency(last.concurrency + INCREASE_STEP)
+
+
+def current_concurrency(name: str = None) -> int:
+    """The level chosen by the last cycle of the collector instance, for collectors that do not tune it."""
+    reports = recent_reports(name, count=1)
+    return clamp_concurrency(reports[0].concurrency) if reports else initial_concurrency()
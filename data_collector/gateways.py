@@ -0,0 +1,43 @@
+from collections import defaultdict
+from itertools import zip_longest
+
+from data_collector.modbus.data_reader import create_reader
+
+
+def gateway_endpoint(transductor) -> tuple:
+    """Modbus TCP endpoint of a transductor (or a collection job): its gateway when it sits on a bus."""
+    return transductor.ip_address, int(transductor.port)
+
+
+def gateway_lanes(transductors, concurrency: int = 1) -> list[list]:
+    """
+    Splits the transductors into lanes read one after the other, through one connection, so that
+    at most `concurrency` requests are on the wire of a gateway at a time (Modbus TCP to RTU
+    gateways serve a single request). The transductors of a gateway are dealt round-robin to its
+    lanes, and the lanes are interleaved across gateways so a large bus does not delay the others.
+    """
+    gateways = defaultdict(list)
+    for transductor in transductors:
+        gateways[gateway_endpoint(transductor)].append(transductor)
+
+    concurrency = max(concurrency, 1)
+    lanes_per_gateway = [
+        [members[index::concurrency] for index in range(min(concurrency, len(members)))]
+        for members in gateways.values()
+    ]
+    return [lane for lanes in zip_longest(*lanes_per_gateway) for lane in lanes if lane is not None]
+
+
+def collect_lane(transductors, data_group: str) -> list[dict]:
+    """
+    `Transductor.collect_data` of each transductor of a lane, sharing one connection to the gateway,
+    pipelined when every transductor of the lane supports it.
+    """
+    ip_address, port = gateway_endpoint(transductors[0])
+    reader = create_reader(
+        ip_address, port, pipeline_depth=min(transductor.pipeline_depth for transductor in transductors)
+    )
+    try:
+        return [transductor.collect_data(data_group, reader=reader) for transductor in transductors]
+    finally:
+        reader.close()
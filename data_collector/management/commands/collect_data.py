@@ -1,19 +1,22 @@
 import logging
-import multiprocessing
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from django.conf import settings
 from django.core.management import BaseCommand
 from django.core.management.base import CommandError, CommandParser
 
+from data_collector.autotune import current_concurrency
+from data_collector.gateways import collect_lane, gateway_endpoint, gateway_lanes
 from data_collector.modbus.helpers import get_now
 from data_collector.modbus.settings import (
-    CONFIG_TRANSDUCTOR,
     DATA_GROUP_MINUTELY,
     DATA_GROUP_MONTHLY,
     DATA_GROUP_QUARTERLY,
     DATA_GROUPS,
 )
+from data_collector.sharding import assigned_transductors
+from data_collector.workers import CollectionJob, collect_in_processes
 from measurement.serializers import (
     MinutelyMeasurementSerializer,
     MonthlyMeasurementSerializer,
@@ -34,6 +37,12 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser: CommandParser) -> None:
         parser.add_argument("data_group", type=str)
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=None,
+            help="Worker processes polling the transductors (0 collects with threads)",
+        )
 
     def handle(self, data_group, *args, **options):
         start_time = time.perf_counter()
@@ -45,53 +54,62 @@ class Command(BaseCommand):
         logger.info(msg)
         # raise CommandError(msg)
 
-        collect = self.collect_data(data_group)
+        processes = options.get("processes")
+        collect = self.collect_data(data_group, settings.COLLECTOR_PROCESSES if processes is None else processes)
 
         elapsed_time = time.perf_counter() - start_time
         logger.info(f"[{collect}/{active}] Collects completed and saved database.")
         logger.info(f"Execution time: {elapsed_time:0.2f} seconds.")
 
-    def collect_data(self, data_group: str) -> int:
+    def collect_data(self, data_group: str, processes: int = 0) -> int:
         """
-        Collect data from active transductors and save it to the database.
+        Collect data from the active transductors assigned to this collector instance and save it
+        to the database. See `data_collector.sharding`. With `processes`, the transductors are
+        polled by that many worker processes instead of threads.
         """
         if data_group not in DATA_GROUPS:
             logger.error(f"Unknown data_group: {data_group}")
             raise CommandError(f"Unknown data_group: {data_group}")
 
-        transductors = Transductor.objects.filter(active=True)
+        transductors = Transductor.objects.filter(active=True).select_related("memory_map")
+        transductors = assigned_transductors(transductors, data_group)
+        logger.info(f"Transductors assigned to {settings.COLLECTOR_INSTANCE}: {len(transductors)}")
 
-        modbus_data = self.get_data_from_transductors_threads(transductors, data_group)
+        if processes > 0:
+            modbus_data = self.get_data_from_transductors_processes(transductors, data_group, processes)
+        else:
+            modbus_data = self.get_data_from_transductors_threads(transductors, data_group)
         self.save_data_to_database(modbus_data, data_group)
 
         return len(modbus_data)
 
     def get_data_from_transductors_threads(self, transductors, data_group):
         """
-        Collect data from each transductor in parallel using multiple processes.
+        Collect data from the transductors in parallel threads, one per gateway lane: at most
+        COLLECTOR_GATEWAY_CONCURRENCY requests are on the wire of a gateway at a time and the
+        transductors of a lane share one connection (see `data_collector.gateways`). The lanes
+        polled at a time follow the concurrency tuned by `collect_scheduled` (`data_collector.autotune`).
         """
-        modbus_data = []  # TODO: Teste in server perforance num thread in cpu
-        with ThreadPoolExecutor(max_workers=multiprocessing.cpu_count() * 4) as executor:
+        modbus_data = []
+        lanes = gateway_lanes(transductors, settings.COLLECTOR_GATEWAY_CONCURRENCY)
+        with ThreadPoolExecutor(max_workers=current_concurrency()) as executor:
             future_list = []
             logger.debug("Starting collection:")
-            for transductor in transductors:
-                logger.debug(f"Transductor: {transductor.id} - {transductor}")
+            for lane in lanes:
+                logger.debug(f"Gateway: {gateway_endpoint(lane[0])} - {len(lane)} transductors")
 
-                model_transductor = transductor.model.lower().strip().replace(" ", "_")
-                slave_id = CONFIG_TRANSDUCTOR.get(model_transductor, {}).get("slave_id", 1)
-
-                future = executor.submit(transductor.collect_data, data_group, slave_id)
+                future = executor.submit(collect_lane, lane, data_group)
                 future_list.append(future)
 
             logger.debug("Finished collection:")
             for future in as_completed(future_list):
                 try:
-                    result = future.result()
-                    if result["broken"]:
-                        logger.error(f"{result['errors']} - set to broken")
-                    else:
-                        logger.debug(f"Transductor: {result['collected']['transductor']}")
-                        modbus_data.append(result["collected"])
+                    for result in future.result():
+                        if result["broken"]:
+                            logger.error(f"{result['errors']} - set to broken")
+                        else:
+                            logger.debug(f"Transductor: {result['collected']['transductor']}")
+                            modbus_data.append(result["collected"])
 
                 except Exception as e:
                     logger.error(f"ThreadPoolExecutor Error: {e}")
@@ -99,6 +117,30 @@ class Command(BaseCommand):
 
         return modbus_data
 
+    def get_data_from_transductors_processes(self, transductors, data_group, processes):
+        """
+        Collect data from the transductors in worker processes, each one polling its shard of
+        gateways in an asyncio event loop (see `data_collector.workers`).
+        """
+        jobs = [CollectionJob.for_transductor(transductor, data_group) for transductor in transductors]
+        transductors = {transductor.id: transductor for transductor in transductors}
+        attributes = {job.transductor_id: job.attributes for job in jobs}
+
+        modbus_data = []
+        results = collect_in_processes(
+            jobs, processes, settings.COLLECTOR_WORKER_CONCURRENCY, settings.COLLECTOR_GATEWAY_CONCURRENCY
+        )
+        for transductor_id, values, error in results:
+            transductor = transductors[transductor_id]
+            if error is not None:
+                transductor.set_broken(True)
+                logger.error(f"{error} - set to broken")
+            elif not transductor.broken:
+                logger.debug(f"Transductor: {transductor_id}")
+                modbus_data.append({**dict(zip(attributes[transductor_id], values)), "transductor": transductor_id})
+
+        return modbus_data
+
     def save_data_to_database(self, modbus_data, data_group) -> None:
         """
         Save the provided modbus_data to the database using the provided serializer class.
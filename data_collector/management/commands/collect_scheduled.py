@@ -0,0 +1,128 @@
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.core.management.base import CommandParser
+from django.utils import timezone
+
+from data_collector.autotune import next_concurrency, recent_reports
+from data_collector.management.commands.collect_data import (
+    Command as CollectDataCommand,
+)
+from data_collector.modbus.settings import (
+    DATA_GROUP_MINUTELY,
+    DATA_GROUP_QUARTERLY,
+    DATA_GROUPS,
+)
+from data_collector.models import CollectionReport
+from data_collector.scheduler import (
+    plan_sessions,
+    run_sessions,
+    run_sessions_in_processes,
+)
+from data_collector.sharding import collection_slot
+from measurement.quarterly import QuarterlyCounterCache
+from transductor.models import Transductor
+
+logger = logging.getLogger("tasks")
+
+
+class Command(BaseCommand):
+    """
+    Runs every minute in place of the separate `collect_data` crons. Each transductor is read
+    once per run, for all the data groups it is due for (the minutely group every minute, the
+    quarterly group at each quarter of hour, the monthly group in the first minute of each month),
+    with the earliest deadlines first. The outcome is saved as a `CollectionReport`, whose concurrency (the
+    gateway lanes polled at a time) is tuned from the reports of the previous runs. With
+    `--processes` (COLLECTOR_PROCESSES), the sessions run in that many worker processes, which
+    share the tuned concurrency.
+
+    With QUARTERLY_FROM_MINUTELY, the transductors whose quarterly map has the energy counters
+    read them with their minutely data and their quarterly measurements are derived from the
+    counters at the first reading of each quarter (`derived` in the report).
+    """
+
+    help = "Collects the due data groups of each transductor in one session per transductor"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=None,
+            help="Worker processes polling the transductors (0 collects with threads)",
+        )
+
+    def handle(self, *args, **options):
+        start_time = time.perf_counter()
+        now = timezone.now()
+        logger.info("-" * 65)
+        logger.info("# Scheduled collection started")
+
+        data_groups = list(DATA_GROUPS)
+
+        report = CollectionReport(
+            instance=settings.COLLECTOR_INSTANCE,
+            slot=collection_slot(DATA_GROUP_MINUTELY, now),
+            started_at=now,
+            concurrency=next_concurrency(recent_reports()),
+        )
+
+        transductors = Transductor.objects.filter(active=True).select_related("memory_map")
+        sessions, missed = plan_sessions(transductors, data_groups, now=now)
+
+        counts = {
+            data_group: {"due": 0, "collected": 0, "failed": 0, "missed": missed[data_group]}
+            for data_group in data_groups
+        }
+        for session in sessions:
+            for data_group in session.deadlines:
+                counts[data_group]["due"] += 1
+        report.sessions = len(sessions)
+        logger.info(f"Sessions: {len(sessions)} - due: { {group: count['due'] for group, count in counts.items()} }")
+        logger.info(f"Concurrency: {report.concurrency}")
+
+        rows = {data_group: [] for data_group in data_groups}
+        dropped = {data_group: 0 for data_group in data_groups}
+        processes = options.get("processes")
+        processes = settings.COLLECTOR_PROCESSES if processes is None else processes
+        if processes > 0:
+            # the tuned concurrency is split among the worker processes
+            concurrency = min(math.ceil(report.concurrency / processes), settings.COLLECTOR_WORKER_CONCURRENCY)
+            results = run_sessions_in_processes(sessions, processes, concurrency, now=now)
+        else:
+            results = run_sessions(sessions, report.concurrency)
+
+        for result in results:
+            if result["error"] is not None:
+                logger.error(f"{result['error']} - set to broken")
+            for data_group, row in result["collected"].items():
+                rows[data_group].append(row)
+            for data_group in result["missed"]:
+                dropped[data_group] += 1
+
+        collector = CollectDataCommand()
+        for data_group, data_group_rows in rows.items():
+            counts[data_group]["collected"] = len(data_group_rows)
+            counts[data_group]["failed"] = counts[data_group]["due"] - len(data_group_rows) - dropped[data_group]
+            counts[data_group]["missed"] += dropped[data_group]
+            if data_group_rows:
+                collector.save_data_to_database(data_group_rows, data_group)
+
+        if settings.QUARTERLY_FROM_MINUTELY and DATA_GROUP_MINUTELY in rows:
+            derived = QuarterlyCounterCache().add(rows[DATA_GROUP_MINUTELY], now)
+            counts[DATA_GROUP_QUARTERLY]["derived"] = len(derived)
+
+        report.data_groups = counts
+        report.finished_at = timezone.now()
+        report.save()
+
+        for data_group, data_group_counts in counts.items():
+            if data_group_counts["missed"]:
+                logger.warning(f"{data_group.capitalize()}: {data_group_counts['missed']} slots missed")
+
+        elapsed_time = time.perf_counter() - start_time
+        logger.info(f"Collected: {counts}")
+        logger.info(f"Execution time: {elapsed_time:0.2f} seconds.")
+        self.stdout.write(self.style.SUCCESS(f"Scheduled collection finished in {elapsed_time:0.2f} seconds."))
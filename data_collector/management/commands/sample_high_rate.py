@@ -0,0 +1,163 @@
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.utils import timezone
+
+from data_collector.gateways import gateway_endpoint
+from data_collector.management.commands.collect_data import (
+    Command as CollectDataCommand,
+)
+from data_collector.modbus.settings import DATA_GROUP_MINUTELY
+from data_collector.sampling import (
+    HIGH_RATE_LOCK_ID,
+    GatewaySampler,
+    TransductorSampler,
+    buffer_capacity,
+    cover_transductors,
+    seconds_to_refresh,
+)
+from data_collector.sharding import collection_slot, next_collection_slot
+from measurement.quarterly import QuarterlyCounterCache
+from transductor.models import Transductor
+
+logger = logging.getLogger("tasks")
+
+
+class Command(BaseCommand):
+    """
+    Long running high-rate collector. Every `--interval` seconds it reads only the sampled
+    attributes (voltages and frequencies by default) of each active transductor, feeds the voltage
+    debouncers and keeps the samples in memory. Once per minute it saves one minutely measurement
+    per transductor with the averages and the min/max of the minute (`high_rate_stats`). With
+    QUARTERLY_FROM_MINUTELY, the quarterly measurements are derived from the energy counters read
+    with each minutely measurement.
+
+    Runs once per collector instance (COLLECTOR_INSTANCE) and samples the transductors the hash
+    ring gives the instance. Every minute it reloads the active transductors and claims their next
+    minutely slot, so `collect_data minutely` and `collect_scheduled` skip only the transductors it
+    covers; if it stops, the cron collection takes them back.
+    """
+
+    help = "Samples voltages/frequencies every few seconds and saves per-minute aggregates"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--interval", type=float, default=None, help="Seconds between samples")
+        parser.add_argument("--attributes", type=str, default=None, help="Comma separated minutely attributes")
+        parser.add_argument("--retention", type=int, default=None, help="Seconds of samples kept in memory")
+
+    def handle(self, *args, **options) -> None:
+        interval = options["interval"] or settings.HIGH_RATE_INTERVAL
+        retention = options["retention"] or settings.HIGH_RATE_RETENTION
+        attributes = options["attributes"] or ",".join(settings.HIGH_RATE_ATTRIBUTES)
+        attributes = {attribute.strip() for attribute in attributes.split(",") if attribute.strip()}
+
+        if retention < 60:
+            raise CommandError("--retention must keep at least one minute of samples")
+
+        # the lock is held on a connection of its own: close_old_connections() recycles the default
+        # one after every save, which would release the lock of a session-level advisory lock
+        lock = [HIGH_RATE_LOCK_ID, settings.COLLECTOR_INSTANCE]
+        lock_connection = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            with lock_connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s, hashtext(%s))", lock)
+                if not cursor.fetchone()[0]:
+                    logger.info("High-rate sampler: another sampler is running.")
+                    return
+
+            try:
+                self.sample(attributes, interval, buffer_capacity(retention, interval))
+            finally:
+                with lock_connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s, hashtext(%s))", lock)
+        finally:
+            lock_connection.close()
+
+    def sample(self, attributes, interval: float, capacity: int) -> None:
+        self.attributes = attributes
+        self.interval = interval
+        self.capacity = capacity
+        self.samplers = {}
+        self.gateways = {}
+
+        logger.info("-" * 65)
+        logger.info(f"# High-rate sampler started - every {interval}s")
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        collector = CollectDataCommand()
+        counters = QuarterlyCounterCache()
+
+        def save_rows(rows):
+            if not rows:
+                return
+
+            with lock:
+                collector.save_data_to_database(rows, DATA_GROUP_MINUTELY)
+                counters.add(rows, timezone.now())
+                close_old_connections()
+
+        try:
+            while not stop.is_set():
+                try:
+                    self.refresh(stop, save_rows)
+                except Exception as e:
+                    logger.error(f"High-rate sampler refresh: {e}")
+                finally:
+                    close_old_connections()
+
+                stop.wait(seconds_to_refresh(timezone.now()))
+        except KeyboardInterrupt:
+            logger.info("High-rate sampler interrupted.")
+        finally:
+            stop.set()
+            for _, thread in self.gateways.values():
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS("High-rate sampler stopped."))
+
+    def refresh(self, stop: threading.Event, save_rows) -> None:
+        """
+        Reloads the transductors covered by the sampler and hands each gateway its samplers. The
+        samplers of the transductors still covered are kept with their samples; a new transductor
+        starts with the current minute when no collector has read it yet, else with the next one.
+        """
+        now = timezone.now()
+        slot = collection_slot(DATA_GROUP_MINUTELY, now)
+
+        transductors = Transductor.objects.filter(active=True).select_related("memory_map")
+        covered, current = cover_transductors(transductors, set(self.samplers), now=now)
+
+        samplers = {}
+        for transductor in covered:
+            sampler = self.samplers.get(transductor.id)
+            if sampler is None or gateway_endpoint(sampler.transductor) != gateway_endpoint(transductor):
+                first_minute = slot if transductor.id in current else next_collection_slot(DATA_GROUP_MINUTELY, slot)
+                sampler = TransductorSampler(transductor, self.attributes, self.capacity, first_minute)
+            samplers[transductor.id] = sampler
+        self.samplers = samplers
+
+        gateways = defaultdict(list)
+        for sampler in samplers.values():
+            gateways[gateway_endpoint(sampler.transductor)].append(sampler)
+
+        for endpoint in self.gateways.keys() - gateways.keys():
+            gateway, _ = self.gateways[endpoint]
+            gateway.update([])
+
+        for endpoint, gateway_samplers in gateways.items():
+            gateway, thread = self.gateways.get(endpoint, (None, None))
+            if thread is not None and thread.is_alive():
+                gateway.update(gateway_samplers)
+                continue
+
+            gateway = GatewaySampler(gateway_samplers, self.interval)
+            thread = threading.Thread(target=gateway.run, args=(stop, save_rows), daemon=True)
+            thread.start()
+            self.gateways[endpoint] = (gateway, thread)
+
+        logger.info(f"High-rate sampler: {len(samplers)} transductors on {len(gateways)} gateways")
@@ -1,4 +1,8 @@
-from pymodbus.client.tcp import ModbusTcpClient
+import asyncio
+import socket
+import struct
+
+from pymodbus.client.tcp import AsyncModbusTcpClient, ModbusTcpClient
 from pymodbus.client.udp import ModbusUdpClient
 from pymodbus.constants import Endian
 from pymodbus.exceptions import ModbusException
@@ -7,6 +11,39 @@ from pymodbus.payload import BinaryPayloadDecoder
 from data_collector.modbus.helpers import ModbusTypeDecoder, apply_sign_transformations
 
 
+def decode_registers(register_block, registers) -> dict:
+    """
+    Decodes the registers read from a register block into the values of its attributes,
+    rounded and with the sign transformations applied.
+    """
+    byte_order = Endian.Little if register_block["byteorder"].startswith(("msb", "f2")) else Endian.Big
+    decoder = BinaryPayloadDecoder.fromRegisters(
+        registers=registers,
+        byteorder=byte_order,
+        wordorder=Endian.Little,
+    )
+    parse_function = ModbusTypeDecoder().parsers[register_block["type"]]
+
+    decoded_value = {}
+    for attribute in register_block["attributes"]:
+        value = round(parse_function(decoder), 2)
+        decoded_value[attribute] = apply_sign_transformations(attribute, value)
+
+    return decoded_value
+
+
+def read_request(client, register_block, slave_id):
+    """Read request of a register block; a response, or an awaitable of it with an async client."""
+    if register_block["function"] == "read_input_register":
+        read = client.read_input_registers
+    elif register_block["function"] == "read_holding_register":
+        read = client.read_holding_registers
+    else:
+        raise NotImplementedError(f"function modbus: {register_block['datamodel']} not implemented!")
+
+    return read(address=register_block["start_address"], count=register_block["size"], slave=slave_id)
+
+
 class ModbusDataReader:
     def __init__(self, ip_address, port, slave_id, method="tcp"):
         self.ip_address = ip_address
@@ -21,27 +58,42 @@ class ModbusDataReader:
         """
 
         self._start_modbus_client()
-        collected_data = {}
+        try:
+            return self.read_blocks(register_blocks)
+        finally:
+            self._stop_client()
 
-        for register_block in register_blocks:
-            byte_order = Endian.Little if register_block["byteorder"].startswith(("msb", "f2")) else Endian.Big
-
-            payload = self._read_registers_block(register_block)
-            if payload is None:
-                continue
+    def connect(self):
+        """Opens the connection unless it is already open, for readers that poll the device repeatedly."""
+        if self.client is None or not self.client.connected:
+            self._start_modbus_client()
 
-            decoder = BinaryPayloadDecoder.fromRegisters(
-                registers=payload,
-                byteorder=byte_order,
-                wordorder=Endian.Little,
-            )
+    def close(self):
+        if self.client is not None:
+            self._stop_client()
+            self.client = None
 
-            decoded_data = self._decode_response_message(decoder, register_block)
-            collected_data |= decoded_data
-        self._stop_client()
+    def read_blocks(self, register_blocks, slave_id=None):
+        """
+        Reads and decodes the register blocks through the already open connection, from `slave_id`
+        when the connection goes to a gateway shared by several slaves.
+        """
+        collected_data = {}
+        for block_data in self.read_block_values(register_blocks, slave_id):
+            collected_data |= block_data
 
         return collected_data
 
+    def read_block_values(self, register_blocks, slave_id=None) -> list[dict]:
+        """Decoded values of each register block, in the order of the blocks."""
+        block_values = []
+
+        for register_block in register_blocks:
+            payload = self._read_registers_block(register_block, slave_id)
+            block_values.append(decode_registers(register_block, payload) if payload is not None else {})
+
+        return block_values
+
     def _setup_client(self):
         """Create a client instance"""
 
@@ -63,48 +115,187 @@ class ModbusDataReader:
     def _stop_client(self):
         self.client.close()
 
-    def _read_registers_block(self, register_block):
+    def _read_registers_block(self, register_block, slave_id=None):
         """
         Reads the contents of a contiguous block of registers from modbus device
         """
 
-        starting_address = register_block["start_address"]
-        size = register_block["size"]
-        _function = register_block["function"]
+        response = read_request(self.client, register_block, self.slave_id if slave_id is None else slave_id)
 
-        if _function == "read_input_register":
-            response = self.client.read_input_registers(
-                address=starting_address,
-                count=size,
-                slave=self.slave_id,
-            )
+        if response.isError():
+            raise ModbusException(f"{self.ip_address} => Error reading holding registers")
 
-        elif _function == "read_holding_register":
-            response = self.client.read_holding_registers(
-                address=starting_address,
-                count=size,
-                slave=self.slave_id,
-            )
+        return response.registers
 
-        else:
+
+class PipelinedModbusDataReader(ModbusDataReader):
+    """
+    Modbus TCP reader for devices that accept several outstanding transactions: up to
+    `pipeline_depth` block requests are written on the connection before the first response is
+    read, and each response is matched to its block by transaction id, so a map of N blocks
+    costs about N / depth round trips instead of N.
+    """
+
+    MBAP_HEADER = struct.Struct(">HHHB")  # transaction id, protocol id (0), length, unit id
+    READ_REQUEST = struct.Struct(">BHH")  # function code, starting address, count
+    FUNCTION_CODES = {"read_holding_register": 3, "read_input_register": 4}
+
+    def __init__(self, ip_address, port, slave_id, pipeline_depth, timeout=3):
+        super().__init__(ip_address, port, slave_id)
+        self.pipeline_depth = pipeline_depth
+        self.timeout = timeout
+        self.transaction_id = 0
+
+    def connect(self):
+        if self.client is None:
+            self._start_modbus_client()
+
+    def read_block_values(self, register_blocks, slave_id=None):
+        slave_id = self.slave_id if slave_id is None else slave_id
+        queued = list(enumerate(register_blocks))
+        pending = {}
+        block_values = [{} for _ in queued]
+
+        while queued or pending:
+            requests = []
+            while queued and len(pending) < self.pipeline_depth:
+                index, register_block = queued.pop(0)
+                transaction_id = self._next_transaction_id()
+                pending[transaction_id] = index
+                requests.append(self._request_frame(transaction_id, slave_id, register_block))
+            if requests:
+                self.client.sendall(b"".join(requests))
+
+            transaction_id, unit_id, pdu = self._receive_response()
+            index = pending.pop(transaction_id, None)
+            if index is None:
+                continue  # late response to a request of an earlier, failed read
+
+            registers = self._response_registers(register_blocks[index], slave_id, unit_id, pdu)
+            block_values[index] = decode_registers(register_blocks[index], registers)
+
+        return block_values
+
+    def _start_modbus_client(self):
+        try:
+            self.client = socket.create_connection((self.ip_address, int(self.port)), timeout=self.timeout)
+        except OSError:
+            raise Exception(f"Connection failure with client: {self.ip_address}")
+        # requests written back to back must not wait for the acknowledgement of the previous one
+        self.client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _stop_client(self):
+        self.client.close()
+        self.client = None
+
+    def _next_transaction_id(self) -> int:
+        self.transaction_id = self.transaction_id % 0xFFFF + 1
+        return self.transaction_id
+
+    def _request_frame(self, transaction_id, slave_id, register_block) -> bytes:
+        function_code = self.FUNCTION_CODES.get(register_block["function"])
+        if function_code is None:
             raise NotImplementedError(f"function modbus: {register_block['datamodel']} not implemented!")
 
-        if response.isError():
+        pdu = self.READ_REQUEST.pack(function_code, register_block["start_address"], register_block["size"])
+        return self.MBAP_HEADER.pack(transaction_id, 0, len(pdu) + 1, slave_id) + pdu
+
+    def _receive_response(self) -> tuple[int, int, bytes]:
+        transaction_id, _, length, unit_id = self.MBAP_HEADER.unpack(self._receive(self.MBAP_HEADER.size))
+        return transaction_id, unit_id, self._receive(length - 1)
+
+    def _response_registers(self, register_block, slave_id, unit_id, pdu) -> list[int]:
+        """Registers of the response to the request of `register_block`, checked against the request."""
+        function_code = self.FUNCTION_CODES[register_block["function"]]
+        byte_count = 2 * register_block["size"]
+
+        if len(pdu) < 2:
+            raise ModbusException(f"{self.ip_address} => Response of {len(pdu)} bytes")
+        if pdu[0] == function_code | 0x80:
             raise ModbusException(f"{self.ip_address} => Error reading holding registers")
+        if unit_id != slave_id or pdu[0] != function_code:
+            raise ModbusException(
+                f"{self.ip_address} => Response of unit {unit_id}, function {pdu[0]} "
+                f"to a request to unit {slave_id}, function {function_code}"
+            )
+
+        if pdu[1] != byte_count or len(pdu) != 2 + byte_count:
+            raise ModbusException(
+                f"{self.ip_address} => Response of {len(pdu) - 2} bytes to a request of {byte_count} bytes"
+            )
+
+        return list(struct.unpack(f">{register_block['size']}H", pdu[2:]))
+
+    def _receive(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self.client.recv(size - len(data))
+            if not chunk:
+                raise ModbusException(f"{self.ip_address} => Connection closed by the device")
+            data += chunk
+        return data
 
-        return response.registers
 
-    def _decode_response_message(self, decoder, register_block):
+def create_reader(ip_address, port, slave_id=None, pipeline_depth=1):
+    """`PipelinedModbusDataReader` for devices accepting several transactions, else `ModbusDataReader`."""
+    if pipeline_depth > 1:
+        return PipelinedModbusDataReader(ip_address, port, slave_id, pipeline_depth)
+    return ModbusDataReader(ip_address, port, slave_id)
+
+
+class AsyncModbusDataReader:
+    """
+    Reads the transductors behind a Modbus TCP gateway from an asyncio event loop, through one
+    connection: the requests to the slaves of the gateway are sent one after the other.
+    """
+
+    def __init__(self, ip_address, port, pipeline_depth=1):
+        self.ip_address = ip_address
+        self.port = port
+        self.pipeline_depth = pipeline_depth
+        self.client = None
+
+    async def connect(self):
+        """Opens the connection unless it is already open."""
+        if self.client is not None and self.client.connected:
+            return
+
+        # no background reconnection: a failed gateway is reported, and retried on the next collection
+        self.client = AsyncModbusTcpClient(self.ip_address, int(self.port), reconnect_delay=0)
+        await self.client.connect()
+        if not self.client.connected:
+            raise Exception(f"Connection failure with client: {self.ip_address}")
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def read_block_values(self, register_blocks, slave_id) -> list[dict]:
         """
-        decode payload message from a modbus response message into data components to their
-        respective values which are stored in a dictionary
+        Decoded values of each register block of a slave, in the order of the blocks, connecting
+        first if needed; with a `pipeline_depth` above 1, that many block requests are in flight
+        at a time.
         """
-        parse_function = ModbusTypeDecoder().parsers[register_block["type"]]
+        await self.connect()
+
+        block_values = []
+        for start in range(0, len(register_blocks), self.pipeline_depth):
+            window = register_blocks[start : start + self.pipeline_depth]
+            responses = await asyncio.gather(
+                *[read_request(self.client, register_block, slave_id) for register_block in window]
+            )
+            for register_block, response in zip(window, responses):
+                if response.isError():
+                    raise ModbusException(f"{self.ip_address} => Error reading holding registers")
+
+                block_values.append(decode_registers(register_block, response.registers))
 
-        decoded_value = {}
-        for attribute in register_block["attributes"]:
-            value = round(parse_function(decoder), 2)
-            transformed_value = apply_sign_transformations(attribute, value)
-            decoded_value[attribute] = transformed_value
+        return block_values
 
-        return decoded_value
+    async def read_blocks(self, register_blocks, slave_id):
+        """Reads and decodes the register blocks of a slave into one dict (see `read_block_values`)."""
+        collected_data = {}
+        for values in await self.read_block_values(register_blocks, slave_id):
+            collected_data |= values
+        return collected_data
@@ -2,9 +2,14 @@ from csv import DictReader
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from django.conf import settings
 from django.utils import timezone
 
-from data_collector.modbus.settings import ON_PEAK_TIME_END, ON_PEAK_TIME_START, SIGN_TRANSFORMATIONS
+from data_collector.modbus.settings import (
+    CONFIG_TRANSDUCTOR,
+    SIGN_TRANSFORMATIONS,
+    TariffPosts,
+)
 
 
 class ModbusTypeDecoder(object):
@@ -151,18 +156,20 @@ def type_modbus(data_type: str) -> str:
 
 
 def is_peak_time(dt_reference: datetime = None) -> bool:
+    return get_tariff_post(dt_reference) == TariffPosts.PEAK
+
+
+def get_tariff_post(dt_reference: datetime = None) -> int:
+    from tariff.calendar import get_calendar
+
     if dt_reference is None:
         dt_reference = timezone.now()
 
     # Nao considera o minuto final para ajustar ao cronjob:
     # exemplo coleta: 18h => time = 17:59 => return False
     #                 21h => time = 20:59 => return True
-    time = (dt_reference - timedelta(minutes=1)).time()
-
-    is_weekday = dt_reference.weekday() < 5  # de segunda a sexta-feira
-    is_peak_time = ON_PEAK_TIME_START <= time <= ON_PEAK_TIME_END
-
-    return is_weekday and is_peak_time
+    # Fins de semana, feriados e o horario local (settings.TIME_ZONE) sao tratados pelo calendario tarifario
+    return get_calendar().classify(dt_reference - timedelta(minutes=1))
 
 
 def map_registers_to_model(register_blocks, model):
@@ -201,3 +208,51 @@ def apply_sign_transformations(attribute, value):
     transform = SIGN_TRANSFORMATIONS.get(attribute, None)
 
     return transform(value) if transform else value
+
+
+def model_config(model_transductor: str) -> dict:
+    return CONFIG_TRANSDUCTOR.get(model_transductor.lower().strip().replace(" ", "_"), {})
+
+
+def default_slave_id(model_transductor: str) -> int:
+    """Modbus slave id of a transductor model (`CONFIG_TRANSDUCTOR`), for transductors without their own."""
+    return model_config(model_transductor).get("slave_id", 1)
+
+
+def pipeline_depth(model_transductor: str) -> int:
+    """
+    Block requests sent to a transductor model before waiting for the first response: the
+    `MODBUS_PIPELINE_DEPTH` setting, else `CONFIG_TRANSDUCTOR`; 1 reads one block at a time.
+    """
+    model_transductor = model_transductor.lower().strip().replace(" ", "_")
+    depth = settings.MODBUS_PIPELINE_DEPTH.get(
+        model_transductor, model_config(model_transductor).get("pipeline_depth", 1)
+    )
+    return max(depth, 1)
+
+
+def select_blocks(register_blocks: list[dict], attributes) -> list[dict]:
+    """
+    The register blocks trimmed to the span of `attributes` they contain: one request per block
+    holding any of them. Attributes in the middle of the span are read too and dropped later,
+    which is cheaper on a gateway than an extra round trip.
+    """
+    selected = []
+    for block in register_blocks:
+        names = block["attributes"]
+        indexes = [index for index, name in enumerate(names) if name in attributes]
+        if not indexes:
+            continue
+
+        width = block["size"] // len(names)
+        first, last = indexes[0], indexes[-1]
+        selected.append(
+            {
+                **block,
+                "start_address": block["start_address"] + first * width,
+                "size": (last - first + 1) * width,
+                "attributes": names[first : last + 1],
+            }
+        )
+
+    return selected
@@ -15,6 +15,12 @@ class DataGroups(models.IntegerChoices):
     DATETIME = 4, "datetime"
 
 
+class TariffPosts(models.IntegerChoices):
+    OFF_PEAK = 1, "off_peak"
+    PEAK = 2, "peak"
+    INTERMEDIATE = 3, "intermediate"
+
+
 DATA_GROUPS = ["minutely", "quarterly", "monthly"]
 DATA_GROUP_MINUTELY = "minutely"
 DATA_GROUP_QUARTERLY = "quarterly"
@@ -32,10 +38,11 @@ CSV_SCHEMA = {
     "function": str,
 }
 
+# pipeline_depth: Modbus TCP requests the device accepts before answering the first one (1: no pipelining)
 CONFIG_TRANSDUCTOR = {
-    "tr4020": {"max_block": 100, "slave_id": 1},
-    "md30": {"max_block": 100, "slave_id": 1},
-    "kron_konect": {"max_block": 100, "slave_id": 255},
+    "tr4020": {"max_block": 100, "slave_id": 1, "pipeline_depth": 1},
+    "md30": {"max_block": 100, "slave_id": 1, "pipeline_depth": 1},
+    "kron_konect": {"max_block": 100, "slave_id": 255, "pipeline_depth": 1},
 }
 
 
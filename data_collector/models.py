@@ -127,3 +127,90 @@ class MemoryMap(models.Model):
 
         sequential_blocks.append(current_block)
         return sequential_blocks
+
+
+class CollectorInstance(models.Model):
+    """
+    Collector (`collect_data` on a box sharing this database), alive while its heartbeat is recent.
+    The live instances split the active transductors among themselves by consistent hashing.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    heartbeat_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Collector Instance"
+        verbose_name_plural = "Collector Instances"
+
+    def __str__(self):
+        return f"{self.name} - {self.heartbeat_at}"
+
+
+class CollectorLease(models.Model):
+    """
+    Last collection slot (e.g. the minute) of a transductor and data group claimed by a collector.
+    A slot is claimed by a single conditional upsert, so a transductor is polled at most once per
+    slot even while the instances disagree on who owns it.
+    """
+
+    transductor = models.ForeignKey("transductor.Transductor", on_delete=models.CASCADE, related_name="+")
+    data_group = models.CharField(max_length=16)
+    instance = models.CharField(max_length=255)
+    slot = models.DateTimeField()
+    claimed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["transductor", "data_group"], name="unique_collector_lease"),
+        ]
+        verbose_name = "Collector Lease"
+        verbose_name_plural = "Collector Leases"
+
+    def __str__(self):
+        return f"{self.transductor_id} - {self.data_group} - {self.instance}"
+
+
+class CollectionReport(models.Model):
+    """
+    Outcome of a `collect_scheduled` run. `data_groups` holds, per data group, the transductors
+    due in the run, collected, failed, and the slots missed: dropped past their deadline or
+    never claimed since the previous collection of the transductor. `concurrency` is the number
+    of gateway lanes polled at a time, tuned from one run to the next (see `data_collector.autotune`).
+    """
+
+    instance = models.CharField(max_length=255)
+    slot = models.DateTimeField()
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    data_groups = models.JSONField(default=dict)
+    sessions = models.PositiveIntegerField(default=0)
+    concurrency = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["slot"], name="collection_report_slot_idx"),
+            models.Index(fields=["instance", "-started_at"], name="collection_report_instance_idx"),
+        ]
+        verbose_name = "Collection Report"
+        verbose_name_plural = "Collection Reports"
+
+    def __str__(self):
+        return f"{self.instance} - {self.slot}"
+
+    @property
+    def missed(self) -> int:
+        return sum(counts.get("missed", 0) for counts in self.data_groups.values())
+
+    @property
+    def error_rate(self) -> float:
+        due = sum(counts.get("due", 0) for counts in self.data_groups.values())
+        failed = sum(counts.get("failed", 0) for counts in self.data_groups.values())
+        return failed / due if due else 0.0
+
+    @property
+    def session_time(self):
+        """Seconds per collection session of the run."""
+        if self.finished_at is None or not self.sessions:
+            return None
+        return (self.finished_at - self.started_at).total_seconds() / self.sessions
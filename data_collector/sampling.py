@@ -0,0 +1,271 @@
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from data_collector.modbus.data_reader import create_reader
+from data_collector.modbus.helpers import select_blocks
+from data_collector.modbus.settings import DATA_GROUP_MINUTELY
+from data_collector.sharding import (
+    claim_slot,
+    collection_slot,
+    next_collection_slot,
+    owned_transductors,
+)
+from debouncers.debouncers import VoltageEventDebouncer
+from measurement.quarterly import minutely_plan
+
+logger = logging.getLogger("tasks")
+
+# pg_try_advisory_lock key of `sample_high_rate`, with the hash of the instance name: one sampler per instance
+HIGH_RATE_LOCK_ID = 7_300_039
+
+# Second of the minute at which the sampler refreshes its transductors, away from the crons at second 0
+REFRESH_SECOND = 30
+
+VOLTAGE_PHASES = ("voltage_a", "voltage_b", "voltage_c")
+
+
+def cover_transductors(transductors, sampled_ids, name: str = None, now=None) -> tuple[list, set]:
+    """
+    Transductors the high-rate sampler of the instance `name` covers: the ones the hash ring gives
+    the instance (see `data_collector.sharding`) whose next minutely slot it claims, so the cron
+    collectors leave them out while the sampler runs and take them back a minute after it stops.
+    Also returns the ids, out of `sampled_ids`, whose current minute the sampler claimed too: the
+    ones no collector has read yet in this minute.
+    """
+    name = name or settings.COLLECTOR_INSTANCE
+    now = now or timezone.now()
+    slot = collection_slot(DATA_GROUP_MINUTELY, now)
+
+    owned = owned_transductors(transductors, name, now)
+    current = claim_slot(
+        [transductor.id for transductor in owned if transductor.id not in sampled_ids],
+        DATA_GROUP_MINUTELY,
+        name,
+        slot,
+        now,
+    )
+    claimed = claim_slot(
+        [transductor.id for transductor in owned],
+        DATA_GROUP_MINUTELY,
+        name,
+        next_collection_slot(DATA_GROUP_MINUTELY, slot),
+        now,
+    )
+    return [transductor for transductor in owned if transductor.id in claimed], current
+
+
+def seconds_to_refresh(now) -> float:
+    """Seconds until the next REFRESH_SECOND of a minute."""
+    return (REFRESH_SECOND - now.second - now.microsecond / 1_000_000) % 60 or 60
+
+
+class SampleBuffer:
+    """
+    Ring buffer of the latest `capacity` samples of a transductor, one column per attribute.
+    Memory is allocated once; the oldest samples are overwritten.
+    """
+
+    def __init__(self, attributes: list[str], capacity: int):
+        self.attributes = list(attributes)
+        self.capacity = capacity
+        self.timestamps = np.full(capacity, np.nan)
+        self.values = np.full((capacity, len(self.attributes)), np.nan)
+        self.count = 0
+
+    def append(self, timestamp: float, values: dict) -> None:
+        position = self.count % self.capacity
+        self.timestamps[position] = timestamp
+        self.values[position] = np.array([values.get(attribute) for attribute in self.attributes], dtype=float)
+        self.count += 1
+
+    def aggregate(self, start: float, end: float) -> dict:
+        """Minimum, maximum, average and number of the samples taken in [start, end), per attribute."""
+        window = self.values[(self.timestamps >= start) & (self.timestamps < end)]
+
+        stats = {}
+        for column, attribute in enumerate(self.attributes):
+            values = window[:, column]
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+
+            stats[attribute] = {
+                "min": round(float(values.min()), 2),
+                "max": round(float(values.max()), 2),
+                "avg": round(float(values.mean()), 2),
+                "samples": len(values),
+            }
+
+        return stats
+
+
+class TransductorSampler:
+    """
+    High-rate reader of a transductor, through the connection of its gateway: stores each sample
+    in a `SampleBuffer` and feeds the voltage phases to in-memory debouncers, so the database is
+    only touched when a phase changes state or once per minute by `minutely_row`. The minutes
+    before `first_minute` belong to another collector and are not saved.
+    """
+
+    def __init__(self, transductor, attributes, capacity: int, first_minute: datetime = None):
+        self.transductor = transductor
+        self.first_minute = first_minute
+        self.blocks = select_blocks(transductor.memory_map.minutely, attributes)
+        self.attributes = [name for block in self.blocks for name in block["attributes"] if name in attributes]
+        self.buffer = SampleBuffer(self.attributes, capacity)
+        self.debouncers = {}
+
+    def sample(self, reader, timestamp: float) -> dict:
+        reader.connect()
+        values = reader.read_blocks(self.blocks, self.transductor.modbus_slave_id)
+
+        self.buffer.append(timestamp, values)
+        self.debounce(values)
+        return values
+
+    def minutely_row(self, reader, start: datetime, end: datetime) -> dict:
+        """
+        Full minutely reading in the format of `collect_data`, with the sampled attributes replaced
+        by their average over [start, end) and their min/max/avg kept in `high_rate_stats`. Includes
+        the energy counters when the quarterly measurements are derived from them.
+        """
+        reader.connect()
+        collected_data = reader.read_blocks(minutely_plan(self.transductor), self.transductor.modbus_slave_id)
+
+        stats = self.buffer.aggregate(start.timestamp(), end.timestamp())
+        for attribute, attribute_stats in stats.items():
+            collected_data[attribute] = attribute_stats["avg"]
+
+        collected_data["transductor"] = self.transductor.id
+        collected_data["high_rate_stats"] = stats
+        return collected_data
+
+    def debounce(self, values: dict) -> None:
+        for phase in VOLTAGE_PHASES:
+            value = values.get(phase)
+            if value is None:
+                continue
+
+            debouncer = self.get_debouncer(phase)
+            previous_state, current_state = debouncer.add_new_measurement(value)
+            del debouncer.data_history[: -debouncer.history_size]
+
+            if previous_state != current_state:
+                self.transductor.check_voltage_events((previous_state, current_state), phase, value)
+
+    def get_debouncer(self, phase: str) -> VoltageEventDebouncer:
+        debouncer = self.debouncers.get(phase)
+        if debouncer is None:
+            voltage_state, _ = self.transductor.voltage_phase_states.get_or_create(phase=phase)
+            debouncer = VoltageEventDebouncer(phase)
+            debouncer.current_voltage_state = voltage_state.current_voltage_state
+            self.debouncers[phase] = debouncer
+        return debouncer
+
+
+class GatewaySampler:
+    """
+    Samples the transductors behind one gateway (IP address and port) one after the other, through
+    a single connection, so the gateway never gets concurrent requests from the collector. A round
+    that does not fit in `interval` starts the next one right away: the effective rate adapts to
+    the bandwidth of the gateway.
+    The samplers are swapped by `update` between rounds; without samplers left, `run` returns.
+    A transductor whose minutely reading fails is set to broken and no longer sampled.
+    """
+
+    def __init__(self, samplers: list[TransductorSampler], interval: float, reader=None):
+        self.samplers = samplers
+        self.interval = interval
+        self.pending = None
+        self.lock = threading.Lock()
+        self.reader = reader
+        self.pipeline_depth = None
+
+    def get_reader(self):
+        """Reader of the gateway, pipelined when every transductor sampled supports it."""
+        pipeline_depth = min(sampler.transductor.pipeline_depth for sampler in self.samplers)
+        if self.reader is None or (self.pipeline_depth is not None and pipeline_depth != self.pipeline_depth):
+            self.close()
+            transductor = self.samplers[0].transductor
+            self.reader = create_reader(transductor.ip_address, transductor.port, pipeline_depth=pipeline_depth)
+            self.pipeline_depth = pipeline_depth
+        return self.reader
+
+    def close(self) -> None:
+        if self.reader is not None:
+            self.reader.close()
+
+    def update(self, samplers: list[TransductorSampler]) -> None:
+        with self.lock:
+            self.pending = samplers
+
+    def apply_update(self) -> None:
+        with self.lock:
+            samplers, self.pending = self.pending, None
+        if samplers is not None:
+            self.samplers = samplers
+
+    def run(self, stop: threading.Event, save_rows) -> None:
+        minute = timezone.now().replace(second=0, microsecond=0)
+
+        try:
+            while not stop.is_set():
+                self.apply_update()
+                if not self.samplers:
+                    break
+
+                now = timezone.now()
+                current_minute = now.replace(second=0, microsecond=0)
+                if current_minute > minute:
+                    save_rows(self.minutely_rows(minute, current_minute))
+                    minute = current_minute
+
+                round_start = time.perf_counter()
+                self.sample_round(now.timestamp())
+                elapsed_time = time.perf_counter() - round_start
+
+                if elapsed_time > self.interval:
+                    gateway = self.samplers[0].transductor.ip_address
+                    logger.warning(f"High-rate round of {gateway} took {elapsed_time:.2f}s (> {self.interval}s)")
+
+                stop.wait(max(0, self.interval - elapsed_time))
+        finally:
+            self.close()
+            close_old_connections()
+
+    def sample_round(self, timestamp: float) -> None:
+        for sampler in self.samplers:
+            try:
+                sampler.sample(self.get_reader(), timestamp)
+            except Exception as e:
+                logger.error(f"High-rate sample of {sampler.transductor}: {e}")
+                # a late response of the failed slave must not be read as the answer to the next one
+                self.close()
+
+    def minutely_rows(self, start: datetime, end: datetime) -> list[dict]:
+        rows = []
+        for sampler in list(self.samplers):
+            if sampler.first_minute is not None and start < sampler.first_minute:
+                continue
+
+            try:
+                rows.append(sampler.minutely_row(self.get_reader(), start, end))
+            except Exception as e:
+                logger.error(f"High-rate minutely reading of {sampler.transductor}: {e} - set to broken")
+                self.close()
+                sampler.transductor.set_broken(True)
+                self.samplers.remove(sampler)
+        return rows
+
+
+def buffer_capacity(retention: float, interval: float) -> int:
+    """Samples needed to keep `retention` seconds of history at one sample per `interval`."""
+    return max(1, math.ceil(retention / interval))
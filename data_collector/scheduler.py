@@ -0,0 +1,220 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.utils import timezone
+
+from data_collector.gateways import gateway_endpoint, gateway_lanes
+from data_collector.modbus.data_reader import create_reader
+from data_collector.modbus.settings import (
+    DATA_GROUP_MINUTELY,
+    DATA_GROUP_MONTHLY,
+    DATA_GROUP_QUARTERLY,
+    DATA_GROUPS,
+)
+from data_collector.models import CollectorLease
+from data_collector.sharding import (
+    assigned_transductors,
+    collection_slot,
+    missed_slots,
+    next_collection_slot,
+)
+from data_collector.workers import CollectionJob, collect_in_processes
+from measurement.quarterly import derives_quarterly, minutely_plan
+
+
+class CollectionSession:
+    """
+    The data groups due for a transductor, read through one connection with a single request
+    plan: the register blocks of every group, pipelined when the transductor supports it.
+    A group whose deadline (the end of its slot) has passed is dropped as missed. The minutely
+    plan carries the energy counters of the transductors whose quarterly data is derived from them.
+    """
+
+    def __init__(self, transductor):
+        self.transductor = transductor
+        self.deadlines = {}
+
+    # `gateway_lanes` groups sessions by the endpoint of their transductor
+    @property
+    def ip_address(self):
+        return self.transductor.ip_address
+
+    @property
+    def port(self):
+        return self.transductor.port
+
+    @property
+    def deadline(self):
+        return min(self.deadlines.values())
+
+    def add(self, data_group: str, deadline) -> None:
+        self.deadlines[data_group] = deadline
+
+    def blocks(self, data_group: str) -> list[dict]:
+        if data_group == DATA_GROUP_MINUTELY:
+            return minutely_plan(self.transductor)
+        return getattr(self.transductor.memory_map, data_group)
+
+    def due_groups(self, now) -> list[str]:
+        """The data groups whose deadline has not passed, in the order of DATA_GROUPS."""
+        return [
+            data_group
+            for data_group in DATA_GROUPS
+            if data_group in self.deadlines and self.deadlines[data_group] > now
+        ]
+
+    def plan(self, data_groups) -> list[tuple]:
+        """`(data group, register block)` of every block read for the groups."""
+        return [(data_group, block) for data_group in data_groups for block in self.blocks(data_group)]
+
+    def run(self, reader, now=None) -> dict:
+        """Returns the rows collected per data group, the groups missed and the error, if any."""
+        data_groups = self.due_groups(now or timezone.now())
+        if not data_groups:
+            return self.result(data_groups, [], [])
+
+        plan = self.plan(data_groups)
+        try:
+            reader.connect()
+            block_values = reader.read_block_values([block for _, block in plan], self.transductor.modbus_slave_id)
+        except Exception as e:
+            reader.close()
+            return self.result(data_groups, plan, None, str(e))
+
+        return self.result(data_groups, plan, block_values)
+
+    def result(self, data_groups, plan, block_values, error=None) -> dict:
+        """Outcome of the session (see `run`) from the values read for each block of `plan`, or the `error`."""
+        result = {
+            "transductor": self.transductor.id,
+            "collected": {},
+            "missed": [data_group for data_group in self.deadlines if data_group not in data_groups],
+            "error": error,
+        }
+        if error is not None:
+            self.transductor.set_broken(True)
+            return result
+
+        if self.transductor.broken:
+            return result
+
+        for data_group in data_groups:
+            row = {"transductor": self.transductor.id}
+            for (group, _), values in zip(plan, block_values):
+                if group == data_group:
+                    row |= values
+            result["collected"][data_group] = row
+
+        return result
+
+
+def plan_sessions(transductors, data_groups, name: str = None, now=None) -> tuple[list, dict]:
+    """
+    Claims the current slot of each data group for the transductors assigned to this collector
+    instance and builds one session per transductor with the groups it is due for, earliest
+    deadline first; the monthly group is due in the first minute of the month only. Also returns
+    the slots missed per group since the last collection of each transductor. Transductors whose
+    quarterly measurements come from their minutely counters (`derives_quarterly`) are left out
+    of the quarterly group.
+    """
+    now = now or timezone.now()
+    transductors = list(transductors)
+
+    sessions = {}
+    missed = {}
+    for data_group in data_groups:
+        slot = collection_slot(data_group, now)
+        last_slots = dict(
+            CollectorLease.objects.filter(
+                transductor_id__in=[transductor.id for transductor in transductors], data_group=data_group
+            ).values_list("transductor_id", "slot")
+        )
+
+        missed[data_group] = 0
+        if data_group == DATA_GROUP_MONTHLY and collection_slot(DATA_GROUP_MINUTELY, now) != slot:
+            # read at the turn of the month only, not by the first run of the month (e.g. after a restart)
+            continue
+
+        candidates = transductors
+        if data_group == DATA_GROUP_QUARTERLY:
+            candidates = [transductor for transductor in transductors if not derives_quarterly(transductor)]
+
+        for transductor in assigned_transductors(candidates, data_group, name, now):
+            session = sessions.setdefault(transductor.id, CollectionSession(transductor))
+            session.add(data_group, next_collection_slot(data_group, slot))
+            missed[data_group] += missed_slots(data_group, last_slots.get(transductor.id), slot)
+
+    sessions = sorted(sessions.values(), key=lambda session: (session.deadline, -len(session.deadlines)))
+    return sessions, missed
+
+
+def run_lane(sessions) -> list[dict]:
+    """Runs the sessions of a gateway lane one after the other, through one connection."""
+    ip_address, port = gateway_endpoint(sessions[0])
+    reader = create_reader(
+        ip_address, port, pipeline_depth=min(session.transductor.pipeline_depth for session in sessions)
+    )
+    try:
+        return [session.run(reader) for session in sessions]
+    finally:
+        reader.close()
+
+
+def run_sessions_in_processes(sessions, processes: int, concurrency: int, now=None) -> list[dict]:
+    """
+    Runs the sessions in up to `processes` worker processes, each polling its gateways in an
+    asyncio event loop with at most `concurrency` connections (see `data_collector.workers`).
+    The groups due are fixed when the jobs are built; the results are those of `run_sessions`.
+    """
+    now = now or timezone.now()
+
+    results = []
+    plans = {}
+    jobs = []
+    for session in sessions:
+        data_groups = session.due_groups(now)
+        if not data_groups:
+            results.append(session.result(data_groups, [], []))
+            continue
+
+        plan = session.plan(data_groups)
+        plans[session.transductor.id] = (session, data_groups, plan)
+        jobs.append(
+            CollectionJob(
+                session.transductor.id,
+                session.ip_address,
+                int(session.port),
+                session.transductor.modbus_slave_id,
+                [block for _, block in plan],
+                session.transductor.pipeline_depth,
+            )
+        )
+
+    collected = collect_in_processes(jobs, processes, concurrency, settings.COLLECTOR_GATEWAY_CONCURRENCY)
+    for transductor_id, values, error in collected:
+        session, data_groups, plan = plans[transductor_id]
+        if error is not None:
+            results.append(session.result(data_groups, plan, None, error))
+            continue
+
+        values = iter(values)
+        block_values = [{attribute: next(values) for attribute in block["attributes"]} for _, block in plan]
+        results.append(session.result(data_groups, plan, block_values))
+
+    return results
+
+
+def run_sessions(sessions, concurrency: int) -> list[dict]:
+    """
+    Runs the sessions in `concurrency` threads, one gateway lane at a time per thread (at most
+    COLLECTOR_GATEWAY_CONCURRENCY lanes per gateway). Lanes are started in deadline order, since
+    the sessions come sorted.
+    """
+    results = []
+    lanes = gateway_lanes(sessions, settings.COLLECTOR_GATEWAY_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        future_list = [executor.submit(run_lane, lane) for lane in lanes]
+        for future in as_completed(future_list):
+            results.extend(future.result())
+
+    return results
@@ -0,0 +1,157 @@
+import bisect
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from data_collector.gateways import gateway_endpoint
+from data_collector.modbus.settings import (
+    DATA_GROUP_MINUTELY,
+    DATA_GROUP_MONTHLY,
+    DATA_GROUP_QUARTERLY,
+)
+from data_collector.models import CollectorInstance, CollectorLease
+
+# Points of each instance on the ring: more points split the transductors more evenly
+RING_REPLICAS = 64
+
+SLOT_PERIODS = {
+    DATA_GROUP_MINUTELY: timedelta(minutes=1),
+    DATA_GROUP_QUARTERLY: timedelta(minutes=15),
+}
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hashing of gateways over collector instances. Each instance owns the arcs of the
+    ring ending at its points, so when an instance joins or dies only the gateways of its arcs
+    change owner; the others keep being polled by the same instance.
+    """
+
+    def __init__(self, nodes, replicas: int = RING_REPLICAS):
+        points = sorted((ring_hash(f"{node}#{replica}"), node) for node in set(nodes) for replica in range(replicas))
+        self.hashes = [point for point, _ in points]
+        self.nodes = [node for _, node in points]
+
+    def owner(self, key: str):
+        if not self.nodes:
+            return None
+
+        index = bisect.bisect(self.hashes, ring_hash(key)) % len(self.hashes)
+        return self.nodes[index]
+
+
+def heartbeat(name: str, now=None) -> None:
+    now = now or timezone.now()
+    CollectorInstance.objects.bulk_create(
+        [CollectorInstance(name=name, started_at=now, heartbeat_at=now)],
+        update_conflicts=True,
+        unique_fields=["name"],
+        update_fields=["heartbeat_at"],
+    )
+
+
+def live_instances(name: str, now=None) -> list[str]:
+    """Instances whose heartbeat is younger than COLLECTOR_INSTANCE_TTL seconds (`name` included)."""
+    now = now or timezone.now()
+    alive_since = now - timedelta(seconds=settings.COLLECTOR_INSTANCE_TTL)
+
+    names = set(CollectorInstance.objects.filter(heartbeat_at__gte=alive_since).values_list("name", flat=True))
+    return sorted(names | {name})
+
+
+def collection_slot(data_group: str, now=None):
+    """Start of the collection period of `now`: its minute, quarter of hour or (local) month."""
+    now = timezone.localtime(now or timezone.now()).replace(second=0, microsecond=0)
+
+    if data_group == DATA_GROUP_QUARTERLY:
+        return now.replace(minute=now.minute - now.minute % 15)
+    if data_group == DATA_GROUP_MONTHLY:
+        return now.replace(day=1, hour=0, minute=0)
+    if data_group == DATA_GROUP_MINUTELY:
+        return now
+    raise ValueError(f"Unknown data_group: {data_group}")
+
+
+def next_collection_slot(data_group: str, slot):
+    """Start of the collection period following `slot`, which is the deadline of `slot`."""
+    if data_group == DATA_GROUP_MONTHLY:
+        return collection_slot(data_group, slot + timedelta(days=32))
+    return collection_slot(data_group, slot + SLOT_PERIODS[data_group])
+
+
+def missed_slots(data_group: str, last_slot, slot) -> int:
+    """Collection slots strictly between the `last_slot` collected and `slot` (0 without a last slot)."""
+    if last_slot is None or last_slot >= slot:
+        return 0
+
+    if data_group == DATA_GROUP_MONTHLY:
+        last_slot, slot = timezone.localtime(last_slot), timezone.localtime(slot)
+        return max((slot.year - last_slot.year) * 12 + slot.month - last_slot.month - 1, 0)
+    return max(int((slot - last_slot) / SLOT_PERIODS[data_group]) - 1, 0)
+
+
+def claim_slot(transductor_ids, data_group: str, name: str, slot, now=None) -> set:
+    """
+    Claims the collection `slot` of the transductors for the instance `name` and returns the ids
+    claimed: those whose lease was on an older slot. A single statement, so two instances can
+    never claim the same transductor and slot.
+    """
+    transductor_ids = list(transductor_ids)
+    if not transductor_ids:
+        return set()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO "{CollectorLease._meta.db_table}" AS lease
+                (transductor_id, data_group, instance, slot, claimed_at)
+            SELECT transductor_id, %s, %s, %s, %s FROM unnest(%s::bigint[]) AS transductor_id
+            ON CONFLICT (transductor_id, data_group) DO UPDATE
+            SET instance = EXCLUDED.instance, slot = EXCLUDED.slot, claimed_at = EXCLUDED.claimed_at
+            WHERE lease.slot < EXCLUDED.slot
+            RETURNING transductor_id
+            """,
+            [data_group, name, slot, now or timezone.now(), transductor_ids],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def ring_key(transductor) -> str:
+    """Key of a transductor on the ring: its gateway, so all the slaves of a bus go to one instance."""
+    ip_address, port = gateway_endpoint(transductor)
+    return f"{ip_address}:{port}"
+
+
+def owned_transductors(transductors, name: str, now=None) -> list:
+    """
+    Transductors the hash ring of the live instances gives the instance `name`. Records its heartbeat.
+    The ring splits gateways, not transductors: COLLECTOR_GATEWAY_CONCURRENCY holds within an instance.
+    """
+    now = now or timezone.now()
+
+    heartbeat(name, now)
+    ring = HashRing(live_instances(name, now))
+    return [transductor for transductor in transductors if ring.owner(ring_key(transductor)) == name]
+
+
+def assigned_transductors(transductors, data_group: str, name: str = None, now=None) -> list:
+    """
+    Transductors the collector instance `name` (COLLECTOR_INSTANCE) polls in the current slot:
+    the ones the hash ring of the live instances gives it, minus those another instance already
+    collected in this slot. Records the heartbeat of the instance.
+    """
+    name = name or settings.COLLECTOR_INSTANCE
+    now = now or timezone.now()
+
+    owned = owned_transductors(transductors, name, now)
+    claimed = claim_slot(
+        [transductor.id for transductor in owned], data_group, name, collection_slot(data_group, now), now
+    )
+    return [transductor for transductor in owned if transductor.id in claimed]
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from data_collector.autotune import (
+    HOLD_CYCLES,
+    INCREASE_STEP,
+    current_concurrency,
+    next_concurrency,
+    recent_reports,
+)
+from data_collector.models import CollectionReport
+
+
+@override_settings(COLLECTOR_INSTANCE="collector-a", COLLECTOR_CONCURRENCY_MIN=2, COLLECTOR_CONCURRENCY_MAX=64)
+class ConcurrencyAutotuneTestCase(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+
+    def report(self, concurrency, seconds, failed=0, due=100, sessions=100, instance="collector-a"):
+        """Saves the report of a run `seconds` long, one minute after the previous one."""
+        started_at = self.now
+        self.now += timedelta(minutes=1)
+        return CollectionReport.objects.create(
+            instance=instance,
+            slot=started_at,
+            started_at=started_at,
+            finished_at=started_at + timedelta(seconds=seconds),
+            data_groups={"minutely": {"due": due, "collected": due - failed, "failed": failed, "missed": 0}},
+            sessions=sessions,
+            concurrency=concurrency,
+        )
+
+    def test_first_runs(self):
+        with mock.patch("data_collector.autotune.multiprocessing.cpu_count", return_value=32):
+            self.assertEqual(64, next_concurrency([]))
+            self.assertEqual(64, current_concurrency())
+
+        self.report(8, 10)
+        self.assertEqual(8 + INCREASE_STEP, next_concurrency(recent_reports()))
+        self.assertEqual(8, current_concurrency())
+
+    def test_additive_increase_multiplicative_decrease(self):
+        self.report(8, 10, failed=2)
+        self.report(10, 9, failed=2)
+        self.assertEqual(12, next_concurrency(recent_reports()))
+
+        # the gateways start timing out
+        self.report(12, 12, failed=20)
+        self.assertEqual(6, next_concurrency(recent_reports()))
+
+        # the failures of offline meters do not hold it down
+        self.report(6, 14, failed=20)
+        self.assertEqual(8, next_concurrency(recent_reports()))
+
+    def test_slower_run_steps_back(self):
+        self.report(20, 10)
+        self.report(22, 12)
+
+        self.assertEqual(20, next_concurrency(recent_reports()))
+
+    def test_holds_after_stepping_back(self):
+        self.report(20, 10)
+        self.report(22, 12)
+        for _ in range(HOLD_CYCLES):
+            self.report(20, 10)
+            self.assertEqual(20, next_concurrency(recent_reports()))
+
+        # tries the higher level again once the hold is over
+        self.report(20, 10)
+        self.assertEqual(22, next_concurrency(recent_reports()))
+
+    def test_sustained_failures_keep_decreasing(self):
+        self.report(16, 10, failed=40)
+        self.report(16, 10, failed=40)
+        self.assertEqual(8, next_concurrency(recent_reports()))
+
+        self.report(8, 10, failed=40)
+        self.assertEqual(4, next_concurrency(recent_reports()))
+
+    def test_bounds_and_instances(self):
+        self.report(64, 10)
+        self.report(1, 10, instance="collector-b")
+
+        self.assertEqual(64, next_concurrency(recent_reports()))
+        self.assertEqual(2, current_concurrency("collector-b"))
+
+    def test_converges_below_the_timeouts(self):
+        """Devices time out past 24 lanes; below that, more lanes finish the cycle sooner."""
+        concurrency = 2
+        levels = []
+        for _ in range(40):
+            failed = 30 if concurrency > 24 else 0
+            self.report(concurrency, 600 / min(concurrency, 24) + failed, failed=failed)
+            concurrency = next_concurrency(recent_reports())
+            levels.append(concurrency)
+
+        self.assertEqual(26, max(levels))
+        self.assertTrue(all(level >= 12 for level in levels[20:]))
+        self.assertGreater(sum(levels[20:]) / 20, 18)
@@ -0,0 +1,126 @@
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from data_collector.gateways import collect_lane, gateway_lanes
+from data_collector.models import MemoryMap
+from transductor.models import Transductor
+from transductor.serializers import TransductorSerializer
+
+MINUTELY_BLOCKS = [
+    {
+        "start_address": 10,
+        "size": 4,
+        "type": "float32",
+        "byteorder": "f2-1-0-3",
+        "function": "read_input_register",
+        "attributes": ["voltage_a", "voltage_b"],
+    },
+]
+
+
+class SharedReader:
+    """Stands in for a `ModbusDataReader` shared by a lane; fails for the slaves in `failing`."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.connections = 0
+        self.requests = []
+        self.connected = False
+
+    def connect(self):
+        if not self.connected:
+            self.connections += 1
+            self.connected = True
+
+    def close(self):
+        self.connected = False
+
+    def read_blocks(self, register_blocks, slave_id):
+        self.requests.append(slave_id)
+        if slave_id in self.failing:
+            raise Exception(f"Timeout reading slave {slave_id}")
+        return {name: float(slave_id) for block in register_blocks for name in block["attributes"]}
+
+
+class GatewayTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=MINUTELY_BLOCKS,
+            quarterly=[],
+            monthly=[],
+        )
+
+    def create_transductor(self, pk, ip_address="10.0.0.1", slave_id=None, model="TR4020"):
+        return Transductor.objects.create(
+            id=pk,
+            serial_number=f"{pk:08d}",
+            ip_address=ip_address,
+            port=502,
+            slave_id=slave_id,
+            model=model,
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+    def test_slaves_share_a_gateway_endpoint(self):
+        self.create_transductor(1, slave_id=1)
+        self.create_transductor(2, slave_id=2)
+        kron = self.create_transductor(3, model="Kron Konect")
+
+        self.assertEqual(255, kron.slave_id)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.create_transductor(4, slave_id=2)
+
+    def test_serializer_rejects_a_taken_slave_id(self):
+        self.create_transductor(1, slave_id=1)
+        data = {
+            "id": 2,
+            "model": "TR4020",
+            "serial_number": "00000002",
+            "ip_address": "10.0.0.1",
+            "port": 502,
+            "firmware_version": "12.1.3215",
+            "geolocation_latitude": -24.45996,
+            "geolocation_longitude": -24.4556,
+        }
+
+        serializer = TransductorSerializer(data=data)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("slave_id", serializer.errors)
+
+        serializer = TransductorSerializer(data={**data, "slave_id": 2})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_lanes_limit_each_gateway_and_interleave_gateways(self):
+        bus = [self.create_transductor(pk, slave_id=pk) for pk in range(1, 6)]
+        single = self.create_transductor(10, ip_address="10.0.0.2")
+
+        lanes = gateway_lanes([*bus, single])
+        self.assertEqual([bus, [single]], lanes)
+
+        lanes = gateway_lanes([*bus, single], concurrency=2)
+        self.assertEqual([bus[0::2], [single], bus[1::2]], lanes)
+
+    def test_lane_shares_the_connection(self):
+        transductors = [self.create_transductor(pk, slave_id=pk) for pk in range(1, 4)]
+        reader = SharedReader(failing={2})
+
+        results = [transductor.collect_data("minutely", reader=reader) for transductor in transductors]
+
+        self.assertEqual([1, 2, 3], reader.requests)
+        self.assertEqual(2, reader.connections)  # reopened after the failed slave
+        self.assertEqual({"voltage_a": 3.0, "voltage_b": 3.0, "transductor": 3}, results[2]["collected"])
+        self.assertEqual("Timeout reading slave 2", results[1]["errors"])
+        self.assertTrue(Transductor.objects.get(id=2).broken)
+
+    def test_collect_lane_closes_its_reader(self):
+        transductor = self.create_transductor(1, ip_address="127.0.0.1", slave_id=1)
+        transductor.port = 1  # nothing listens there
+
+        results = collect_lane([transductor], "minutely")
+
+        self.assertTrue(results[0]["broken"])
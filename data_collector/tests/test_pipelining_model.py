@@ -0,0 +1,151 @@
+import socketserver
+import struct
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from pymodbus.exceptions import ModbusException
+
+from data_collector.modbus.data_reader import (
+    ModbusDataReader,
+    PipelinedModbusDataReader,
+    create_reader,
+    decode_registers,
+)
+from data_collector.modbus.helpers import pipeline_depth
+
+BLOCKS = [
+    {
+        "start_address": address,
+        "size": 4,
+        "type": "uint16",
+        "byteorder": "msb",
+        "function": "read_holding_register",
+        "attributes": [f"register_{address + offset}" for offset in range(4)],
+    }
+    for address in range(0, 40, 4)
+]
+
+
+def registers(address, count):
+    return [address * 10 + offset for offset in range(count)]
+
+
+class ReorderingHandler(socketserver.BaseRequestHandler):
+    """
+    Modbus TCP device with a deep pipeline: it waits for `depth` requests (or for the line to go
+    quiet), then answers them in reverse order.
+    """
+
+    depth = 4
+    max_outstanding = 0
+
+    def handle(self):
+        self.request.settimeout(0.2)
+        buffer = b""
+        while True:
+            try:
+                data = self.request.recv(1024)
+            except TimeoutError:
+                data = None
+            if data == b"":
+                return
+            buffer += data or b""
+
+            frames = []
+            while len(buffer) >= 12 and (data is None or len(frames) < self.depth):
+                frames.append(buffer[:12])
+                buffer = buffer[12:]
+            if not frames or (data is not None and len(frames) < self.depth):
+                buffer = b"".join(frames) + buffer
+                continue
+
+            ReorderingHandler.max_outstanding = max(ReorderingHandler.max_outstanding, len(frames))
+            for frame in reversed(frames):
+                transaction_id, _, _, unit_id, function_code, address, count = struct.unpack(">HHHBBHH", frame)
+                unit_id, pdu = self.respond(unit_id, function_code, address, count)
+                self.request.sendall(struct.pack(">HHHB", transaction_id, 0, len(pdu) + 1, unit_id) + pdu)
+
+    def respond(self, unit_id, function_code, address, count) -> tuple[int, bytes]:
+        data = struct.pack(f">{count}H", *registers(address, count))
+        return unit_id, struct.pack(">BB", function_code, len(data)) + data
+
+
+class FaultyHandler(ReorderingHandler):
+    """Answers with the unit id, the function code or the register count given in `fault`."""
+
+    depth = 1
+    fault = {}
+
+    def respond(self, unit_id, function_code, address, count) -> tuple[int, bytes]:
+        unit_id = self.fault.get("unit_id", unit_id)
+        function_code = self.fault.get("function_code", function_code)
+        count = self.fault.get("count", count)
+        return super().respond(unit_id, function_code, address, count)
+
+
+class PipelinedReaderTestCase(SimpleTestCase):
+    def setUp(self):
+        ReorderingHandler.max_outstanding = 0
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), ReorderingHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.port = self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_responses_are_matched_by_transaction_id(self):
+        reader = PipelinedModbusDataReader("127.0.0.1", self.port, slave_id=1, pipeline_depth=4)
+
+        collected_data = reader.read_datagroup_blocks(BLOCKS)
+
+        expected = {}
+        for block in BLOCKS:
+            expected |= decode_registers(block, registers(block["start_address"], block["size"]))
+        self.assertEqual(expected, collected_data)
+        self.assertEqual(4, ReorderingHandler.max_outstanding)
+
+    def test_connection_is_reused_across_slaves(self):
+        reader = PipelinedModbusDataReader("127.0.0.1", self.port, slave_id=None, pipeline_depth=4)
+        reader.connect()
+        try:
+            first = reader.read_blocks(BLOCKS[:4], slave_id=1)
+            second = reader.read_blocks(BLOCKS[:4], slave_id=2)
+        finally:
+            reader.close()
+
+        self.assertEqual(first, second)
+        self.assertIsNone(reader.client)
+
+    def test_connection_failure(self):
+        reader = PipelinedModbusDataReader("127.0.0.1", 1, slave_id=1, pipeline_depth=4)
+        with self.assertRaisesMessage(Exception, "Connection failure with client: 127.0.0.1"):
+            reader.read_datagroup_blocks(BLOCKS)
+
+    def test_responses_not_matching_the_request_are_rejected(self):
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FaultyHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        faults = {
+            "unit 2, function 3 to a request to unit 1, function 3": {"unit_id": 2},
+            "unit 1, function 4 to a request to unit 1, function 3": {"function_code": 4},
+            "Response of 4 bytes to a request of 8 bytes": {"count": 2},
+        }
+        for message, fault in faults.items():
+            with self.subTest(fault=fault), mock.patch.object(FaultyHandler, "fault", fault):
+                reader = PipelinedModbusDataReader("127.0.0.1", server.server_address[1], slave_id=1, pipeline_depth=2)
+                with self.assertRaisesMessage(ModbusException, message):
+                    reader.read_datagroup_blocks(BLOCKS[:1])
+
+    @override_settings(MODBUS_PIPELINE_DEPTH={"md30": 8})
+    def test_pipeline_depth_per_model(self):
+        self.assertEqual(8, pipeline_depth("MD30"))
+        self.assertEqual(1, pipeline_depth("TR4020"))
+        self.assertIsInstance(create_reader("127.0.0.1", 502, 1, pipeline_depth("MD30")), PipelinedModbusDataReader)
+        self.assertNotIsInstance(create_reader("127.0.0.1", 502, 1, 1), PipelinedModbusDataReader)
+        self.assertIsInstance(create_reader("127.0.0.1", 502, 1, 1), ModbusDataReader)
@@ -0,0 +1,235 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from data_collector.models import MemoryMap
+from data_collector.sampling import (
+    GatewaySampler,
+    SampleBuffer,
+    TransductorSampler,
+    cover_transductors,
+    select_blocks,
+)
+from data_collector.scheduler import plan_sessions
+from data_collector.sharding import claim_slot
+from events.models import CriticalVoltageEvent, FailedConnectionTransductorEvent
+from transductor.models import Transductor
+
+MINUTELY_BLOCKS = [
+    {
+        "start_address": 10,
+        "size": 8,
+        "type": "float32",
+        "byteorder": "f2-1-0-3",
+        "function": "read_input_register",
+        "attributes": ["voltage_a", "voltage_b", "voltage_c", "current_a"],
+    },
+    {
+        "start_address": 40,
+        "size": 6,
+        "type": "float32",
+        "byteorder": "f2-1-0-3",
+        "function": "read_input_register",
+        "attributes": ["active_power_a", "frequency_a", "reactive_power_a"],
+    },
+]
+
+
+class FakeReader:
+    """Stands in for `ModbusDataReader`: returns the queued readings of the requested attributes."""
+
+    def __init__(self):
+        self.readings = []
+        self.requests = []
+        self.slave_ids = []
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def read_blocks(self, register_blocks, slave_id=None):
+        self.requests.append(register_blocks)
+        self.slave_ids.append(slave_id)
+        reading = self.readings.pop(0)
+        attributes = [name for block in register_blocks for name in block["attributes"]]
+        return {name: reading.get(name) for name in attributes}
+
+
+class HighRateSamplingTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=MINUTELY_BLOCKS,
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+        self.minute = timezone.make_aware(datetime(2023, 6, 5, 14, 0, 0))
+        self.reader = FakeReader()
+
+    def create_sampler(self, attributes=("voltage_a", "voltage_b", "voltage_c", "frequency_a")):
+        return TransductorSampler(self.transductor, set(attributes), capacity=30)
+
+    def test_select_blocks_reads_only_the_sampled_span(self):
+        blocks = select_blocks(MINUTELY_BLOCKS, {"voltage_a", "voltage_c", "frequency_a"})
+
+        self.assertEqual([(10, 6), (42, 2)], [(block["start_address"], block["size"]) for block in blocks])
+        self.assertEqual(["voltage_a", "voltage_b", "voltage_c"], blocks[0]["attributes"])
+        self.assertEqual(["frequency_a"], blocks[1]["attributes"])
+
+    def test_buffer_aggregates_window_and_overwrites_oldest(self):
+        buffer = SampleBuffer(["voltage_a", "frequency_a"], capacity=3)
+        for second, voltage in enumerate([210, 220, 230, 240]):
+            buffer.append(second, {"voltage_a": voltage, "frequency_a": None})
+
+        stats = buffer.aggregate(0, 10)
+        self.assertEqual({"min": 220.0, "max": 240.0, "avg": 230.0, "samples": 3}, stats["voltage_a"])
+        self.assertNotIn("frequency_a", stats)
+        self.assertEqual({}, buffer.aggregate(10, 20))
+
+    def test_minutely_row_replaces_sampled_attributes_with_average(self):
+        sampler = self.create_sampler()
+        for second, voltage in zip(range(0, 60, 5), [220, 221, 222, 190] + [220] * 8):
+            self.reader.readings.append({"voltage_a": voltage, "voltage_b": 220, "voltage_c": 220})
+            sampler.sample(self.reader, (self.minute + timedelta(seconds=second)).timestamp())
+
+        self.reader.readings.append({"voltage_a": 219, "current_a": 5, "frequency_a": 60})
+        row = sampler.minutely_row(self.reader, self.minute, self.minute + timedelta(minutes=1))
+
+        self.assertEqual(MINUTELY_BLOCKS, self.reader.requests[-1])
+        self.assertEqual(self.transductor.id, row["transductor"])
+        self.assertEqual(5, row["current_a"])
+        self.assertEqual(217.75, row["voltage_a"])
+        self.assertEqual(
+            {"min": 190.0, "max": 222.0, "avg": 217.75, "samples": 12}, row["high_rate_stats"]["voltage_a"]
+        )
+
+    def test_sag_between_minutely_reads_opens_event(self):
+        sampler = self.create_sampler()
+        for voltage in [220, 180, 220]:
+            self.reader.readings.append({"voltage_a": voltage, "voltage_b": 220, "voltage_c": 220})
+            sampler.sample(self.reader, self.minute.timestamp())
+
+        self.assertEqual(1, CriticalVoltageEvent.objects.filter(transductor=self.transductor).count())
+        self.assertLessEqual(len(sampler.debouncers["voltage_a"].data_history), 15)
+
+    @override_settings(COLLECTOR_INSTANCE="collector-a", COLLECTOR_INSTANCE_TTL=180)
+    def test_collectors_skip_only_the_transductors_the_sampler_covers(self):
+        other = Transductor.objects.create(
+            id=2,
+            serial_number="12345678",
+            ip_address="111.111.111.12",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+        claim_slot([other.id], "minutely", "collector-a", self.minute)
+
+        covered, current = cover_transductors(Transductor.objects.filter(id=1), set(), now=self.minute)
+        self.assertEqual([self.transductor], covered)
+        self.assertEqual({1}, current)
+
+        next_minute = self.minute + timedelta(minutes=1)
+        sessions, _ = plan_sessions(Transductor.objects.all(), ["minutely"], now=next_minute)
+        self.assertEqual([other], [session.transductor for session in sessions])
+
+        # once the sampler stops claiming the next minutes, the collectors take the transductor back
+        sessions, _ = plan_sessions(Transductor.objects.all(), ["minutely"], now=next_minute + timedelta(minutes=1))
+        self.assertEqual({1, 2}, {session.transductor.id for session in sessions})
+
+    @override_settings(COLLECTOR_INSTANCE="collector-a", COLLECTOR_INSTANCE_TTL=180)
+    def test_minute_already_collected_is_left_to_the_collector(self):
+        claim_slot([self.transductor.id], "minutely", "collector-a", self.minute)
+
+        covered, current = cover_transductors(Transductor.objects.all(), set(), now=self.minute)
+        self.assertEqual([self.transductor], covered)
+        self.assertEqual(set(), current)
+
+        sampler = self.create_sampler()
+        sampler.first_minute = self.minute + timedelta(minutes=1)
+        gateway = GatewaySampler([sampler], interval=5, reader=self.reader)
+        self.assertEqual([], gateway.minutely_rows(self.minute, self.minute + timedelta(minutes=1)))
+
+    def test_failed_minutely_reading_sets_the_transductor_broken(self):
+        sampler = self.create_sampler()
+        gateway = GatewaySampler([sampler], interval=5, reader=self.reader)
+
+        self.assertEqual([], gateway.minutely_rows(self.minute, self.minute + timedelta(minutes=1)))
+        self.assertEqual([], gateway.samplers)
+
+        self.transductor.refresh_from_db()
+        self.assertTrue(self.transductor.broken)
+        self.assertEqual(1, FailedConnectionTransductorEvent.objects.filter(transductor=self.transductor).count())
+
+    def test_update_swaps_the_samplers_between_rounds(self):
+        kept, removed = self.create_sampler(), self.create_sampler()
+        gateway = GatewaySampler([kept, removed], interval=5, reader=self.reader)
+
+        gateway.update([kept])
+        self.assertEqual([kept, removed], gateway.samplers)
+        gateway.apply_update()
+        self.assertEqual([kept], gateway.samplers)
+
+    def test_slaves_of_a_gateway_share_its_connection(self):
+        other = Transductor.objects.create(
+            id=2,
+            serial_number="12345678",
+            ip_address=self.transductor.ip_address,
+            port=self.transductor.port,
+            slave_id=2,
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+        samplers = [self.create_sampler(), TransductorSampler(other, {"voltage_a"}, capacity=30)]
+        gateway = GatewaySampler(samplers, interval=5)
+
+        with mock.patch("data_collector.sampling.create_reader", return_value=self.reader) as create_reader:
+            self.reader.readings += [{"voltage_a": 220}, {"voltage_a": 221}]
+            gateway.sample_round(self.minute.timestamp())
+
+        create_reader.assert_called_once_with(self.transductor.ip_address, self.transductor.port, pipeline_depth=1)
+        self.assertEqual([self.transductor.modbus_slave_id, 2], self.reader.slave_ids)
+        self.assertEqual(221.0, samplers[1].buffer.aggregate(0, float("inf"))["voltage_a"]["avg"])
+
+    def test_sampler_lock_is_held_off_the_recycled_connection(self):
+        def advisory_locks():
+            """Advisory locks held by other backends than the default connection, which the sampler recycles."""
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND pid <> pg_backend_pid()")
+                return cursor.fetchone()[0]
+
+        def sample(attributes, interval, capacity):
+            self.assertEqual(1, advisory_locks())
+
+        with mock.patch(
+            "data_collector.management.commands.sample_high_rate.Command.sample", side_effect=sample
+        ) as sampled:
+            call_command("sample_high_rate")
+
+        sampled.assert_called_once()
+        self.assertEqual(0, advisory_locks())
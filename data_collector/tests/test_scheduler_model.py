@@ -0,0 +1,226 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from data_collector.modbus.settings import DataGroups
+from data_collector.models import CollectionReport, CollectorLease, MemoryMap
+from data_collector.scheduler import (
+    CollectionSession,
+    plan_sessions,
+    run_sessions_in_processes,
+)
+from data_collector.sharding import missed_slots, next_collection_slot
+from data_collector.workers import collect_shard
+from measurement.models import MinutelyMeasurement, ReferenceMeasurement
+from transductor.models import Transductor
+
+
+def block(address, attributes):
+    return {
+        "start_address": address,
+        "size": 2 * len(attributes),
+        "type": "float32",
+        "byteorder": "f2-1-0-3",
+        "function": "read_input_register",
+        "attributes": attributes,
+    }
+
+
+class PlanReader:
+    """Stands in for a Modbus reader: records each request plan and answers the address of each block."""
+
+    def __init__(self, *args, **kwargs):
+        self.plans = []
+        self.connections = 0
+
+    def connect(self):
+        self.connections += 1
+
+    def close(self):
+        pass
+
+    def read_block_values(self, register_blocks, slave_id=None):
+        self.plans.append([register_block["start_address"] for register_block in register_blocks])
+        return [
+            {attribute: float(register_block["start_address"]) for attribute in register_block["attributes"]}
+            for register_block in register_blocks
+        ]
+
+
+class AsyncPlanReader:
+    """`PlanReader` for the worker processes (`data_collector.workers`)."""
+
+    def __init__(self, ip_address, port, pipeline_depth=1):
+        pass
+
+    async def read_block_values(self, register_blocks, slave_id):
+        return PlanReader().read_block_values(register_blocks, slave_id)
+
+    async def close(self):
+        pass
+
+
+def collect_in_this_process(jobs, processes, concurrency, gateway_concurrency=1):
+    """`collect_in_processes` without forking, which would close the connection of the test case."""
+    return collect_shard(jobs, concurrency, gateway_concurrency, reader_class=AsyncPlanReader)
+
+
+@override_settings(COLLECTOR_INSTANCE="collector-a", COLLECTOR_INSTANCE_TTL=180)
+class CollectionSchedulerTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[block(10, ["voltage_a", "voltage_b"])],
+            quarterly=[block(100, ["generated_energy_peak_time"])],
+            monthly=[block(200, ["generated_energy_peak_time"])],
+        )
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port=502,
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+    def test_slots(self):
+        quarter = timezone.make_aware(datetime(2023, 6, 5, 14, 45))
+
+        self.assertEqual(quarter + timedelta(minutes=15), next_collection_slot("quarterly", quarter))
+        self.assertEqual(
+            timezone.make_aware(datetime(2023, 7, 1)),
+            next_collection_slot("monthly", timezone.make_aware(datetime(2023, 6, 1))),
+        )
+        self.assertEqual(3, missed_slots("quarterly", quarter - timedelta(hours=1), quarter))
+        self.assertEqual(0, missed_slots("minutely", quarter - timedelta(minutes=1), quarter))
+        self.assertEqual(0, missed_slots("minutely", None, quarter))
+        self.assertEqual(
+            2,
+            missed_slots(
+                "monthly", timezone.make_aware(datetime(2023, 3, 1)), timezone.make_aware(datetime(2023, 6, 1))
+            ),
+        )
+
+    def test_quarter_boundary_merges_the_due_groups(self):
+        quarter = timezone.make_aware(datetime(2023, 6, 5, 14, 45, 2))
+        CollectorLease.objects.create(
+            transductor=self.transductor,
+            data_group="monthly",
+            instance="collector-a",
+            slot=quarter.replace(day=1, hour=0, minute=0, second=0),
+        )
+        CollectorLease.objects.create(
+            transductor=self.transductor,
+            data_group="quarterly",
+            instance="collector-a",
+            slot=quarter.replace(minute=0, second=0),
+        )
+
+        sessions, missed = plan_sessions(Transductor.objects.all(), ["minutely", "quarterly", "monthly"], now=quarter)
+
+        self.assertEqual(1, len(sessions))
+        self.assertEqual({"minutely", "quarterly"}, set(sessions[0].deadlines))
+        self.assertEqual(quarter.replace(minute=46, second=0), sessions[0].deadline)
+        self.assertEqual({"minutely": 0, "quarterly": 2, "monthly": 0}, missed)
+
+        sessions, _ = plan_sessions(
+            Transductor.objects.all(), ["minutely", "quarterly"], now=quarter + timedelta(minutes=1)
+        )
+        self.assertEqual({"minutely"}, set(sessions[0].deadlines))
+
+    def test_monthly_group_is_due_at_the_turn_of_the_month_only(self):
+        month = timezone.make_aware(datetime(2023, 7, 1, 0, 0, 3))
+        CollectorLease.objects.create(
+            transductor=self.transductor,
+            data_group="monthly",
+            instance="collector-a",
+            slot=timezone.make_aware(datetime(2023, 5, 1)),
+        )
+
+        # the first run of the month, e.g. after a restart, is not the turn of the month
+        sessions, missed = plan_sessions(Transductor.objects.all(), ["monthly"], now=month - timedelta(days=20))
+        self.assertEqual([], sessions)
+        self.assertEqual({"monthly": 0}, missed)
+
+        sessions, missed = plan_sessions(Transductor.objects.all(), ["monthly"], now=month)
+        self.assertEqual({"monthly"}, set(sessions[0].deadlines))
+        self.assertEqual({"monthly": 1}, missed)
+
+        sessions, _ = plan_sessions(Transductor.objects.all(), ["monthly"], now=month + timedelta(minutes=1))
+        self.assertEqual([], sessions)
+
+    def test_session_reads_all_groups_through_one_plan(self):
+        now = timezone.now()
+        session = CollectionSession(self.transductor)
+        session.add("minutely", now + timedelta(minutes=1))
+        session.add("quarterly", now + timedelta(minutes=15))
+        session.add("monthly", now - timedelta(seconds=1))
+        reader = PlanReader()
+
+        result = session.run(reader, now=now)
+
+        self.assertEqual([[10, 100]], reader.plans)
+        self.assertEqual(["monthly"], result["missed"])
+        self.assertEqual(
+            {
+                "minutely": {"transductor": 1, "voltage_a": 10.0, "voltage_b": 10.0},
+                "quarterly": {"transductor": 1, "generated_energy_peak_time": 100.0},
+            },
+            result["collected"],
+        )
+
+    def test_collect_scheduled(self):
+        reader = PlanReader()
+        with mock.patch("data_collector.scheduler.create_reader", return_value=reader):
+            call_command("collect_scheduled", stdout=mock.MagicMock())
+
+        self.assertEqual(1, reader.connections)
+        # the monthly group waits for the turn of the month
+        self.assertEqual([[10, 100]], reader.plans)
+        self.assertEqual(1, MinutelyMeasurement.objects.count())
+        # the first quarterly reading becomes the reference of the next ones
+        self.assertTrue(
+            ReferenceMeasurement.objects.filter(transductor=self.transductor, data_group=DataGroups.QUARTERLY)
+        )
+
+        report = CollectionReport.objects.get()
+        self.assertEqual("collector-a", report.instance)
+        self.assertEqual(1, report.sessions)
+        self.assertIsNotNone(report.concurrency)
+        self.assertEqual({"due": 1, "collected": 1, "failed": 0, "missed": 0}, report.data_groups["quarterly"])
+
+    def test_sessions_run_in_worker_processes(self):
+        now = timezone.now()
+        session = CollectionSession(self.transductor)
+        session.add("minutely", now + timedelta(minutes=1))
+        session.add("quarterly", now + timedelta(minutes=15))
+        session.add("monthly", now + timedelta(days=1))
+
+        with mock.patch("data_collector.scheduler.collect_in_processes", side_effect=collect_in_this_process):
+            [result] = run_sessions_in_processes([session], processes=2, concurrency=4, now=now)
+
+        # the same attribute read by two groups keeps the value of its own block
+        self.assertEqual(
+            {
+                "minutely": {"transductor": 1, "voltage_a": 10.0, "voltage_b": 10.0},
+                "quarterly": {"transductor": 1, "generated_energy_peak_time": 100.0},
+                "monthly": {"transductor": 1, "generated_energy_peak_time": 200.0},
+            },
+            result["collected"],
+        )
+
+    @override_settings(COLLECTOR_PROCESSES=2)
+    def test_collect_scheduled_in_processes(self):
+        with mock.patch("data_collector.scheduler.collect_in_processes", side_effect=collect_in_this_process):
+            call_command("collect_scheduled", stdout=mock.MagicMock())
+
+        self.assertEqual(1, MinutelyMeasurement.objects.count())
+        report = CollectionReport.objects.get()
+        self.assertEqual({"due": 1, "collected": 1, "failed": 0, "missed": 0}, report.data_groups["minutely"])
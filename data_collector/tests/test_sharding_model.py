@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from data_collector.models import CollectorInstance, CollectorLease, MemoryMap
+from data_collector.sharding import (
+    HashRing,
+    assigned_transductors,
+    claim_slot,
+    collection_slot,
+)
+from transductor.models import Transductor
+
+
+class HashRingTestCase(TestCase):
+    def test_owners_move_only_from_the_instance_that_left(self):
+        keys = [str(transductor_id) for transductor_id in range(1, 301)]
+        ring = HashRing(["a", "b", "c"])
+        owners = {key: ring.owner(key) for key in keys}
+
+        self.assertEqual({"a", "b", "c"}, set(owners.values()))
+        for node in ["a", "b", "c"]:
+            self.assertGreater(list(owners.values()).count(node), 50)
+
+        ring = HashRing(["a", "b"])
+        for key, owner in owners.items():
+            if owner != "c":
+                self.assertEqual(owner, ring.owner(key))
+
+    def test_empty_ring(self):
+        self.assertIsNone(HashRing([]).owner("1"))
+
+
+@override_settings(COLLECTOR_INSTANCE_TTL=180)
+class CollectorShardingTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductors = [
+            Transductor.objects.create(
+                id=transductor_id,
+                serial_number=f"876543{transductor_id:02}",
+                ip_address=f"111.111.111.{transductor_id}",
+                port="1234",
+                model="TR4020",
+                firmware_version="12.1.3215",
+                geolocation_longitude=-24.4556,
+                geolocation_latitude=-24.45996,
+                memory_map=self.memory_map,
+            )
+            for transductor_id in range(1, 21)
+        ]
+        self.now = timezone.make_aware(datetime(2023, 6, 5, 14, 7, 20))
+
+    def assigned_ids(self, name, now, data_group="minutely"):
+        return {transductor.id for transductor in assigned_transductors(self.transductors, data_group, name, now)}
+
+    def test_instances_split_the_transductors(self):
+        CollectorInstance.objects.create(name="b", heartbeat_at=self.now)
+
+        a = self.assigned_ids("a", self.now)
+        b = self.assigned_ids("b", self.now + timedelta(seconds=5))
+
+        self.assertTrue(a and b)
+        self.assertFalse(a & b)
+        self.assertEqual(set(range(1, 21)), a | b)
+
+    def test_slaves_of_a_gateway_go_to_one_instance(self):
+        CollectorInstance.objects.create(name="b", heartbeat_at=self.now)
+        for transductor in self.transductors:
+            transductor.ip_address = f"111.111.111.{transductor.id % 4}"
+
+        a = self.assigned_ids("a", self.now)
+        b = self.assigned_ids("b", self.now + timedelta(seconds=5))
+
+        self.assertTrue(a and b)
+        self.assertEqual(set(range(1, 21)), a | b)
+        for transductor_ids in [a, b]:
+            gateways = {transductor_id % 4 for transductor_id in transductor_ids}
+            self.assertEqual(5 * len(gateways), len(transductor_ids))
+
+    def test_dead_instance_transductors_are_taken_over(self):
+        CollectorInstance.objects.create(name="b", heartbeat_at=self.now - timedelta(minutes=10))
+
+        self.assertEqual(set(range(1, 21)), self.assigned_ids("a", self.now))
+
+    def test_transductor_polled_once_per_slot(self):
+        self.assertEqual(20, len(self.assigned_ids("a", self.now)))
+
+        # a second run in the same minute (or an instance not seen yet by the others) gets nothing
+        self.assertEqual(set(), self.assigned_ids("a", self.now + timedelta(seconds=30)))
+        self.assertEqual(set(), claim_slot([1, 2], "minutely", "c", collection_slot("minutely", self.now)))
+
+        self.assertEqual(20, len(self.assigned_ids("a", self.now + timedelta(minutes=1))))
+        self.assertEqual(20, len(self.assigned_ids("a", self.now, data_group="quarterly")))
+        self.assertEqual(40, CollectorLease.objects.count())
+
+    def test_collection_slots(self):
+        self.assertEqual(timezone.make_aware(datetime(2023, 6, 5, 14, 7)), collection_slot("minutely", self.now))
+        self.assertEqual(timezone.make_aware(datetime(2023, 6, 5, 14, 0)), collection_slot("quarterly", self.now))
+        self.assertEqual(timezone.make_aware(datetime(2023, 6, 1)), collection_slot("monthly", self.now))
@@ -0,0 +1,182 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from pymodbus.constants import Endian
+from pymodbus.payload import BinaryPayloadBuilder
+
+from data_collector.management.commands.collect_data import (
+    Command as CollectDataCommand,
+)
+from data_collector.modbus.data_reader import decode_registers
+from data_collector.models import MemoryMap
+from data_collector.workers import (
+    CollectionJob,
+    collect_in_processes,
+    collect_shard,
+    shard_jobs,
+)
+from measurement.models import MinutelyMeasurement
+from transductor.models import Transductor
+
+BLOCKS = [
+    {
+        "start_address": 10,
+        "size": 4,
+        "type": "float32",
+        "byteorder": "f2-1-0-3",
+        "function": "read_input_register",
+        "attributes": ["voltage_a", "voltage_b"],
+    },
+    {
+        "start_address": 40,
+        "size": 2,
+        "type": "float32",
+        "byteorder": "f2-1-0-3",
+        "function": "read_input_register",
+        "attributes": ["frequency_a"],
+    },
+]
+
+
+class FakeGatewayReader:
+    """Stands in for `AsyncModbusDataReader`: the values of a slave are derived from its id."""
+
+    failing = {"10.0.0.9"}
+    open_gateways = 0
+    max_open_gateways = 0
+
+    def __init__(self, ip_address, port, pipeline_depth=1):
+        self.ip_address = ip_address
+        self.connected = False
+
+    async def read_block_values(self, register_blocks, slave_id):
+        if not self.connected:
+            self.connected = True
+            FakeGatewayReader.open_gateways += 1
+            FakeGatewayReader.max_open_gateways = max(FakeGatewayReader.max_open_gateways, self.open_gateways)
+
+        await asyncio.sleep(0.001)
+        if self.ip_address in self.failing:
+            raise Exception(f"Connection failure with client: {self.ip_address}")
+        return [{attribute: 200.0 + slave_id for attribute in block["attributes"]} for block in register_blocks]
+
+    async def close(self):
+        if self.connected:
+            self.connected = False
+            FakeGatewayReader.open_gateways -= 1
+
+
+class StaleGatewayReader:
+    """A gateway that still sends the response of a timed out slave on the connection it was asked on."""
+
+    def __init__(self, ip_address, port, pipeline_depth=1):
+        self.stale_slave_id = None
+
+    async def read_block_values(self, register_blocks, slave_id):
+        if self.stale_slave_id is not None:
+            slave_id = self.stale_slave_id
+        elif slave_id == 7:
+            self.stale_slave_id = slave_id
+            raise Exception("Timed out")
+        return [{attribute: 200.0 + slave_id for attribute in block["attributes"]} for block in register_blocks]
+
+    async def close(self):
+        self.stale_slave_id = None
+
+
+def job(transductor_id, ip_address, slave_id=1):
+    return CollectionJob(transductor_id, ip_address, 502, slave_id, BLOCKS)
+
+
+class CollectionWorkersTestCase(SimpleTestCase):
+    def test_shards_keep_gateways_together(self):
+        jobs = [job(index, f"10.0.0.{index % 5}", slave_id=index) for index in range(20)]
+        jobs += [job(100 + index, "10.0.0.100", slave_id=index) for index in range(6)]
+
+        shards = shard_jobs(jobs, 3)
+
+        self.assertEqual(3, len(shards))
+        self.assertEqual(
+            sorted(job.transductor_id for job in jobs), sorted(j.transductor_id for s in shards for j in s)
+        )
+        for ip_address in {job.ip_address for job in jobs}:
+            self.assertEqual(1, sum(any(j.ip_address == ip_address for j in shard) for shard in shards))
+        self.assertLessEqual(max(map(len, shards)) - min(map(len, shards)), 4)
+
+        self.assertEqual(1, len(shard_jobs(jobs[:1], 4)))
+
+    def test_decode_registers(self):
+        builder = BinaryPayloadBuilder(byteorder=Endian.Little, wordorder=Endian.Little)
+        builder.add_32bit_float(220.5)
+        builder.add_32bit_float(219.25)
+
+        self.assertEqual(
+            {"voltage_a": 220.5, "voltage_b": 219.25},
+            decode_registers(BLOCKS[0], builder.to_registers()),
+        )
+
+    def test_collect_shard_reads_gateways_concurrently(self):
+        FakeGatewayReader.max_open_gateways = 0
+        jobs = [job(index, f"10.0.0.{index % 4}", slave_id=index) for index in range(12)] + [job(99, "10.0.0.9")]
+
+        results = {result[0]: result for result in collect_shard(jobs, 2, reader_class=FakeGatewayReader)}
+
+        self.assertEqual(13, len(results))
+        self.assertEqual((5, (205.0, 205.0, 205.0), None), results[5])
+        self.assertEqual((99, None, "Connection failure with client: 10.0.0.9"), results[99])
+        self.assertEqual(2, FakeGatewayReader.max_open_gateways)
+
+    def test_failed_slave_resets_the_gateway_connection(self):
+        jobs = [job(7, "10.0.0.1", slave_id=7), job(8, "10.0.0.1", slave_id=8)]
+
+        results = collect_shard(jobs, 1, reader_class=StaleGatewayReader)
+
+        self.assertEqual([(7, None, "Timed out"), (8, (208.0, 208.0, 208.0), None)], results)
+
+    def test_collect_in_processes(self):
+        jobs = [job(index, f"10.0.0.{index % 6}", slave_id=index) for index in range(30)]
+
+        results = collect_in_processes(jobs, 3, 4, reader_class=FakeGatewayReader)
+
+        self.assertEqual(list(range(30)), sorted(result[0] for result in results))
+        self.assertTrue(all(values == (200.0 + pk,) * 3 and error is None for pk, values, error in results))
+
+
+class CollectDataProcessesTestCase(TestCase):
+    def setUp(self):
+        memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=BLOCKS,
+            quarterly=[],
+            monthly=[],
+        )
+
+        for pk, ip_address in [(1, "10.0.0.1"), (2, "10.0.0.9")]:
+            Transductor.objects.create(
+                id=pk,
+                serial_number=f"8765432{pk}",
+                ip_address=ip_address,
+                port="502",
+                model="TR4020",
+                firmware_version="12.1.3215",
+                geolocation_longitude=-24.4556,
+                geolocation_latitude=-24.45996,
+                memory_map=memory_map,
+            )
+
+    def test_collect_data_with_processes(self):
+        def collect(jobs, processes, concurrency, gateway_concurrency):
+            # in process: a fork would share the connection of the test transaction
+            return collect_shard(jobs, concurrency, gateway_concurrency, FakeGatewayReader)
+
+        with mock.patch("data_collector.management.commands.collect_data.collect_in_processes", side_effect=collect):
+            collected = CollectDataCommand().collect_data("minutely", processes=2)
+
+        self.assertEqual(1, collected)
+        measurement = MinutelyMeasurement.objects.get()
+        self.assertEqual(
+            (1, 201.0, 201.0), (measurement.transductor_id, measurement.voltage_a, measurement.frequency_a)
+        )
+        self.assertTrue(Transductor.objects.get(id=2).broken)
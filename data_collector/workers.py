@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import multiprocessing
+from collections import defaultdict
+from typing import NamedTuple
+
+from django.db import connections
+
+from data_collector.gateways import gateway_endpoint, gateway_lanes
+from data_collector.modbus.data_reader import AsyncModbusDataReader
+
+logger = logging.getLogger("tasks")
+
+
+class CollectionJob(NamedTuple):
+    """What a worker process needs to read a transductor; picklable and without database access."""
+
+    transductor_id: int
+    ip_address: str
+    port: int
+    slave_id: int
+    register_blocks: list
+    pipeline_depth: int = 1
+
+    @property
+    def attributes(self) -> list[str]:
+        return [attribute for block in self.register_blocks for attribute in block["attributes"]]
+
+    @classmethod
+    def for_transductor(cls, transductor, data_group: str):
+        register_blocks = getattr(transductor.memory_map, data_group)
+        return cls(
+            transductor.id,
+            transductor.ip_address,
+            int(transductor.port),
+            transductor.modbus_slave_id,
+            register_blocks,
+            transductor.pipeline_depth,
+        )
+
+
+def shard_jobs(jobs: list[CollectionJob], shards: int) -> list[list[CollectionJob]]:
+    """
+    Splits the jobs into `shards` lists of about the same size. The transductors of a gateway go
+    to the same shard, so that the concurrency limit of a gateway holds across processes.
+    """
+    gateways = defaultdict(list)
+    for job in jobs:
+        gateways[gateway_endpoint(job)].append(job)
+
+    sharded = [[] for _ in range(shards)]
+    # largest gateways first, each one to the least loaded shard
+    for gateway in sorted(gateways, key=lambda gateway: (-len(gateways[gateway]), gateway)):
+        min(sharded, key=len).extend(gateways[gateway])
+
+    return [shard for shard in sharded if shard]
+
+
+async def collect_lane_async(jobs: list[CollectionJob], semaphore, reader_class) -> list[tuple]:
+    """Reads the transductors of a gateway lane one after the other; see `collect_shard`."""
+    results = []
+    async with semaphore:
+        reader = reader_class(jobs[0].ip_address, jobs[0].port, min(job.pipeline_depth for job in jobs))
+        try:
+            for job in jobs:
+                try:
+                    block_values = await reader.read_block_values(job.register_blocks, job.slave_id)
+                    values = tuple(
+                        values.get(attribute)
+                        for block, values in zip(job.register_blocks, block_values)
+                        for attribute in block["attributes"]
+                    )
+                    results.append((job.transductor_id, values, None))
+                except Exception as e:
+                    results.append((job.transductor_id, None, str(e)))
+                    # a late response of the failed slave must not be read as the answer to the next one
+                    await reader.close()
+        finally:
+            await reader.close()
+
+    return results
+
+
+async def collect_shard_async(
+    jobs: list[CollectionJob], concurrency: int, gateway_concurrency: int, reader_class
+) -> list[tuple]:
+    semaphore = asyncio.Semaphore(concurrency)
+    gathered = await asyncio.gather(
+        *[collect_lane_async(lane, semaphore, reader_class) for lane in gateway_lanes(jobs, gateway_concurrency)]
+    )
+    return [result for results in gathered for result in results]
+
+
+def collect_shard(
+    jobs: list[CollectionJob], concurrency: int, gateway_concurrency: int = 1, reader_class=AsyncModbusDataReader
+) -> list[tuple]:
+    """
+    Worker process entry point: reads and decodes a shard of transductors in an asyncio event
+    loop, at most `concurrency` connections at a time and `gateway_concurrency` per gateway
+    (see `data_collector.gateways`). Returns one compact result per transductor,
+    `(transductor id, values in the order of job.attributes or None, error or None)`.
+    """
+    return asyncio.run(collect_shard_async(jobs, concurrency, gateway_concurrency, reader_class))
+
+
+def collect_in_processes(
+    jobs: list[CollectionJob],
+    processes: int,
+    concurrency: int,
+    gateway_concurrency: int = 1,
+    reader_class=AsyncModbusDataReader,
+) -> list[tuple]:
+    """
+    Collects the jobs in up to `processes` forked worker processes, one shard each (see
+    `collect_shard`), so Modbus decoding runs on every core. The workers never touch the
+    database: the results come back through the pool pipes and are saved by the caller.
+    """
+    shards = shard_jobs(jobs, processes)
+    if not shards:
+        return []
+
+    # the forked workers must not share the connections of the parent
+    connections.close_all()
+
+    context = multiprocessing.get_context("fork")
+    with context.Pool(processes=len(shards)) as pool:
+        sharded_results = pool.starmap(
+            collect_shard, [(shard, concurrency, gateway_concurrency, reader_class) for shard in shards]
+        )
+
+    logger.debug(f"Collected in {len(shards)} processes: {[len(shard) for shard in shards]} transductors")
+    return [result for results in sharded_results for result in results]
@@ -1,6 +1,11 @@
 from django.db import models
 from django.utils import timezone
 
+from measurement.watermarks import (
+    WATERMARK_FAILED_CONNECTION_EVENT,
+    WATERMARK_VOLTAGE_EVENT,
+    bump_watermarks,
+)
 from transductor.models import Transductor
 
 
@@ -19,9 +24,23 @@ class Event(models.Model):
     )
     data = models.TextField(null=True, blank=True)
 
+    # Watermark bumped whenever an event of this kind changes (conditional GET of the event lists)
+    watermark_table = None
+
     def __str__(self):
         return "%s@%s" % (self.__class__.__name__, self.created_at)
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.watermark_table:
+            bump_watermarks(self.watermark_table)
+
+    def delete(self, *args, **kwargs):
+        deleted = super().delete(*args, **kwargs)
+        if self.watermark_table:
+            bump_watermarks(self.watermark_table)
+        return deleted
+
 
 class VoltageRelatedEvent(Event):
     """
@@ -29,6 +48,7 @@ class VoltageRelatedEvent(Event):
     """
 
     non_polymorphic = models.Manager()
+    watermark_table = WATERMARK_VOLTAGE_EVENT
 
     class Meta:
         base_manager_name = "non_polymorphic"
@@ -42,6 +62,8 @@ class FailedConnectionTransductorEvent(Event):
     Defines a new event related to a failed connection with a transductor
     """
 
+    watermark_table = WATERMARK_FAILED_CONNECTION_EVENT
+
 
 class CriticalVoltageEvent(VoltageRelatedEvent):
     """
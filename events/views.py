@@ -1,6 +1,12 @@
 from rest_framework import mixins, viewsets
 from rest_framework.response import Response
 
+from measurement.watermarks import (
+    WATERMARK_FAILED_CONNECTION_EVENT,
+    WATERMARK_TRANSDUCTOR,
+    WATERMARK_VOLTAGE_EVENT,
+    conditional_on,
+)
 from transductor.models import Transductor
 
 from .models import (
@@ -30,6 +36,7 @@ class VoltageRelatedEventViewSet(
         "PhaseDropEvent": PhaseDropEvent,
     }
 
+    @conditional_on(WATERMARK_VOLTAGE_EVENT, WATERMARK_TRANSDUCTOR)
     def list(self, request):
         # The period is defined by each minute because the collection for the
         # measurement related is defined by each minute too.
@@ -63,6 +70,7 @@ class FailedConnectionTransductorEventViewSet(
     serializer_class = FailedConnectionTransductorEventSerializer
     queryset = FailedConnectionTransductorEvent.objects.none()
 
+    @conditional_on(WATERMARK_FAILED_CONNECTION_EVENT, WATERMARK_TRANSDUCTOR)
     def list(self, request):
         events = []
         # The period is defined by each minute because the collection for the
@@ -1,10 +1,16 @@
 from django.contrib import admin
 
 from measurement.models import (
+    DailyMeasurementRollup,
+    DeadbandReference,
+    HourlyMeasurementRollup,
     MinutelyMeasurement,
     MonthlyMeasurement,
+    MonthlyTariffRollup,
+    PackedMinutelyHour,
     QuarterlyMeasurement,
     ReferenceMeasurement,
+    TableWatermark,
 )
 
 
@@ -53,10 +59,11 @@ class QuarterlyMeasurementAdmin(admin.ModelAdmin):
         "reactive_inductive",
         "reactive_capacitive",
         "is_calculated",
+        "tariff_post",
         "collection_date",
     ]
     list_display_links = ("id", "transductor")
-    list_filter = ("transductor", "is_calculated", "collection_date")
+    list_filter = ("transductor", "is_calculated", "tariff_post", "collection_date")
     date_hierarchy = "collection_date"
 
 
@@ -74,3 +81,50 @@ class MonthlyMeasurementAdmin(admin.ModelAdmin):
     list_display_links = ("id", "transductor")
     list_filter = ("transductor", "collection_date")
     date_hierarchy = "collection_date"
+
+
+@admin.register(HourlyMeasurementRollup, DailyMeasurementRollup)
+class MeasurementRollupAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "transductor",
+        "bucket",
+        "samples",
+        "last_collection_date",
+    ]
+    list_display_links = ("id", "transductor")
+    list_filter = ("transductor", "bucket")
+    date_hierarchy = "bucket"
+
+
+@admin.register(MonthlyTariffRollup)
+class MonthlyTariffRollupAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "transductor",
+        "month",
+        "tariff_post",
+        "active_consumption",
+        "active_generated",
+        "reactive_inductive",
+        "reactive_capacitive",
+        "samples",
+    ]
+    list_display_links = ("id", "transductor")
+    list_filter = ("transductor", "tariff_post", "month")
+
+
+@admin.register(TableWatermark)
+class TableWatermarkAdmin(admin.ModelAdmin):
+    list_display = ["table", "version", "updated_at"]
+
+
+@admin.register(DeadbandReference)
+class DeadbandReferenceAdmin(admin.ModelAdmin):
+    list_display = ["id", "transductor"]
+
+
+@admin.register(PackedMinutelyHour)
+class PackedMinutelyHourAdmin(admin.ModelAdmin):
+    list_display = ["id", "transductor", "hour"]
+    list_filter = ["transductor"]
@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class MeasurementConfig(AppConfig):
     name = "measurement"
+
+    def ready(self):
+        from measurement.packing import create_history_view
+
+        post_migrate.connect(create_history_view, sender=self)
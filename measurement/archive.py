@@ -0,0 +1,322 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+
+from measurement.deadband import iter_step_fill
+from measurement.models import (
+    MinutelyMeasurement,
+    MonthlyMeasurement,
+    PackedMinutelyHour,
+    QuarterlyMeasurement,
+    ReferenceMeasurement,
+)
+from measurement.packing import minutely_history
+from measurement.rollups import month_start, truncate_month
+from transductor.models import Transductor
+
+logger = logging.getLogger("tasks")
+
+# Record batches written per file; each one is compressed on its own
+ARCHIVE_BATCH_SIZE = 10_000
+
+ARCHIVE_COMPRESSION = "zstd"
+
+
+def import_pyarrow():
+    """pyarrow (in requirements.txt) is only imported by the archive, so the slave starts without it."""
+    try:
+        import pyarrow
+        import pyarrow.compute  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured("The measurement archive requires pyarrow (`pip install pyarrow`).")
+    return pyarrow
+
+
+def get_archive_dir(directory=None) -> Path:
+    directory = directory or settings.MEASUREMENT_ARCHIVE_DIR
+    if not directory:
+        raise ImproperlyConfigured("Set MEASUREMENT_ARCHIVE_DIR (or pass a directory) to use the archive.")
+    return Path(directory)
+
+
+def arrow_type(pa, field):
+    if isinstance(field, (models.ForeignKey, models.IntegerField)):
+        return pa.int64()
+    if isinstance(field, models.FloatField):
+        return pa.float64()
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp("us", tz="UTC")
+    return pa.string()  # JSON fields, as text
+
+
+class ArchiveTable:
+    """
+    Measurement table archived as Arrow IPC files, one per transductor and local month:
+    `<archive dir>/<name>/transductor=<id>/<YYYY-MM>.arrow`.
+    """
+
+    def __init__(self, name: str, model, transform=None):
+        self.name = name
+        self.model = model
+        self.fields = [field for field in model._meta.concrete_fields]
+        self.transform = transform
+
+    def schema(self, pa):
+        return pa.schema([pa.field(field.attname, arrow_type(pa, field)) for field in self.fields])
+
+    def source(self, transductor_id: int, start: datetime, end: datetime):
+        return self.model.objects.filter(
+            transductor_id=transductor_id, collection_date__gte=start, collection_date__lt=end
+        )
+
+    def first_collection_date(self, transductor_id: int):
+        first = self.model.objects.filter(transductor_id=transductor_id).aggregate(first=models.Min("collection_date"))
+        return first["first"]
+
+    def read_rows(self, transductor_id: int, start: datetime, end: datetime):
+        queryset = self.source(transductor_id, start, end).order_by("collection_date", "id")
+        rows = queryset.values_list(*[field.attname for field in self.fields], named=True).iterator(chunk_size=2000)
+        return self.transform(rows) if self.transform is not None else rows
+
+    def delete(self, transductor_id: int, start: datetime, end: datetime) -> int:
+        deleted, _ = self.source(transductor_id, start, end).delete()
+        return deleted
+
+    def path(self, directory: Path, transductor_id: int, month) -> Path:
+        return directory / self.name / f"transductor={transductor_id}" / f"{month:%Y-%m}.arrow"
+
+    def to_batch(self, pa, rows):
+        schema = self.schema(pa)
+        encoder = DjangoJSONEncoder()
+
+        columns = {field.attname: [] for field in self.fields}
+        json_fields = {field.attname for field in self.fields if isinstance(field, models.JSONField)}
+        for row in rows:
+            for name, value in row._asdict().items():
+                if name in json_fields and value is not None:
+                    value = encoder.encode(value)
+                columns[name].append(value)
+
+        return pa.record_batch(
+            [pa.array(values, type=schema.field(name).type) for name, values in columns.items()], schema=schema
+        )
+
+    def to_instances(self, table) -> list:
+        json_fields = {field.attname for field in self.fields if isinstance(field, models.JSONField)}
+
+        instances = []
+        for row in table.to_pylist():
+            for name in json_fields:
+                if row.get(name) is not None:
+                    row[name] = json.loads(row[name])
+            instances.append(self.model(**row))
+        return instances
+
+    def restorable(self, instances: list) -> list:
+        """Instances that can go back into the table: not stored anymore and with their references."""
+        stored = self.model.objects.filter(id__in=[instance.id for instance in instances])
+        stored = set(stored.values_list("id", flat=True))
+        instances = [instance for instance in instances if instance.id not in stored]
+
+        if not any(field.attname == "reference_measurement_id" for field in self.fields):
+            return instances
+
+        references = {instance.reference_measurement_id for instance in instances}
+        references = set(ReferenceMeasurement.objects.filter(id__in=references).values_list("id", flat=True))
+        return [instance for instance in instances if instance.reference_measurement_id in references]
+
+
+class MinutelyArchiveTable(ArchiveTable):
+    """Reads raw and packed minutely rows (step-filled) and deletes both."""
+
+    def source(self, transductor_id, start, end):
+        return minutely_history(start, end).filter(transductor_id=transductor_id)
+
+    def first_collection_date(self, transductor_id):
+        first_dates = [
+            super().first_collection_date(transductor_id),
+            PackedMinutelyHour.objects.filter(transductor_id=transductor_id).aggregate(first=models.Min("hour"))[
+                "first"
+            ],
+        ]
+        first_dates = [first_date for first_date in first_dates if first_date is not None]
+        return min(first_dates) if first_dates else None
+
+    def delete(self, transductor_id, start, end):
+        raw = MinutelyMeasurement.objects.filter(
+            transductor_id=transductor_id,
+            collection_date__gte=start,
+            collection_date__lt=end,
+        )
+        packed = PackedMinutelyHour.objects.filter(transductor_id=transductor_id, hour__gte=start, hour__lt=end)
+
+        deleted, _ = raw.delete()
+        packed_rows = sum(len(ids) for ids in packed.values_list("ids", flat=True))
+        packed.delete()
+        return deleted + packed_rows
+
+    def restorable(self, instances):
+        instances = super().restorable(instances)
+
+        packed_ids = set()
+        packed = PackedMinutelyHour.objects.filter(ids__overlap=[instance.id for instance in instances])
+        for ids in packed.values_list("ids", flat=True):
+            packed_ids.update(ids)
+        return [instance for instance in instances if instance.id not in packed_ids]
+
+
+ARCHIVE_TABLES = {
+    "minutely": MinutelyArchiveTable("minutely", MinutelyMeasurement, transform=iter_step_fill),
+    "quarterly": ArchiveTable("quarterly", QuarterlyMeasurement),
+    "monthly": ArchiveTable("monthly", MonthlyMeasurement),
+}
+
+
+def next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def write_month(pa, table: ArchiveTable, path: Path, rows) -> int:
+    """
+    Writes the rows into the month file, keeping the rows already archived there (a row archived
+    again replaces the old copy). The file is replaced atomically.
+    """
+    batches = []
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == ARCHIVE_BATCH_SIZE:
+            batches.append(table.to_batch(pa, batch))
+            batch = []
+    if batch:
+        batches.append(table.to_batch(pa, batch))
+
+    if not batches:
+        return 0
+
+    archived = pa.Table.from_batches(batches, schema=table.schema(pa))
+    total = archived.num_rows
+    if path.exists():
+        existing = read_file(pa, path)
+        existing = existing.filter(pa.compute.invert(pa.compute.is_in(existing["id"], value_set=archived["id"])))
+        archived = pa.concat_tables([existing, archived.cast(existing.schema)])
+        archived = archived.sort_by([("collection_date", "ascending"), ("id", "ascending")])
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_suffix(".arrow.tmp")
+    options = pa.ipc.IpcWriteOptions(compression=ARCHIVE_COMPRESSION)
+    with pa.OSFile(str(temporary_path), "wb") as sink, pa.ipc.new_file(
+        sink, archived.schema, options=options
+    ) as writer:
+        writer.write_table(archived, max_chunksize=ARCHIVE_BATCH_SIZE)
+    os.replace(temporary_path, path)
+
+    return total
+
+
+def deadline_passed(deadline) -> bool:
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def archive_transductor(
+    table: ArchiveTable, transductor_id: int, before: datetime, directory: Path, delete=False, deadline=None
+) -> int:
+    """
+    Archives the rows of a transductor collected before `before`, one local month at a time;
+    with `delete`, each month is removed from the database once its file is written. No month
+    is started past `deadline` (`time.monotonic()`). Returns the number of rows archived.
+    """
+    pa = import_pyarrow()
+
+    first_collection_date = table.first_collection_date(transductor_id)
+    if first_collection_date is None:
+        return 0
+
+    total = 0
+    month = truncate_month(first_collection_date)
+    while month_start(month) < before and not deadline_passed(deadline):
+        start, end = month_start(month), min(month_start(next_month(month)), before)
+
+        total += write_month(
+            pa, table, table.path(directory, transductor_id, month), table.read_rows(transductor_id, start, end)
+        )
+        if delete:
+            with transaction.atomic():
+                table.delete(transductor_id, start, end)
+
+        month = next_month(month)
+
+    return total
+
+
+def archive_table(table: ArchiveTable, before: datetime, directory: Path, delete=False, deadline=None):
+    """
+    Archives the rows of every transductor collected before `before` (see `archive_transductor`).
+    Returns the number of rows archived and whether the archive is complete, i.e. the run was
+    not stopped by `deadline`.
+    """
+    total = 0
+    for transductor_id in Transductor.objects.order_by("id").values_list("id", flat=True):
+        if deadline_passed(deadline):
+            break
+
+        rows = archive_transductor(table, transductor_id, before, directory, delete, deadline)
+        total += rows
+        logger.info(f"Transductor: {transductor_id} - {rows} {table.name} rows archived")
+
+    return total, not deadline_passed(deadline)
+
+
+def read_file(pa, path: Path):
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def archive_paths(table: ArchiveTable, directory: Path, transductor_id=None, start=None, end=None) -> list[Path]:
+    transductors = f"transductor={transductor_id}" if transductor_id is not None else "transductor=*"
+    paths = sorted((directory / table.name).glob(f"{transductors}/*.arrow"))
+
+    first_month = f"{truncate_month(start):%Y-%m}" if start is not None else None
+    last_month = f"{truncate_month(end):%Y-%m}" if end is not None else None
+    return [
+        path
+        for path in paths
+        if (first_month is None or path.stem >= first_month) and (last_month is None or path.stem <= last_month)
+    ]
+
+
+def read_archive(table: ArchiveTable, directory: Path, transductor_id=None, start=None, end=None):
+    """Archived rows (a `pyarrow.Table`) of the transductor collected in [start, end], from memory-mapped files."""
+    pa = import_pyarrow()
+
+    tables = [read_file(pa, path) for path in archive_paths(table, directory, transductor_id, start, end)]
+    archived = pa.concat_tables(tables) if tables else table.schema(pa).empty_table()
+
+    date_type = archived.schema.field("collection_date").type
+    if start is not None:
+        archived = archived.filter(pa.compute.greater_equal(archived["collection_date"], pa.scalar(start, date_type)))
+    if end is not None:
+        archived = archived.filter(pa.compute.less_equal(archived["collection_date"], pa.scalar(end, date_type)))
+    return archived
+
+
+def restore_archive(table: ArchiveTable, archived) -> int:
+    """
+    Inserts archived rows back into their table, keeping their ids; rows still in the database
+    and rows whose reference measurement is gone are skipped. Returns the number of rows restored.
+    """
+    total = 0
+    for batch in archived.to_batches(max_chunksize=ARCHIVE_BATCH_SIZE):
+        instances = table.restorable(table.to_instances(batch))
+        total += len(table.model.objects.bulk_create(instances))
+    return total
@@ -0,0 +1,194 @@
+from datetime import timedelta
+
+from django.conf import settings
+
+from measurement.models import DeadbandReference, MinutelyMeasurement
+from measurement.packing import minutely_history
+
+
+def get_deadbands() -> dict:
+    """Tolerance of each deadbanded minutely field (`MINUTELY_DEADBANDS`); empty when disabled."""
+    return settings.MINUTELY_DEADBANDS
+
+
+def keyframe_interval() -> timedelta:
+    """Longest gap between two stored values of a deadbanded field."""
+    return timedelta(minutes=settings.DEADBAND_KEYFRAME_MINUTES)
+
+
+def compress(instances: list[MinutelyMeasurement]) -> list[dict]:
+    """
+    Applies the deadband policy to unsaved minutely instances: a field whose value stays within
+    its tolerance of the last stored value is set to NULL, unless that value is older than the
+    keyframe interval. Must run inside the transaction that saves the instances.
+    Returns the suppressed values of each instance, for `restore`.
+    """
+    deadbands = get_deadbands()
+    if not deadbands:
+        return [{} for _ in instances]
+
+    transductor_ids = {instance.transductor_id for instance in instances}
+    references = {
+        reference.transductor_id: reference
+        for reference in DeadbandReference.objects.select_for_update().filter(transductor_id__in=transductor_ids)
+    }
+    new_references = [
+        DeadbandReference(transductor_id=transductor_id, values={})
+        for transductor_id in transductor_ids
+        if transductor_id not in references
+    ]
+    references |= {reference.transductor_id: reference for reference in new_references}
+
+    keyframe_seconds = keyframe_interval().total_seconds()
+    suppressed = []
+    for instance in instances:
+        stored_values = references[instance.transductor_id].values
+        timestamp = instance.collection_date.timestamp()
+
+        instance_suppressed = {}
+        for field, tolerance in deadbands.items():
+            value = getattr(instance, field)
+            if value is None:
+                continue
+
+            stored_value, stored_timestamp = stored_values.get(field, (None, None))
+            if stored_timestamp is not None and timestamp <= stored_timestamp:
+                continue  # late reading: stored as is, the reference keeps the newer value
+
+            if (
+                stored_value is not None
+                and abs(value - stored_value) <= tolerance
+                and timestamp - stored_timestamp < keyframe_seconds
+            ):
+                instance_suppressed[field] = value
+                setattr(instance, field, None)
+            else:
+                stored_values[field] = (value, timestamp)
+
+        suppressed.append(instance_suppressed)
+
+    DeadbandReference.objects.bulk_create(new_references)
+    DeadbandReference.objects.bulk_update(references.values(), fields=["values"])
+    return suppressed
+
+
+def restore(instances: list[MinutelyMeasurement], suppressed: list[dict]) -> None:
+    """Puts the suppressed values back on the saved instances (rollups, outbox and realtime use them)."""
+    for instance, values in zip(instances, suppressed):
+        for field, value in values.items():
+            setattr(instance, field, value)
+
+
+class StepFiller:
+    """
+    Query-time reconstruction of deadbanded series: a NULL deadbanded field takes the last value
+    stored for the same transductor. Rows must be given in ascending collection date per
+    transductor; the value preceding the first row of a transductor is looked up in the
+    keyframe interval before it, with one query per transductor. A suppressed value and a
+    missing one are both stored as NULL, so a missing reading of a deadbanded field is filled
+    forward as well.
+    """
+
+    def __init__(self, fields=None):
+        self.fields = list(get_deadbands() if fields is None else fields)
+        self.last_values = {}
+        self.last_dates = {}
+
+    def fill(self, transductor_id, collection_date, values: dict) -> dict:
+        """Values for the deadbanded fields that are NULL in `values` (present in the row)."""
+        fields = [field for field in self.fields if field in values]
+        if not fields:
+            return {}
+
+        last_date = self.last_dates.get(transductor_id)
+        if last_date is None or collection_date < last_date:
+            self.last_values[transductor_id] = self.seed(transductor_id, collection_date)
+        self.last_dates[transductor_id] = collection_date
+
+        last_values = self.last_values[transductor_id]
+        filled = {}
+        for field in fields:
+            if values[field] is None:
+                if last_values.get(field) is not None:
+                    filled[field] = last_values[field]
+            else:
+                last_values[field] = values[field]
+
+        return filled
+
+    def seed(self, transductor_id, collection_date) -> dict:
+        rows = minutely_history(collection_date - keyframe_interval(), collection_date)
+        rows = rows.filter(transductor_id=transductor_id)
+        rows = rows.order_by("-collection_date").values_list(*self.fields, named=True)
+
+        seed = {}
+        for row in rows:
+            for field in self.fields:
+                if field not in seed and getattr(row, field) is not None:
+                    seed[field] = getattr(row, field)
+            if len(seed) == len(self.fields):
+                break
+
+        return seed
+
+
+def row_values(row) -> dict:
+    if isinstance(row, dict):
+        return row
+    if hasattr(row, "_asdict"):
+        return row._asdict()
+    return row.__dict__
+
+
+def row_transductor_id(values: dict):
+    return values["transductor_id"] if "transductor_id" in values else values["transductor"]
+
+
+def fill_row(row, filled: dict):
+    if not filled:
+        return row
+    if isinstance(row, dict):
+        return {**row, **filled}
+    if hasattr(row, "_replace"):
+        return row._replace(**filled)
+
+    for field, value in filled.items():
+        setattr(row, field, value)
+    return row
+
+
+def iter_step_fill(rows, filler: StepFiller = None):
+    """
+    Step-fills rows (named tuples, dicts or model instances with the transductor, the collection
+    date and some of the minutely fields) read in ascending collection date, lazily.
+    """
+    filler = filler or StepFiller()
+    if not filler.fields:
+        yield from rows
+        return
+
+    for row in rows:
+        values = row_values(row)
+        filled = filler.fill(row_transductor_id(values), values["collection_date"], values)
+        yield fill_row(row, filled)
+
+
+def step_fill(rows) -> list:
+    """Step-filled copy of a page of rows in any order (e.g. newest first); the order is kept."""
+    rows = list(rows)
+    filler = StepFiller()
+    if not filler.fields or not rows:
+        return rows
+
+    order = sorted(
+        range(len(rows)),
+        key=lambda index: (
+            row_transductor_id(row_values(rows[index])),
+            row_values(rows[index])["collection_date"],
+        ),
+    )
+
+    filled_rows = list(rows)
+    for index, filled_row in zip(order, iter_step_fill((rows[index] for index in order), filler)):
+        filled_rows[index] = filled_row
+    return filled_rows
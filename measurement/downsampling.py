@@ -0,0 +1,356 @@
+from array import array
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from typing import NamedTuple
+
+import numpy as np
+from django.db import connection
+from django.db.models import DateTimeField, Func
+from rest_framework import serializers
+
+from measurement.deadband import StepFiller, get_deadbands, iter_step_fill
+from measurement.filters import DailyRollupFilter, HourlyRollupFilter
+from measurement.rollups import (
+    RESOLUTION_DAILY,
+    RESOLUTION_HOURLY,
+    RESOLUTION_SECONDS,
+    ROLLUP_MODELS,
+    parse_resolution,
+)
+from measurement.serializers import MeasurementRollupSerializer
+
+# Upper bound of points (buckets or selected readings) in a downsampled response
+MAX_DOWNSAMPLED_POINTS = 10_000
+
+# Upper bound of minutely readings read to select the LTTB points (about a year of one transductor)
+MAX_LTTB_ROWS = 525_600
+
+ROLLUP_FILTERS = {
+    RESOLUTION_DAILY: DailyRollupFilter,
+    RESOLUTION_HOURLY: HourlyRollupFilter,
+}
+
+
+class EpochBucket(Func):
+    """Start of the `seconds` long bucket, aligned to the Unix epoch, that contains the expression."""
+
+    template = "to_timestamp(floor(extract(epoch from %(expressions)s) / %(seconds)d) * %(seconds)d)"
+    output_field = DateTimeField()
+
+    def __init__(self, expression, seconds: int, **extra):
+        super().__init__(expression, seconds=int(seconds), **extra)
+
+
+def epoch_bucket(date: datetime, seconds: int) -> datetime:
+    """Python side of `EpochBucket`."""
+    return datetime.fromtimestamp(date.timestamp() // seconds * seconds, tz=dt_timezone.utc)
+
+
+class Bucket(NamedTuple):
+    """Aggregates of a downsampled bucket, in the format of the rollup tables (see `accumulate`)."""
+
+    transductor_id: int
+    bucket: datetime
+    samples: int
+    data: dict
+
+
+def rollup_resolution(seconds: int):
+    """Coarsest rollup table whose buckets tile a `seconds` long bucket, or None."""
+    for resolution in ROLLUP_MODELS:
+        if seconds % RESOLUTION_SECONDS[resolution] == 0:
+            return resolution
+    return None
+
+
+def merge_aggregate(aggregate: dict, other: dict) -> None:
+    """Folds the aggregate of a later bucket into `aggregate`."""
+    aggregate["min"] = min(aggregate["min"], other["min"])
+    aggregate["max"] = max(aggregate["max"], other["max"])
+    aggregate["sum"] += other["sum"]
+    aggregate["count"] += other["count"]
+    aggregate["last"] = other["last"]
+
+
+def rollup_buckets(resolution: str, query_params, fields: list[str], seconds: int, transductor=None) -> list[Bucket]:
+    """
+    Buckets of `seconds` merged from the hourly or daily rollups, so a long range is answered
+    from one row per hour or day instead of every minutely reading. Buckets are aligned to the
+    Unix epoch like `EpochBucket`; a daily rollup (a local day) goes to the bucket of its start.
+    """
+    queryset = ROLLUP_MODELS[resolution].objects.order_by("transductor", "bucket")
+    if transductor is not None:
+        queryset = queryset.filter(transductor=transductor)
+    queryset = ROLLUP_FILTERS[resolution](query_params, queryset=queryset).qs
+
+    buckets = []
+    rows = queryset.values_list("transductor", "bucket", "samples", "data")
+    for transductor_id, start, samples, data in rows.iterator(chunk_size=2000):
+        bucket = epoch_bucket(start, seconds)
+        if not buckets or buckets[-1].transductor_id != transductor_id or buckets[-1].bucket != bucket:
+            if len(buckets) == MAX_DOWNSAMPLED_POINTS:
+                raise_too_many_buckets()
+            buckets.append(Bucket(transductor_id, bucket, 0, {}))
+
+        current = buckets[-1]
+        buckets[-1] = current._replace(samples=current.samples + samples)
+        for field in fields:
+            aggregate = data.get(field)
+            if aggregate is None:
+                continue
+            if field in current.data:
+                merge_aggregate(current.data[field], aggregate)
+            else:
+                current.data[field] = dict(aggregate)
+
+    return buckets
+
+
+def bucketing_sql(queryset, fields: list[str], seconds: int) -> tuple[str, list]:
+    """
+    Minimum, maximum, sum, count and last value of each field per transductor and time bucket,
+    computed by the database. Deadbanded fields are step-filled first with window functions:
+    `count(field)` numbers the runs started by each stored value and every row of a run takes
+    that value. Rows before the first stored value of the range stay NULL (see `seed_buckets`).
+    """
+    readings = queryset.order_by().annotate(bucket=EpochBucket("collection_date", seconds))
+    sql, params = readings.values("transductor", "bucket", "collection_date", *fields).query.sql_with_params()
+
+    deadbanded = [field for field in fields if field in get_deadbands()]
+    if deadbanded:
+        runs = ", ".join(f'count("{field}") OVER readings AS "{field}__run"' for field in deadbanded)
+        filled = ", ".join(
+            f'max("{field}") OVER (PARTITION BY "transductor_id", "{field}__run") AS "{field}"'
+            if field in deadbanded
+            else f'"{field}"'
+            for field in fields
+        )
+        sql = f"""
+            SELECT "transductor_id", "bucket", "collection_date", {filled}
+            FROM (
+                SELECT *, {runs} FROM ({sql}) AS readings
+                WINDOW readings AS (PARTITION BY "transductor_id" ORDER BY "collection_date")
+            ) AS runs
+        """
+
+    aggregates = ", ".join(
+        f'min("{field}"), max("{field}"), sum("{field}"), count("{field}"), '
+        f'(array_agg("{field}" ORDER BY "collection_date" DESC) FILTER (WHERE "{field}" IS NOT NULL))[1]'
+        for field in fields
+    )
+    sql = f"""
+        SELECT "transductor_id", "bucket", count(*), min("collection_date"), {aggregates}
+        FROM ({sql}) AS filled
+        GROUP BY "transductor_id", "bucket"
+        ORDER BY "transductor_id", "bucket"
+        LIMIT %s
+    """
+    return sql, [*params, MAX_DOWNSAMPLED_POINTS + 1]
+
+
+def sql_buckets(queryset, fields: list[str], seconds: int) -> list[Bucket]:
+    """Buckets of `seconds` aggregated from the minutely readings (`bucketing_sql`)."""
+    sql, params = bucketing_sql(queryset, fields, seconds)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    if len(rows) > MAX_DOWNSAMPLED_POINTS:
+        raise_too_many_buckets()
+
+    buckets, first_dates = [], []
+    for transductor_id, bucket, samples, first_date, *values in rows:
+        data = {}
+        for index, field in enumerate(fields):
+            minimum, maximum, total, count, last = values[index * 5 : index * 5 + 5]
+            if count:
+                data[field] = {"min": minimum, "max": maximum, "sum": total, "count": count, "last": last}
+        buckets.append(Bucket(transductor_id, bucket, samples, data))
+        first_dates.append(first_date)
+
+    seed_buckets(buckets, first_dates, [field for field in fields if field in get_deadbands()])
+    return buckets
+
+
+def seed_buckets(buckets: list[Bucket], first_dates: list, fields: list[str]) -> None:
+    """
+    Counts the leading readings of each transductor that `bucketing_sql` could not fill (a
+    deadbanded field suppressed before the first value stored in the range) with the value
+    stored before the range, looked up by `StepFiller.seed` once per transductor.
+    """
+    if not fields:
+        return
+
+    filler = StepFiller(fields)
+    seeds = {}
+    pending = set()
+    for bucket, first_date in zip(buckets, first_dates):
+        if bucket.transductor_id not in seeds:
+            seeds[bucket.transductor_id] = None
+            pending = set(fields)
+
+        for field in list(pending):
+            aggregate = bucket.data.get(field)
+            missing = bucket.samples - (aggregate["count"] if aggregate else 0)
+            if aggregate is not None:
+                pending.discard(field)
+            if not missing:
+                continue
+
+            if seeds[bucket.transductor_id] is None:
+                seeds[bucket.transductor_id] = filler.seed(bucket.transductor_id, first_date)
+            seed = seeds[bucket.transductor_id].get(field)
+            if seed is None:
+                continue
+
+            if aggregate is None:
+                bucket.data[field] = {"min": seed, "max": seed, "sum": 0, "count": 0, "last": seed}
+                aggregate = bucket.data[field]
+            aggregate["min"] = min(aggregate["min"], seed)
+            aggregate["max"] = max(aggregate["max"], seed)
+            aggregate["sum"] += seed * missing
+            aggregate["count"] += missing
+
+
+def raise_too_many_buckets():
+    message = f"More than {MAX_DOWNSAMPLED_POINTS} buckets; use a coarser resolution or a shorter range."
+    raise serializers.ValidationError({"resolution": [message]})
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets (Steinarsson, 2013): the first
+    and last points plus, for each of `threshold - 2` buckets, the point forming the largest
+    triangle with the previously kept point and the average of the next bucket.
+    """
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+
+    every = (length - 2) / (threshold - 2)
+    edges = np.floor(np.arange(threshold - 1) * every).astype(int) + 1
+    edges[-1] = length - 1
+
+    indices = np.empty(threshold, dtype=int)
+    indices[0], indices[-1] = 0, length - 1
+
+    selected = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else length
+
+        average_x = x[end:next_end].mean()
+        average_y = y[end:next_end].mean()
+
+        areas = np.abs(
+            (x[selected] - average_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (average_y - y[selected])
+        )
+        selected = start + int(np.argmax(areas))
+        indices[bucket + 1] = selected
+
+    return indices
+
+
+def lttb_series(rows, fields: list[str], points: int) -> list[dict]:
+    """
+    One shape-preserving series of at most `points` readings per transductor and field, from
+    `values_list("transductor", "collection_date", *fields, named=True)` rows ordered by
+    transductor and date. Rows are step-filled and streamed into typed arrays (8 bytes per value);
+    more than MAX_LTTB_ROWS readings are rejected. Readings without a value are left out.
+    """
+    series = []
+    transductor, timestamps, columns = None, array("d"), {}
+
+    def select_points():
+        x = np.frombuffer(timestamps, dtype=float)
+        for field in fields:
+            y = np.frombuffer(columns[field], dtype=float)
+            present = ~np.isnan(y)
+            selected = lttb(x[present], y[present], points)
+            series.append(
+                {
+                    "transductor": transductor,
+                    "field": field,
+                    "timestamps": (x[present][selected] * 1000).astype(np.int64).tolist(),
+                    "values": y[present][selected].tolist(),
+                }
+            )
+
+    for count, row in enumerate(iter_step_fill(rows), start=1):
+        if count > MAX_LTTB_ROWS:
+            message = f"More than {MAX_LTTB_ROWS} readings; use `resolution` or a shorter range."
+            raise serializers.ValidationError({"points": [message]})
+
+        if row.transductor != transductor:
+            if transductor is not None:
+                select_points()
+            transductor, timestamps, columns = row.transductor, array("d"), {field: array("d") for field in fields}
+
+        timestamps.append(row.collection_date.timestamp())
+        for field in fields:
+            value = getattr(row, field)
+            columns[field].append(np.nan if value is None else value)
+
+    if transductor is not None:
+        select_points()
+
+    return series
+
+
+def downsampled_measurements(queryset, query_params, transductor=None):
+    """
+    Downsampled view of the minutely `queryset`, or None when the request asks for raw rows.
+
+    `resolution` (e.g. `15m`, `1h`, `900`) aggregates each field per time bucket: from the hourly
+    or daily rollups when the bucket is made of whole hours or days, in SQL otherwise. Buckets
+    have the format of the rollup endpoint (`MeasurementRollupSerializer`).
+    `points` keeps at most that many readings per transductor and field with LTTB.
+    `fields` (comma separated) restricts the quantities.
+    """
+    resolution = query_params.get("resolution")
+    points = query_params.get("points")
+
+    if resolution is None and points is None:
+        return None
+
+    if resolution is not None and points is not None:
+        raise serializers.ValidationError({"points": ["Use either `resolution` or `points`, not both."]})
+
+    fields = get_downsample_fields(queryset.model, query_params.get("fields"))
+
+    if points is not None:
+        if not points.isdigit() or not 3 <= int(points) <= MAX_DOWNSAMPLED_POINTS:
+            raise serializers.ValidationError({"points": [f"Expected an integer from 3 to {MAX_DOWNSAMPLED_POINTS}."]})
+
+        rows = queryset.order_by("transductor", "collection_date").values_list(
+            "transductor", "collection_date", *fields, named=True
+        )
+        return {"points": int(points), "results": lttb_series(rows.iterator(chunk_size=5000), fields, int(points))}
+
+    try:
+        seconds = parse_resolution(resolution)
+    except ValueError as e:
+        raise serializers.ValidationError({"resolution": [str(e)]})
+
+    stored_resolution = rollup_resolution(seconds)
+    if stored_resolution is not None:
+        buckets = rollup_buckets(stored_resolution, query_params, fields, seconds, transductor)
+    else:
+        buckets = sql_buckets(queryset, fields, seconds)
+
+    serializer = MeasurementRollupSerializer(buckets, many=True, context={"resolution": seconds, "fields": fields})
+    return {"resolution": seconds, "results": serializer.data}
+
+
+def get_downsample_fields(model, fields: str = None) -> list[str]:
+    available_fields = model.measurement_fields()
+    if not fields:
+        return available_fields
+
+    fields = [field.strip() for field in fields.split(",") if field.strip()]
+    invalid_fields = set(fields) - set(available_fields)
+    if invalid_fields:
+        raise serializers.ValidationError({"fields": [f"Unknown fields: {sorted(invalid_fields)}"]})
+
+    return fields
@@ -0,0 +1,81 @@
+import csv
+import json
+import zlib
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Rows fetched per round trip of the server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+
+# Size of the pieces handed to the WSGI server
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+
+class Echo:
+    """File-like object for `csv.writer` that returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(fields, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+
+    for row in rows:
+        yield writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+
+
+def ndjson_lines(fields, rows):
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+
+    for row in rows:
+        yield encoder.encode(dict(zip(fields, row))) + "\n"
+
+
+def buffered(lines, size: int = EXPORT_BUFFER_SIZE):
+    """Joins the lines into chunks of about `size` bytes."""
+    buffer, length = [], 0
+    for line in lines:
+        line = line.encode()
+        buffer.append(line)
+        length += len(line)
+
+        if length >= size:
+            yield b"".join(buffer)
+            buffer, length = [], 0
+
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+def export_stream(queryset, fields, output: str = "csv", compress: bool = False, transform=None):
+    """
+    Bytes of the export of `queryset`, produced while the rows are read: the rows come from a
+    server-side cursor as tuples, so memory does not grow with the size of the export.
+    `transform` may wrap the row iterator (it must stay lazy).
+    """
+    rows = queryset.values_list(*fields, named=True).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if transform is not None:
+        rows = transform(rows)
+    lines = csv_lines(fields, rows) if output == "csv" else ndjson_lines(fields, rows)
+
+    chunks = buffered(lines)
+    return gzip_stream(chunks) if compress else chunks
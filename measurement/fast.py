@@ -0,0 +1,110 @@
+from operator import attrgetter
+
+from django.shortcuts import get_object_or_404
+from rest_framework import serializers
+from rest_framework.response import Response
+
+FAST_CONVERTERS = {
+    serializers.FloatField: float,
+    serializers.IntegerField: int,
+    serializers.BooleanField: bool,
+    serializers.CharField: str,
+    serializers.IPAddressField: str,
+    serializers.PrimaryKeyRelatedField: int,
+}
+
+
+def get_converter(field):
+    """Cheapest callable producing the same output as `field.to_representation` for non-null values."""
+    return FAST_CONVERTERS.get(type(field), field.to_representation)
+
+
+class ValuesSerializer:
+    """
+    Read-only counterpart of a DRF serializer working on `values_list(named=True)` rows.
+
+    The output of `serializer_class` is reproduced field by field, but the per-field plan (source
+    getter and converter) is computed once per response instead of walking the DRF field
+    machinery for every row and model instance. `SerializerMethodField`s are served by the
+    `get_<field>(row)` methods of the subclass.
+    """
+
+    serializer_class = None
+    extra_source_fields = ()
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.source_fields = []
+        self.plan = []
+
+        for name, field in self.serializer_class(context=self.context).fields.items():
+            if field.write_only:
+                continue
+
+            if isinstance(field, serializers.SerializerMethodField):
+                self.plan.append((name, getattr(self, f"get_{name}"), None))
+                continue
+
+            self.source_fields.append(field.source)
+            self.plan.append((name, attrgetter(field.source), get_converter(field)))
+
+        for source in self.extra_source_fields:
+            if source not in self.source_fields:
+                self.source_fields.append(source)
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.source_fields, named=True)
+
+    def to_representation(self, row) -> dict:
+        data = {}
+        for name, get_value, convert in self.plan:
+            value = get_value(row)
+            data[name] = convert(value) if convert is not None and value is not None else value
+        return data
+
+    def prepare_rows(self, rows):
+        """Hook to adjust a page of fetched rows before they are represented."""
+        return rows
+
+    def many(self, rows) -> list:
+        return [self.to_representation(row) for row in self.prepare_rows(rows)]
+
+
+class FastReadMixin:
+    """
+    Serves `list` and `retrieve` with `fast_serializer_class` when the response is plain JSON;
+    other formats (browsable API) keep the regular serializer.
+    """
+
+    fast_serializer_class = None
+
+    def use_fast_serializer(self) -> bool:
+        renderer_format = getattr(self.request.accepted_renderer, "format", None)
+        return self.fast_serializer_class is not None and renderer_format == "json"
+
+    def get_fast_serializer(self):
+        return self.fast_serializer_class(context=self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_serializer():
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.get_fast_serializer()
+        rows = serializer.rows(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.many(page))
+
+        return Response(serializer.many(rows))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_fast_serializer():
+            return super().retrieve(request, *args, **kwargs)
+
+        serializer = self.get_fast_serializer()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+
+        rows = serializer.rows(self.filter_queryset(self.get_queryset()))
+        row = get_object_or_404(rows, **{self.lookup_field: kwargs[lookup_url_kwarg]})
+        return Response(serializer.many([row])[0])
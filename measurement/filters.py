@@ -1,6 +1,12 @@
 from django_filters import rest_framework as filters
 
-from measurement.models import MinutelyMeasurement, QuarterlyMeasurement
+from measurement.models import (
+    DailyMeasurementRollup,
+    HourlyMeasurementRollup,
+    MinutelyMeasurementHistory,
+    QuarterlyMeasurement,
+)
+from measurement.packing import packed_hours_after, packed_hours_before
 
 
 class MeasurementFilter(filters.FilterSet):
@@ -17,8 +23,31 @@ class MeasurementFilter(filters.FilterSet):
 
 
 class MinutelyMeasurementFilter(MeasurementFilter):
-    model = MinutelyMeasurement
+    """Filters `MinutelyMeasurementHistory`, skipping the packed hours outside the dates."""
+
+    model = MinutelyMeasurementHistory
+    start_date = filters.IsoDateTimeFilter(method="filter_start_date")
+    end_date = filters.IsoDateTimeFilter(method="filter_end_date")
+
+    def filter_start_date(self, queryset, name, value):
+        return queryset.filter(packed_hours_after(value), collection_date__gte=value)
+
+    def filter_end_date(self, queryset, name, value):
+        return queryset.filter(packed_hours_before(value), collection_date__lte=value)
 
 
 class QuarterlyMeasurementFilter(MeasurementFilter):
     model = QuarterlyMeasurement
+
+
+class RollupFilter(MeasurementFilter):
+    start_date = filters.IsoDateTimeFilter(field_name="bucket", lookup_expr="gte")
+    end_date = filters.IsoDateTimeFilter(field_name="bucket", lookup_expr="lte")
+
+
+class HourlyRollupFilter(RollupFilter):
+    model = HourlyMeasurementRollup
+
+
+class DailyRollupFilter(RollupFilter):
+    model = DailyMeasurementRollup
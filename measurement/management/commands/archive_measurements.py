@@ -0,0 +1,72 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+
+from measurement.archive import (
+    ARCHIVE_TABLES,
+    archive_table,
+    get_archive_dir,
+    import_pyarrow,
+)
+from measurement.packing import truncate_hour
+
+logger = logging.getLogger("tasks")
+
+
+class Command(BaseCommand):
+    """
+    Writes the measurements older than `--before-days` to zstd compressed Arrow IPC files, one per
+    table, transductor and month (see `measurement.archive.ArchiveTable`), and with `--delete`
+    removes them from PostgreSQL. Months archived again are merged into their files; `--max-seconds`
+    bounds the run (no month is started past it). Requires `pyarrow`; without it the command fails
+    before touching any row.
+    """
+
+    help = "Archives old minutely/quarterly/monthly measurements to columnar files"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--before-days", type=int, default=None, help="Archive rows older than N days")
+        parser.add_argument("--tables", type=str, default=",".join(ARCHIVE_TABLES), help="Comma separated tables")
+        parser.add_argument("--directory", type=str, default=None, help="Defaults to MEASUREMENT_ARCHIVE_DIR")
+        parser.add_argument("--delete", action="store_true", help="Delete the archived rows from the database")
+        parser.add_argument("--max-seconds", type=float, default=None, help="Stop archiving after N seconds")
+
+    def handle(self, *args, **options) -> None:
+        start_time = time.perf_counter()
+        logger.info("-" * 65)
+        logger.info("# Command - Archive measurements.")
+
+        tables = [table.strip() for table in options["tables"].split(",") if table.strip()]
+        invalid_tables = set(tables) - set(ARCHIVE_TABLES)
+        if invalid_tables:
+            raise CommandError(f"Unknown tables: {sorted(invalid_tables)}")
+
+        try:
+            import_pyarrow()
+            directory = get_archive_dir(options["directory"])
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        before_days = options["before_days"]
+        if before_days is None:
+            before_days = settings.MEASUREMENT_ARCHIVE_AFTER_DAYS
+        before = truncate_hour(timezone.now() - timedelta(days=before_days))
+
+        deadline = time.monotonic() + options["max_seconds"] if options["max_seconds"] else None
+
+        total = 0
+        for name in tables:
+            rows, complete = archive_table(ARCHIVE_TABLES[name], before, directory, options["delete"], deadline)
+            total += rows
+            if not complete:
+                logger.info(f"Archive stopped by --max-seconds in the {name} table; the next run resumes.")
+                break
+
+        elapsed_time = time.perf_counter() - start_time
+        logger.info(f"{total} rows archived in {elapsed_time:.2f} seconds.")
+        self.stdout.write(self.style.SUCCESS(f"{total} measurements archived in {directory}."))
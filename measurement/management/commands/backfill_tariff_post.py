@@ -0,0 +1,64 @@
+import logging
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+
+from measurement.models import QuarterlyMeasurement
+from tariff.calendar import get_calendar
+
+logger = logging.getLogger("tasks")
+
+
+class Command(BaseCommand):
+    """
+    Fills `QuarterlyMeasurement.tariff_post` for rows ingested before the column existed, walking the
+    table by primary key in small batches so that each transaction stays short. Each batch is
+    classified with a single vectorized lookup in the tariff calendar.
+
+    After changing the tariff rules, run it with `--all` followed by `rebuild_tariff_rollups`.
+    """
+
+    help = "Classifies the quarterly measurements into tariff posts in batches"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows updated per transaction")
+        parser.add_argument("--all", action="store_true", help="Reclassify every row, not only the empty ones")
+
+    def handle(self, *args, **options) -> None:
+        start_time = time.perf_counter()
+        logger.info("-" * 65)
+        logger.info("# Command - Backfill quarterly tariff posts.")
+
+        queryset = QuarterlyMeasurement.objects.all()
+        if not options["all"]:
+            queryset = queryset.filter(tariff_post__isnull=True)
+
+        last_id, total = 0, 0
+        while True:
+            batch = queryset.filter(id__gt=last_id).order_by("id")
+            batch = list(batch.values_list("id", "collection_date")[: options["batch_size"]])
+            if not batch:
+                break
+
+            self.update_batch(batch)
+            last_id = batch[-1][0]
+            total += len(batch)
+            logger.debug(f"{total} quarterly measurements classified (last id: {last_id})")
+
+        elapsed_time = time.perf_counter() - start_time
+        logger.info(f"{total} quarterly measurements classified in {elapsed_time:.2f} seconds.")
+        self.stdout.write(self.style.SUCCESS(f"{total} quarterly measurements classified."))
+
+    def update_batch(self, batch) -> None:
+        ids, collection_dates = zip(*batch)
+        tariff_posts = get_calendar().classify_measurements(collection_dates)
+
+        ids_by_post = defaultdict(list)
+        for measurement_id, tariff_post in zip(ids, tariff_posts.tolist()):
+            ids_by_post[tariff_post].append(measurement_id)
+
+        with transaction.atomic():
+            for tariff_post, ids in ids_by_post.items():
+                QuarterlyMeasurement.objects.filter(id__in=ids).update(tariff_post=tariff_post)
@@ -0,0 +1,74 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db.models import Min
+from django.utils import timezone
+
+from measurement.models import MinutelyMeasurement, PackedMinutelyHour
+from measurement.rollups import RESOLUTION_DAILY, rebuild_rollups, truncate_bucket
+from transductor.models import Transductor
+
+logger = logging.getLogger("tasks")
+
+
+class Command(BaseCommand):
+    """
+    Backfills the hourly/daily rollups from the minutely history, one transductor-day at a time,
+    so that memory and transaction size stay bounded whatever the size of the history.
+    Only closed days are rebuilt: the current day keeps being maintained by the collector.
+    """
+
+    help = "Builds the hourly and daily measurement rollups from the existing minutely history"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--days", type=int, default=None, help="Only rebuild the last N closed days")
+        parser.add_argument("--transductor", type=int, default=None, help="Only rebuild this transductor id")
+        parser.add_argument("--chunk-days", type=int, default=1, help="Days rebuilt per transaction")
+
+    def handle(self, *args, **options) -> None:
+        start_time = time.perf_counter()
+        logger.info("-" * 65)
+        logger.info("# Command - Build measurement rollups.")
+
+        end = truncate_bucket(RESOLUTION_DAILY, timezone.now())
+        chunk = timedelta(days=max(options["chunk_days"], 1))
+
+        transductors = Transductor.objects.all().order_by("id")
+        if options["transductor"] is not None:
+            transductors = transductors.filter(id=options["transductor"])
+
+        total = 0
+        for transductor in transductors:
+            start = self.get_start_date(transductor, end, options["days"])
+            if start is None:
+                continue
+
+            while start < end:
+                # The extra half day keeps the boundary on the right midnight across DST changes
+                chunk_end = min(truncate_bucket(RESOLUTION_DAILY, start + chunk + timedelta(hours=12)), end)
+                rows = rebuild_rollups(transductor.id, start, chunk_end)
+                total += rows
+                logger.debug(f"Transductor: {transductor.id} - {start:%d/%m/%Y} - {rows} minutely rows")
+                start = chunk_end
+
+            logger.info(f"Transductor: {transductor.id} - rollups rebuilt")
+
+        elapsed_time = time.perf_counter() - start_time
+        logger.info(f"{total} minutely rows aggregated in {elapsed_time:.2f} seconds.")
+        self.stdout.write(self.style.SUCCESS(f"Rollups rebuilt from {total} minutely measurements."))
+
+    def get_start_date(self, transductor, end, days):
+        if days is not None:
+            return truncate_bucket(RESOLUTION_DAILY, end - timedelta(days=days))
+
+        first_dates = [
+            MinutelyMeasurement.objects.filter(transductor=transductor).aggregate(first=Min("collection_date")),
+            PackedMinutelyHour.objects.filter(transductor=transductor).aggregate(first=Min("hour")),
+        ]
+        first_dates = [first_date["first"] for first_date in first_dates if first_date["first"] is not None]
+
+        if not first_dates:
+            return None
+        return truncate_bucket(RESOLUTION_DAILY, min(first_dates))
@@ -1,18 +1,89 @@
-from django.core.management.base import BaseCommand
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
 from django.utils import timezone
-from measurement.models import MinutelyMeasurement, ReferenceMeasurement, QuarterlyMeasurement, MonthlyMeasurement
 
-class Command(BaseCommand): 
-    help = 'Deletes all measurements older than 30 days'
+from measurement.archive import (
+    ARCHIVE_TABLES,
+    archive_table,
+    get_archive_dir,
+    import_pyarrow,
+)
+from measurement.retention import RETENTION_LOCK_ID, apply_retention, retention_cutoff
+
+logger = logging.getLogger("tasks")
+
+
+class Command(BaseCommand):
+    """
+    Applies the retention policy (`MEASUREMENT_RETENTION`, days per table; 0 keeps forever).
+    Rows are deleted in primary key batches of `--batch-size`, each in its own short transaction
+    and followed by a `--pause`, so the collection keeps running while the history is pruned;
+    `--max-seconds` bounds the whole run, archive and rollups included (the next one resumes).
+    Expired minutely days get their rollups built first and, when `MEASUREMENT_ARCHIVE_DIR` is
+    set, every table is archived before its rows are deleted.
+    """
+
+    help = "Deletes the measurements older than their retention period"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows deleted per transaction")
+        parser.add_argument("--pause", type=float, default=None, help="Seconds between batches")
+        parser.add_argument("--max-seconds", type=float, default=None, help="Stop deleting after N seconds")
+
+    def handle(self, *args, **options) -> None:
+        start_time = time.perf_counter()
+        logger.info("-" * 65)
+        logger.info("# Command - Delete old measurements.")
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [RETENTION_LOCK_ID])
+            if not cursor.fetchone()[0]:
+                logger.info("Retention: another run is in progress.")
+                return
 
-    def handle(self, *args, **options):
-        thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-        
         try:
-            MinutelyMeasurement.objects.filter(slave_collection_date__lt=thirty_days_ago).delete()
-            ReferenceMeasurement.objects.filter(collection_date__lt=thirty_days_ago).delete()
-            QuarterlyMeasurement.objects.filter(collection_date__lt=thirty_days_ago).delete()
-            MonthlyMeasurement.objects.filter(collection_date__lt=thirty_days_ago).delete()
-            self.stdout.write(self.style.SUCCESS('Measurements older than 30 days have been successfully deleted.'))
-        except Exception as e:
-            self.stderr.write(self.style.ERROR(f'Failed to delete measurements: {str(e)}'))
+            deleted = self.apply(options)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [RETENTION_LOCK_ID])
+
+        total = sum(deleted.values())
+        elapsed_time = time.perf_counter() - start_time
+        logger.info(f"{total} rows deleted in {elapsed_time:.2f} seconds.")
+
+        summary = ", ".join(f"{name}: {rows}" for name, rows in deleted.items())
+        self.stdout.write(self.style.SUCCESS(f"{total} old measurements deleted ({summary})."))
+
+    def apply(self, options) -> dict:
+        policy = dict(settings.MEASUREMENT_RETENTION)
+        now = timezone.now()
+
+        batch_size = options["batch_size"] or settings.RETENTION_BATCH_SIZE
+        pause = options["pause"] if options["pause"] is not None else settings.RETENTION_PAUSE
+        deadline = time.monotonic() + options["max_seconds"] if options["max_seconds"] else None
+
+        if settings.MEASUREMENT_ARCHIVE_DIR:
+            try:
+                import_pyarrow()
+                directory = get_archive_dir()
+            except ImproperlyConfigured as e:
+                raise CommandError(str(e))
+
+            for name, table in ARCHIVE_TABLES.items():
+                if not policy.get(name):
+                    continue
+
+                rows, complete = archive_table(
+                    table, retention_cutoff(policy[name], now), directory, deadline=deadline
+                )
+                logger.info(f"Retention {name}: {rows} rows archived")
+                if not complete:
+                    # rows are only deleted once archived: the next run resumes the archive
+                    policy[name] = 0
+
+        return apply_retention(policy, now, batch_size, pause, deadline)
@@ -0,0 +1,71 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.db.models import Min
+from django.utils import timezone
+
+from measurement.models import MinutelyMeasurement
+from measurement.packing import pack_minutely, truncate_hour
+from replication.models import SyncCheckpoint
+from transductor.models import Transductor
+
+logger = logging.getLogger("tasks")
+
+
+class Command(BaseCommand):
+    """
+    Compacts the closed hours of raw minutely measurements older than `--after-hours` into one
+    `PackedMinutelyHour` per transductor-hour, one day per transaction. The API keeps reading them
+    through `MinutelyMeasurementHistory`.
+
+    Rows not yet acknowledged by every sync consumer (`SyncCheckpoint`) stay raw, since the pull
+    replication follows the raw table by id.
+    """
+
+    help = "Packs closed hours of minutely measurements into per-hour arrays"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--after-hours", type=int, default=None, help="Only pack hours older than this")
+        parser.add_argument("--transductor", type=int, default=None, help="Only pack this transductor id")
+
+    def handle(self, *args, **options) -> None:
+        start_time = time.perf_counter()
+        logger.info("-" * 65)
+        logger.info("# Command - Pack minutely measurements.")
+
+        after_hours = (
+            options["after_hours"] if options["after_hours"] is not None else settings.MINUTELY_PACK_AFTER_HOURS
+        )
+        end = truncate_hour(timezone.now() - timedelta(hours=after_hours))
+        max_id = self.get_shipped_id()
+
+        transductors = Transductor.objects.all().order_by("id")
+        if options["transductor"] is not None:
+            transductors = transductors.filter(id=options["transductor"])
+
+        total = 0
+        for transductor in transductors:
+            start = MinutelyMeasurement.objects.filter(transductor=transductor).aggregate(first=Min("collection_date"))
+            if start["first"] is None:
+                continue
+
+            rows = 0
+            day = truncate_hour(start["first"])
+            while day < end:
+                day = min(day + timedelta(days=1), end)
+                rows += pack_minutely(transductor.id, day, max_id)
+
+            total += rows
+            logger.info(f"Transductor: {transductor.id} - {rows} minutely rows packed")
+
+        elapsed_time = time.perf_counter() - start_time
+        logger.info(f"{total} minutely rows packed in {elapsed_time:.2f} seconds.")
+        self.stdout.write(self.style.SUCCESS(f"{total} minutely measurements packed."))
+
+    def get_shipped_id(self):
+        """Last minutely id acknowledged by every sync consumer; None when nobody syncs."""
+        positions = [checkpoint.positions.get("minutely", 0) for checkpoint in SyncCheckpoint.objects.all()]
+        return min(positions) if positions else None
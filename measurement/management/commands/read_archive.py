@@ -0,0 +1,59 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils.dateparse import parse_datetime
+
+from measurement.archive import (
+    ARCHIVE_TABLES,
+    get_archive_dir,
+    read_archive,
+    restore_archive,
+)
+from measurement.exports import csv_lines, ndjson_lines
+
+
+class Command(BaseCommand):
+    """
+    Reads archived measurements back from the memory-mapped Arrow files written by
+    `archive_measurements`: prints them as CSV/NDJSON for ad-hoc analysis, or with `--restore`
+    inserts them back into the database (run `build_rollups` afterwards for minutely rows).
+    """
+
+    help = "Prints or restores archived measurements"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("table", choices=list(ARCHIVE_TABLES))
+        parser.add_argument("--transductor", type=int, default=None)
+        parser.add_argument("--start-date", type=str, default=None, help="ISO 8601, inclusive")
+        parser.add_argument("--end-date", type=str, default=None, help="ISO 8601, inclusive")
+        parser.add_argument("--output", choices=["csv", "ndjson"], default="csv")
+        parser.add_argument("--directory", type=str, default=None, help="Defaults to MEASUREMENT_ARCHIVE_DIR")
+        parser.add_argument("--restore", action="store_true", help="Insert the rows back into the database")
+
+    def handle(self, *args, **options) -> None:
+        table = ARCHIVE_TABLES[options["table"]]
+        start, end = self.parse_date(options["start_date"]), self.parse_date(options["end_date"])
+
+        try:
+            directory = get_archive_dir(options["directory"])
+            archived = read_archive(table, directory, options["transductor"], start, end)
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        if options["restore"]:
+            restored = restore_archive(table, archived)
+            self.stdout.write(self.style.SUCCESS(f"{restored} of {archived.num_rows} archived rows restored."))
+            return
+
+        rows = (row for batch in archived.to_batches() for row in zip(*batch.to_pydict().values()))
+        lines = csv_lines if options["output"] == "csv" else ndjson_lines
+        for line in lines(archived.schema.names, rows):
+            self.stdout.write(line, ending="")
+
+    def parse_date(self, value):
+        if value is None:
+            return None
+
+        date = parse_datetime(value)
+        if date is None or date.tzinfo is None:
+            raise CommandError(f"Invalid date (ISO 8601 with offset expected): {value}")
+        return date
@@ -0,0 +1,73 @@
+import logging
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+
+from measurement.models import QuarterlyMeasurement
+from measurement.rollups import rebuild_tariff_rollups, truncate_month
+from transductor.models import Transductor
+
+logger = logging.getLogger("tasks")
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the monthly tariff rollup from the quarterly history, one transductor-month per
+    transaction. Use it to correct the rollup after editing quarterly data or changing the tariff rules.
+    """
+
+    help = "Rebuilds the monthly peak/off-peak energy rollup from the quarterly measurements"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--start", type=str, default=None, help="First month to rebuild (YYYY-MM)")
+        parser.add_argument("--end", type=str, default=None, help="Last month to rebuild (YYYY-MM)")
+        parser.add_argument("--transductor", type=int, default=None, help="Only rebuild this transductor id")
+
+    def handle(self, *args, **options) -> None:
+        start_time = time.perf_counter()
+        logger.info("-" * 65)
+        logger.info("# Command - Rebuild monthly tariff rollups.")
+
+        end_month = self.parse_month(options["end"]) if options["end"] else truncate_month(timezone.now())
+
+        transductors = Transductor.objects.all().order_by("id")
+        if options["transductor"] is not None:
+            transductors = transductors.filter(id=options["transductor"])
+
+        total = 0
+        for transductor in transductors:
+            month = self.parse_month(options["start"]) if options["start"] else self.get_first_month(transductor)
+            if month is None:
+                continue
+
+            while month <= end_month:
+                next_month = self.next_month(month)
+                rows = rebuild_tariff_rollups(transductor.id, month, next_month)
+                total += rows
+                logger.debug(f"Transductor: {transductor.id} - {month:%m/%Y} - {rows} quarterly rows")
+                month = next_month
+
+            logger.info(f"Transductor: {transductor.id} - tariff rollups rebuilt")
+
+        elapsed_time = time.perf_counter() - start_time
+        logger.info(f"{total} quarterly rows aggregated in {elapsed_time:.2f} seconds.")
+        self.stdout.write(self.style.SUCCESS(f"Tariff rollups rebuilt from {total} quarterly measurements."))
+
+    def parse_month(self, value: str):
+        try:
+            return datetime.strptime(value, "%Y-%m").date()
+        except ValueError:
+            raise CommandError(f"Invalid month '{value}', expected YYYY-MM")
+
+    def next_month(self, month):
+        return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+    def get_first_month(self, transductor):
+        first_measurement = QuarterlyMeasurement.objects.filter(transductor=transductor).order_by("collection_date")
+        first_measurement = first_measurement.values_list("collection_date", flat=True).first()
+
+        if first_measurement is None:
+            return None
+        return truncate_month(first_measurement)
@@ -1,12 +1,20 @@
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
 from django.utils import timezone
 
-from data_collector.modbus.settings import DataGroups
+from data_collector.modbus.settings import DataGroups, TariffPosts
 from debouncers.debouncers import VoltageEventDebouncer
 from transductor.models import Transductor
 
 
-class MinutelyMeasurement(models.Model):
+class RealField(models.FloatField):
+    """Single precision (4 bytes) float column."""
+
+    def db_type(self, connection):
+        return "real"
+
+
+class BaseMinutelyMeasurement(models.Model):
     transductor = models.ForeignKey(Transductor, related_name="minutelys", on_delete=models.CASCADE)
     frequency_a = models.FloatField(default=None, null=True, blank=True)
     frequency_b = models.FloatField(default=None, null=True, blank=True)
@@ -40,16 +48,32 @@ class MinutelyMeasurement(models.Model):
     dht_current_a = models.FloatField(default=None, null=True, blank=True)
     dht_current_b = models.FloatField(default=None, null=True, blank=True)
     dht_current_c = models.FloatField(default=None, null=True, blank=True)
+    # min/max/avg/samples of the attributes sampled by `sample_high_rate` within the minute
+    high_rate_stats = models.JSONField(default=None, null=True, blank=True)
     slave_collection_date = models.DateTimeField(default=timezone.now, blank=True)
     collection_date = models.DateTimeField(default=timezone.now, blank=True)
 
     class Meta:
-        verbose_name = "Minutely Measurement"
-        verbose_name_plural = "Minutely Measurements"
+        abstract = True
 
     def __str__(self):
         return f"{self.slave_collection_date} - {self.transductor}"
 
+    @classmethod
+    def measurement_fields(cls) -> list[str]:
+        """Names of the electrical quantities stored per reading (every float column)."""
+        return [field.name for field in cls._meta.get_fields() if isinstance(field, models.FloatField)]
+
+
+class MinutelyMeasurement(BaseMinutelyMeasurement):
+    class Meta:
+        indexes = [
+            models.Index(fields=["collection_date", "id"], name="minutely_keyset_idx"),
+            models.Index(fields=["transductor", "collection_date", "id"], name="minutely_transductor_keyset_idx"),
+        ]
+        verbose_name = "Minutely Measurement"
+        verbose_name_plural = "Minutely Measurements"
+
     def check_measurements(self):
         measurements = [
             ["voltage_a", self.voltage_a],
@@ -72,6 +96,84 @@ class MinutelyMeasurement(models.Model):
             )
 
 
+class PackedMinutelyHour(models.Model):
+    """
+    Closed hour of minutely readings of a transductor, packed by `pack_minutely_measurements`: one
+    array per column, position `i` of every array holding the `i`-th reading of the hour (ordered
+    by collection date). Measurement fields are single precision and the whole row is compressed
+    by PostgreSQL (TOAST). `MinutelyMeasurementHistory` reads them back as minutely rows.
+    """
+
+    transductor = models.ForeignKey(Transductor, related_name="packed_minutelys", on_delete=models.CASCADE)
+    hour = models.DateTimeField()
+    ids = ArrayField(models.BigIntegerField())
+    # microseconds from `hour` to the collection_date/slave_collection_date of each reading
+    offsets = ArrayField(models.BigIntegerField())
+    slave_offsets = ArrayField(models.BigIntegerField())
+    # high_rate_stats of each reading, NULL when no reading of the hour has them
+    high_rate_stats = models.JSONField(default=None, null=True, blank=True)
+    frequency_a = ArrayField(RealField(null=True))
+    frequency_b = ArrayField(RealField(null=True))
+    frequency_c = ArrayField(RealField(null=True))
+    frequency_iec = ArrayField(RealField(null=True))
+    voltage_a = ArrayField(RealField(null=True))
+    voltage_b = ArrayField(RealField(null=True))
+    voltage_c = ArrayField(RealField(null=True))
+    current_a = ArrayField(RealField(null=True))
+    current_b = ArrayField(RealField(null=True))
+    current_c = ArrayField(RealField(null=True))
+    active_power_a = ArrayField(RealField(null=True))
+    active_power_b = ArrayField(RealField(null=True))
+    active_power_c = ArrayField(RealField(null=True))
+    total_active_power = ArrayField(RealField(null=True))
+    reactive_power_a = ArrayField(RealField(null=True))
+    reactive_power_b = ArrayField(RealField(null=True))
+    reactive_power_c = ArrayField(RealField(null=True))
+    total_reactive_power = ArrayField(RealField(null=True))
+    apparent_power_a = ArrayField(RealField(null=True))
+    apparent_power_b = ArrayField(RealField(null=True))
+    apparent_power_c = ArrayField(RealField(null=True))
+    total_apparent_power = ArrayField(RealField(null=True))
+    power_factor_a = ArrayField(RealField(null=True))
+    power_factor_b = ArrayField(RealField(null=True))
+    power_factor_c = ArrayField(RealField(null=True))
+    total_power_factor = ArrayField(RealField(null=True))
+    dht_voltage_a = ArrayField(RealField(null=True))
+    dht_voltage_b = ArrayField(RealField(null=True))
+    dht_voltage_c = ArrayField(RealField(null=True))
+    dht_current_a = ArrayField(RealField(null=True))
+    dht_current_b = ArrayField(RealField(null=True))
+    dht_current_c = ArrayField(RealField(null=True))
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["transductor", "hour"], name="unique_packed_minutely_hour")]
+        indexes = [models.Index(fields=["hour"], name="packed_minutely_hour_idx")]
+        verbose_name = "Packed Minutely Hour"
+        verbose_name_plural = "Packed Minutely Hours"
+
+    def __str__(self) -> str:
+        return f"{self.hour} - {self.transductor}"
+
+
+class MinutelyMeasurementHistory(BaseMinutelyMeasurement):
+    """
+    Read-only union of the raw minutely rows and the readings unpacked from `PackedMinutelyHour`
+    (database view kept by `measurement.packing.create_history_view`). `packed_hour` is the hour of
+    the packed row a reading comes from and NULL for raw rows; filtering on it lets PostgreSQL skip
+    the packed hours outside a date range (see `measurement.packing.packed_hours_after`).
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    transductor = models.ForeignKey(Transductor, related_name="+", on_delete=models.DO_NOTHING, db_constraint=False)
+    packed_hour = models.DateTimeField(null=True)
+
+    class Meta:
+        managed = False
+        db_table = "measurement_minutely_history"
+        verbose_name = "Minutely Measurement History"
+        verbose_name_plural = "Minutely Measurement History"
+
+
 class BaseMeasurement(models.Model):
     transductor = models.ForeignKey(Transductor, on_delete=models.CASCADE)
     active_consumption = models.FloatField(null=True, blank=True)
@@ -97,8 +199,26 @@ class ReferenceMeasurement(BaseMeasurement):
         verbose_name_plural = "Reference Measurements"
 
 
+class DeadbandReference(models.Model):
+    """
+    Last stored value (and its epoch timestamp) of each deadbanded minutely field of a transductor:
+    `{"frequency_a": [60.01, 1686675600.0], ...}`. New readings are compared against it.
+    """
+
+    transductor = models.OneToOneField(Transductor, on_delete=models.CASCADE, related_name="deadband_reference")
+    values = models.JSONField(default=dict)
+
+    class Meta:
+        verbose_name = "Deadband Reference"
+        verbose_name_plural = "Deadband References"
+
+    def __str__(self) -> str:
+        return f"{self.transductor}"
+
+
 class QuarterlyMeasurement(BaseMeasurement):
     is_calculated = models.BooleanField(default=False)
+    tariff_post = models.IntegerField(choices=TariffPosts.choices, null=True, blank=True, db_index=True)
     reference_measurement = models.ForeignKey(
         ReferenceMeasurement,
         related_name="+",
@@ -107,6 +227,10 @@ class QuarterlyMeasurement(BaseMeasurement):
     )
 
     class Meta:
+        indexes = [
+            models.Index(fields=["collection_date", "id"], name="quarterly_keyset_idx"),
+            models.Index(fields=["transductor", "collection_date", "id"], name="quarterly_transductor_keyset_idx"),
+        ]
         verbose_name = "Quarterly Measurement"
         verbose_name_plural = "Quarterly Measurements"
 
@@ -126,3 +250,85 @@ class MonthlyMeasurement(BaseMeasurement):
     class Meta:
         verbose_name = "Monthly Measurement"
         verbose_name_plural = "Monthly Measurements"
+
+
+class BaseMeasurementRollup(models.Model):
+    """
+    Aggregated view of the minutely readings of a transductor over a time bucket.
+
+    `data` maps every minutely field to its running aggregates:
+    {"voltage_a": {"min": ..., "max": ..., "sum": ..., "count": ..., "last": ...}}
+    The average is derived as sum / count so the rollup can be updated incrementally.
+    """
+
+    transductor = models.ForeignKey(Transductor, on_delete=models.CASCADE)
+    bucket = models.DateTimeField()
+    samples = models.PositiveIntegerField(default=0)
+    data = models.JSONField(default=dict)
+    last_collection_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self) -> str:
+        return f"{self.bucket} - {self.transductor}"
+
+
+class HourlyMeasurementRollup(BaseMeasurementRollup):
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["transductor", "bucket"], name="unique_hourly_rollup")]
+        verbose_name = "Hourly Measurement Rollup"
+        verbose_name_plural = "Hourly Measurement Rollups"
+
+
+class DailyMeasurementRollup(BaseMeasurementRollup):
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["transductor", "bucket"], name="unique_daily_rollup")]
+        verbose_name = "Daily Measurement Rollup"
+        verbose_name_plural = "Daily Measurement Rollups"
+
+
+class MonthlyTariffRollup(models.Model):
+    """
+    Energy of the quarterly measurements of a transductor accumulated per (local) month and tariff post.
+    Maintained at quarterly ingestion; `rebuild_tariff_rollups` recomputes it from the quarterly history.
+    """
+
+    transductor = models.ForeignKey(Transductor, on_delete=models.CASCADE)
+    month = models.DateField()
+    tariff_post = models.IntegerField(choices=TariffPosts.choices)
+    active_consumption = models.FloatField(default=0)
+    active_generated = models.FloatField(default=0)
+    reactive_inductive = models.FloatField(default=0)
+    reactive_capacitive = models.FloatField(default=0)
+    samples = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["transductor", "month", "tariff_post"], name="unique_monthly_tariff")
+        ]
+        verbose_name = "Monthly Tariff Rollup"
+        verbose_name_plural = "Monthly Tariff Rollups"
+
+    def __str__(self) -> str:
+        return f"{self.month:%m/%Y} - {self.get_tariff_post_display()} - {self.transductor}"
+
+
+class TableWatermark(models.Model):
+    """
+    Version of a group of rows served by the API, bumped by the write path after each commit.
+    The conditional GET validators (ETag / Last-Modified) are derived from it, so an unchanged
+    resource is answered with 304 without querying the rows themselves.
+    """
+
+    table = models.CharField(max_length=32, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Table Watermark"
+        verbose_name_plural = "Table Watermarks"
+
+    def __str__(self) -> str:
+        return f"{self.table} - {self.version}"
@@ -0,0 +1,200 @@
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from django.db import connection, transaction
+from django.db.models import Max, Min, Q
+
+from measurement.models import (
+    MinutelyMeasurement,
+    MinutelyMeasurementHistory,
+    PackedMinutelyHour,
+)
+
+HOUR = timedelta(hours=1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def history_view_sql() -> str:
+    """
+    `MinutelyMeasurementHistory` view: the raw minutely rows followed by one row per position of
+    the packed arrays. Packed values go through `text` so a single precision 60.1 reads as 60.1
+    and not as 60.099998474.
+    """
+    fields = MinutelyMeasurement.measurement_fields()
+    raw_table = MinutelyMeasurement._meta.db_table
+    packed_table = PackedMinutelyHour._meta.db_table
+
+    raw_columns = ", ".join(f'"{field}"' for field in fields)
+    packed_columns = ", ".join(f'(p."{field}"[i])::text::double precision AS "{field}"' for field in fields)
+
+    return f"""
+        CREATE VIEW "{MinutelyMeasurementHistory._meta.db_table}" AS
+        SELECT
+            "id", "transductor_id", {raw_columns}, "high_rate_stats", "slave_collection_date",
+            "collection_date", NULL::timestamp with time zone AS "packed_hour"
+        FROM "{raw_table}"
+        UNION ALL
+        SELECT
+            p."ids"[i], p."transductor_id", {packed_columns}, p."high_rate_stats" -> (i - 1),
+            p."hour" + p."slave_offsets"[i] * interval '1 microsecond',
+            p."hour" + p."offsets"[i] * interval '1 microsecond', p."hour"
+        FROM "{packed_table}" p CROSS JOIN LATERAL generate_subscripts(p."ids", 1) AS i
+    """
+
+
+def create_history_view(**kwargs) -> None:
+    """(Re)creates the history view after `migrate`, once both tables exist (`post_migrate` receiver)."""
+    tables = connection.introspection.table_names()
+    if MinutelyMeasurement._meta.db_table not in tables or PackedMinutelyHour._meta.db_table not in tables:
+        return
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DROP VIEW IF EXISTS "{MinutelyMeasurementHistory._meta.db_table}"')
+        cursor.execute(history_view_sql())
+
+
+def packed_hours_after(start: datetime) -> Q:
+    """Skips the packed hours ending before `start`; the packed part of the view has no date index."""
+    return Q(packed_hour__isnull=True) | Q(packed_hour__gt=start - HOUR)
+
+
+def packed_hours_before(end: datetime) -> Q:
+    """Skips the packed hours starting after `end`."""
+    return Q(packed_hour__isnull=True) | Q(packed_hour__lte=end)
+
+
+def minutely_history(start: datetime = None, end: datetime = None):
+    """Raw and packed minutely rows collected in [start, end)."""
+    queryset = MinutelyMeasurementHistory.objects.all()
+    if start is not None:
+        queryset = queryset.filter(packed_hours_after(start), collection_date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(packed_hours_before(end), collection_date__lt=end)
+    return queryset
+
+
+def history_bounds():
+    """Earliest and latest collection dates the history view can hold, or (None, None) when empty."""
+    raw = MinutelyMeasurement.objects.aggregate(first=Min("collection_date"), last=Max("collection_date"))
+    packed = PackedMinutelyHour.objects.aggregate(first=Min("hour"), last=Max("hour"))
+
+    firsts = [date for date in (raw["first"], packed["first"]) if date is not None]
+    lasts = [date for date in (raw["last"], packed["last"] and packed["last"] + HOUR) if date is not None]
+    return (min(firsts), max(lasts)) if firsts else (None, None)
+
+
+def history_window(edge: datetime, descending: bool = True) -> Q:
+    """Rows from `edge` on (newest first pages) or up to `edge` (oldest first), skipping the other packed hours."""
+    if descending:
+        return packed_hours_after(edge) & Q(collection_date__gte=edge)
+    return packed_hours_before(edge) & Q(collection_date__lte=edge)
+
+
+def history_page(queryset, limit: int, descending: bool = True, boundary: datetime = None) -> list:
+    """
+    First `limit` rows of a history `queryset` ordered by collection date (newest first unless
+    `descending` is False) and already restricted to one side of `boundary`, the page cursor.
+
+    An unbounded query would unnest every packed hour before sorting. The raw rows are read
+    first, through the index: when they fill the page, the date of the last one bounds the packed
+    hours to read. Otherwise the page is read in windows starting at the boundary and growing 4x
+    until they hold `limit` rows or the whole history.
+    """
+    dates = list(queryset.filter(packed_hour__isnull=True).values_list("collection_date", flat=True)[:limit])
+    if len(dates) == limit:
+        return list(queryset.filter(history_window(dates[-1], descending))[:limit])
+
+    first, last = history_bounds()
+    if first is None:
+        return []
+
+    origin = boundary or (last if descending else first)
+    span = HOUR
+    while True:
+        edge = origin - span if descending else origin + span
+        rows = list(queryset.filter(history_window(edge, descending))[:limit])
+        if len(rows) == limit or (edge <= first if descending else edge >= last):
+            return rows
+        span *= 4
+
+
+def truncate_hour(collection_date: datetime) -> datetime:
+    return collection_date.replace(minute=0, second=0, microsecond=0)
+
+
+def pack(transductor_id: int, hour: datetime, rows: list[dict]) -> PackedMinutelyHour:
+    """Packs the rows (dicts with the fields of `MinutelyMeasurement`) collected within `hour`."""
+    rows = sorted(rows, key=lambda row: (row["collection_date"], row["id"]))
+    high_rate_stats = [row["high_rate_stats"] for row in rows]
+
+    packed = PackedMinutelyHour(
+        transductor_id=transductor_id,
+        hour=hour,
+        ids=[row["id"] for row in rows],
+        offsets=[(row["collection_date"] - hour) // MICROSECOND for row in rows],
+        slave_offsets=[(row["slave_collection_date"] - hour) // MICROSECOND for row in rows],
+        high_rate_stats=high_rate_stats if any(stats is not None for stats in high_rate_stats) else None,
+    )
+    for field in MinutelyMeasurement.measurement_fields():
+        setattr(packed, field, [row[field] for row in rows])
+
+    return packed
+
+
+def unpack(packed: PackedMinutelyHour) -> list[dict]:
+    """Rows of a packed hour, as given to `pack`."""
+    fields = MinutelyMeasurement.measurement_fields()
+    high_rate_stats = packed.high_rate_stats or [None] * len(packed.ids)
+
+    rows = []
+    for index, pk in enumerate(packed.ids):
+        row = {field: getattr(packed, field)[index] for field in fields}
+        row["id"] = pk
+        row["high_rate_stats"] = high_rate_stats[index]
+        row["collection_date"] = packed.hour + packed.offsets[index] * MICROSECOND
+        row["slave_collection_date"] = packed.hour + packed.slave_offsets[index] * MICROSECOND
+        rows.append(row)
+
+    return rows
+
+
+def pack_minutely(transductor_id: int, until: datetime, max_id: int = None) -> int:
+    """
+    Moves the raw minutely rows of a transductor collected before `until` (aligned to an hour)
+    into packed hours, merging late rows into the hours already packed. Rows with an id above
+    `max_id` stay raw. Returns the number of rows packed.
+    """
+    fields = ["id", "high_rate_stats", "slave_collection_date", "collection_date"]
+    fields += MinutelyMeasurement.measurement_fields()
+
+    queryset = MinutelyMeasurement.objects.filter(transductor_id=transductor_id, collection_date__lt=until)
+    if max_id is not None:
+        queryset = queryset.filter(id__lte=max_id)
+
+    with transaction.atomic():
+        rows = list(queryset.order_by("collection_date", "id").values(*fields))
+        if not rows:
+            return 0
+
+        hours = {
+            hour: list(hour_rows)
+            for hour, hour_rows in groupby(rows, lambda row: truncate_hour(row["collection_date"]))
+        }
+        existing = PackedMinutelyHour.objects.select_for_update().filter(transductor_id=transductor_id, hour__in=hours)
+        existing = {packed.hour: packed for packed in existing}
+
+        new_packed, merged_packed = [], []
+        for hour, hour_rows in hours.items():
+            if hour in existing:
+                packed = pack(transductor_id, hour, unpack(existing[hour]) + hour_rows)
+                packed.id = existing[hour].id
+                merged_packed.append(packed)
+            else:
+                new_packed.append(pack(transductor_id, hour, hour_rows))
+
+        packed_fields = [field.name for field in PackedMinutelyHour._meta.concrete_fields if not field.primary_key]
+        PackedMinutelyHour.objects.bulk_create(new_packed)
+        PackedMinutelyHour.objects.bulk_update(merged_packed, fields=packed_fields)
+        MinutelyMeasurement.objects.filter(id__in=[row["id"] for row in rows]).delete()
+
+    return len(rows)
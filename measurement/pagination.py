@@ -0,0 +1,161 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from measurement.models import MinutelyMeasurementHistory
+from measurement.packing import history_page
+
+Cursor = namedtuple("Cursor", ["reverse", "collection_date", "id"])
+
+
+class MeasurementCursorPagination(BasePagination):
+    """
+    Keyset pagination over `(collection_date, id)`, newest first.
+
+    Each page is read with an index range scan starting right after the last row of the previous
+    page, so the cost does not grow with the depth of the page and no `COUNT(*)` is issued. The
+    cursor is an opaque token holding the position of the boundary row; rows inserted while a
+    client walks the pages never shift or repeat the following pages. Pages of the minutely
+    history only read the packed hours they reach (`history_page`).
+
+    Requests with `?page=` keep the classic page-number pagination (with `count`).
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    page_number_pagination_class = PageNumberPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_number_pagination = None
+
+        if self.page_number_pagination_class.page_query_param in request.query_params:
+            self.page_number_pagination = self.page_number_pagination_class()
+            queryset = queryset.order_by("-collection_date", "-id")
+            return self.page_number_pagination.paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            queryset = queryset.order_by("-collection_date", "-id")
+        elif cursor.reverse:
+            after = Q(collection_date__gt=cursor.collection_date) | Q(id__gt=cursor.id)
+            queryset = queryset.filter(after, collection_date__gte=cursor.collection_date)
+            queryset = queryset.order_by("collection_date", "id")
+        else:
+            before = Q(collection_date__lt=cursor.collection_date) | Q(id__lt=cursor.id)
+            queryset = queryset.filter(before, collection_date__lte=cursor.collection_date)
+            queryset = queryset.order_by("-collection_date", "-id")
+
+        results = self.get_page_rows(queryset, page_size + 1, cursor)
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if cursor is not None and cursor.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_rows(self, queryset, limit: int, cursor) -> list:
+        if queryset.model is MinutelyMeasurementHistory:
+            descending = cursor is None or not cursor.reverse
+            return history_page(queryset, limit, descending, cursor and cursor.collection_date)
+        return list(queryset[:limit])
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        return min(page_size, self.max_page_size) if page_size > 0 else self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            reverse, collection_date, pk = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            collection_date = parse_datetime(collection_date)
+            if collection_date is None:
+                raise ValueError
+            return Cursor(bool(reverse), collection_date, int(pk))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor: Cursor) -> str:
+        position = [int(cursor.reverse), cursor.collection_date.isoformat(), cursor.id]
+        encoded = urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode("ascii")).decode("ascii")
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+
+        last = self.page[-1]
+        return self.encode_cursor(Cursor(False, last.collection_date, last.id))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+
+        first = self.page[0]
+        return self.encode_cursor(Cursor(True, first.collection_date, first.id))
+
+    def get_paginated_response(self, data):
+        if self.page_number_pagination is not None:
+            return self.page_number_pagination.get_paginated_response(data)
+
+        return Response({"next": self.get_next_link(), "previous": self.get_previous_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Opaque position returned in the `next`/`previous` links.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+            {
+                "name": self.page_number_pagination_class.page_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Page number: switches to page-number pagination with a total `count`.",
+                "schema": {"type": "integer"},
+            },
+        ]
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from data_collector.modbus.helpers import get_tariff_post, select_blocks
+from data_collector.modbus.settings import DataGroups
+from measurement.models import QuarterlyMeasurement, ReferenceMeasurement
+from measurement.rollups import update_tariff_rollups
+from replication import outbox
+
+QUARTER = timedelta(minutes=15)
+
+# Cumulative energy registers whose differences make the quarterly measurements
+QUARTERLY_COUNTERS = ("active_consumption", "active_generated", "reactive_inductive", "reactive_capacitive")
+
+
+def counter_blocks(memory_map) -> list[dict]:
+    """The quarterly register blocks trimmed to the energy counters."""
+    return select_blocks(memory_map.quarterly, QUARTERLY_COUNTERS)
+
+
+def derives_quarterly(transductor) -> bool:
+    """
+    True when the quarterly measurements of the transductor are computed from the counters read
+    with its minutely data (QUARTERLY_FROM_MINUTELY) instead of a quarterly collection.
+    """
+    return settings.QUARTERLY_FROM_MINUTELY and bool(counter_blocks(transductor.memory_map))
+
+
+def minutely_plan(transductor) -> list[dict]:
+    """Register blocks of the minutely collection, with the energy counters when `derives_quarterly`."""
+    blocks = list(transductor.memory_map.minutely)
+    if derives_quarterly(transductor):
+        blocks += counter_blocks(transductor.memory_map)
+    return blocks
+
+
+def truncate_quarter(collection_date: datetime) -> datetime:
+    collection_date = timezone.localtime(collection_date)
+    return collection_date.replace(
+        minute=collection_date.minute - collection_date.minute % 15, second=0, microsecond=0
+    )
+
+
+class QuarterlyCounterCache:
+    """
+    Quarterly measurements derived from the energy counters read every minute. The quarterly
+    `ReferenceMeasurement` of each transductor is kept in memory: readings within the quarter of
+    the reference are skipped without a query, and the first reading of a new quarter saves the
+    differences against it, dated at the start of that quarter, and becomes the new reference.
+    Missed quarters get equal shares of the difference, as `QuarterlyMeasurementSerializer` does.
+    """
+
+    def __init__(self):
+        self.references = {}
+
+    def load(self, transductor_ids) -> None:
+        missing = [transductor_id for transductor_id in transductor_ids if transductor_id not in self.references]
+        if not missing:
+            return
+
+        references = ReferenceMeasurement.objects.filter(transductor_id__in=missing, data_group=DataGroups.QUARTERLY)
+        for reference in references:
+            self.references[reference.transductor_id] = reference
+
+    def add(self, readings: list[dict], collection_date: datetime) -> list[QuarterlyMeasurement]:
+        """
+        Takes the minutely readings (dicts with the transductor id and the counters) collected at
+        `collection_date` and saves the quarterly measurements of the quarters they close.
+        """
+        readings = [
+            reading for reading in readings if all(reading.get(counter) is not None for counter in QUARTERLY_COUNTERS)
+        ]
+        self.load([reading["transductor"] for reading in readings])
+
+        quarter = truncate_quarter(collection_date)
+        readings = [reading for reading in readings if self.closes_quarter(reading["transductor"], quarter)]
+        if not readings:
+            return []
+
+        instances = []
+        with transaction.atomic():
+            for reading in readings:
+                counters = {counter: reading[counter] for counter in QUARTERLY_COUNTERS}
+                reference = self.references.get(reading["transductor"])
+
+                if reference is None:
+                    self.references[reading["transductor"]] = ReferenceMeasurement.objects.create(
+                        transductor_id=reading["transductor"],
+                        data_group=DataGroups.QUARTERLY,
+                        collection_date=collection_date,
+                        slave_collection_date=collection_date,
+                        **counters,
+                    )
+                    continue
+
+                instances += self.quarterly_measurements(reference, quarter, counters)
+
+                for counter, value in counters.items():
+                    setattr(reference, counter, value)
+                reference.collection_date = collection_date
+                reference.slave_collection_date = collection_date
+                reference.save()
+
+            QuarterlyMeasurement.objects.bulk_create(instances)
+            update_tariff_rollups(instances)
+            outbox.enqueue("quarterly", instances)
+
+        return instances
+
+    def closes_quarter(self, transductor_id: int, quarter: datetime) -> bool:
+        """True when the transductor has no reference yet or its reference is from an earlier quarter."""
+        reference = self.references.get(transductor_id)
+        return reference is None or truncate_quarter(reference.collection_date) < quarter
+
+    def quarterly_measurements(self, reference, quarter, counters) -> list[QuarterlyMeasurement]:
+        reference_quarter = truncate_quarter(reference.collection_date)
+        chunks = round((quarter - reference_quarter) / QUARTER)
+        diffs = {counter: round(value - getattr(reference, counter), 2) for counter, value in counters.items()}
+
+        instances = []
+        for index in range(chunks):
+            collection_date = reference_quarter + QUARTER * (index + 1)
+            instances.append(
+                QuarterlyMeasurement(
+                    transductor_id=reference.transductor_id,
+                    reference_measurement=reference,
+                    collection_date=collection_date,
+                    slave_collection_date=collection_date,
+                    tariff_post=get_tariff_post(collection_date),
+                    is_calculated=chunks > 1,
+                    **{counter: round(diff / chunks, 2) for counter, diff in diffs.items()},
+                )
+            )
+        return instances
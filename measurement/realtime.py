@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger("tasks")
+
+# Largest datagram sent to a subscriber; a batch bigger than this is split into several events
+DATAGRAM_SIZE = 60 * 1024
+
+# Batches buffered per connected client before the oldest ones are dropped
+CLIENT_QUEUE_SIZE = 32
+
+KEEPALIVE_SECONDS = 15
+
+
+def encode_readings(readings) -> list[bytes]:
+    """JSON arrays of the serialized readings, each one small enough to fit in a datagram."""
+    datagrams, current, size = [], [], 2
+    for reading in readings:
+        encoded = json.dumps(reading, cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+        if current and size + len(encoded) + 1 > DATAGRAM_SIZE:
+            datagrams.append(b"[" + b",".join(current) + b"]")
+            current, size = [], 2
+
+        current.append(encoded)
+        size += len(encoded) + 1
+
+    if current:
+        datagrams.append(b"[" + b",".join(current) + b"]")
+    return datagrams
+
+
+def publish(readings) -> int:
+    """
+    Sends a serialized minutely batch to every server process with connected stream clients,
+    one datagram per process whatever the number of clients. Never blocks: a process that is
+    gone loses its socket file and a process that is not reading loses the batch.
+    Returns the number of processes reached.
+    """
+    directory = Path(settings.REALTIME_SOCKET_DIR)
+    if not directory.is_dir():
+        return 0
+
+    datagrams = encode_readings(readings)
+    if not datagrams:
+        return 0
+
+    reached = 0
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+
+        for path in directory.glob("*.sock"):
+            try:
+                for datagram in datagrams:
+                    sock.sendto(datagram, str(path))
+                reached += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Realtime subscriber {path.name} skipped: {e}")
+
+    return reached
+
+
+class RealtimeHub:
+    """
+    Receiving side of `publish` in a server process: a single Unix datagram socket whose batches
+    are fanned out in memory to the queue of each connected client. The socket and its reader
+    thread are created with the first subscriber.
+    """
+
+    def __init__(self, directory, queue_size: int = CLIENT_QUEUE_SIZE):
+        self.directory = Path(directory)
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.sock = None
+        self.thread = None
+
+    @property
+    def path(self) -> Path:
+        return self.directory / f"{os.getpid()}.sock"
+
+    def subscribe(self) -> queue.Queue:
+        client_queue = queue.Queue(maxsize=self.queue_size)
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.start()
+            self.subscribers.add(client_queue)
+        return client_queue
+
+    def unsubscribe(self, client_queue: queue.Queue) -> None:
+        with self.lock:
+            self.subscribers.discard(client_queue)
+
+    def start(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path.unlink(missing_ok=True)
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(str(self.path))
+
+        self.thread = threading.Thread(target=self.run, args=(self.sock,), name="realtime-hub", daemon=True)
+        self.thread.start()
+
+    def run(self, sock) -> None:
+        while True:
+            try:
+                datagram = sock.recv(DATAGRAM_SIZE * 2)
+            except OSError:
+                return
+            self.dispatch(datagram)
+
+    def dispatch(self, datagram: bytes) -> None:
+        with self.lock:
+            subscribers = list(self.subscribers)
+
+        for client_queue in subscribers:
+            try:
+                client_queue.put_nowait(datagram)
+            except queue.Full:
+                # Slow client: the newest batch is worth more than the oldest one
+                try:
+                    client_queue.get_nowait()
+                    client_queue.put_nowait(datagram)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def close(self) -> None:
+        with self.lock:
+            if self.sock is not None:
+                self.sock.close()
+                self.path.unlink(missing_ok=True)
+            self.sock = self.thread = None
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub() -> RealtimeHub:
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = RealtimeHub(settings.REALTIME_SOCKET_DIR)
+        return _hub
+
+
+def event_stream(hub: RealtimeHub, snapshot: list[bytes] = (), keepalive: float = KEEPALIVE_SECONDS):
+    """
+    Server-Sent Events body: the latest readings (`snapshot`) followed by every published batch,
+    with a comment line every `keepalive` seconds so idle proxies keep the connection open.
+    """
+    client_queue = hub.subscribe()
+    try:
+        yield b"retry: 5000\n\n"
+        for datagram in snapshot:
+            yield b"event: measurements\ndata: " + datagram + b"\n\n"
+
+        while True:
+            try:
+                datagram = client_queue.get(timeout=keepalive)
+            except queue.Empty:
+                yield b": keepalive\n\n"
+                continue
+
+            yield b"event: measurements\ndata: " + datagram + b"\n\n"
+    finally:
+        hub.unsubscribe(client_queue)
@@ -0,0 +1,66 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the standard json encoder is used instead
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    `JSONRenderer` backed by orjson when it is installed. Values orjson does not know (Decimal,
+    lazy strings, ...) and datetimes go through the DRF encoder, so the output is the same.
+    Indented output (`Accept: application/json; indent=4`) keeps the standard encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+
+
+class ColumnarRenderer(FastJSONRenderer):
+    """
+    Opt-in compact representation of time-series lists (`?format=columnar` or this media type in
+    `Accept`). The view builds the columns; the renderer only selects the format.
+    """
+
+    media_type = "application/vnd.sige.columnar+json"
+    format = "columnar"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    `text/event-stream` for the Server-Sent Events endpoints. The stream itself is written by the
+    view; this renderer only serves content negotiation and renders errors as an `error` event.
+    """
+
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b"event: error\ndata: " + json.dumps(data, separators=(",", ":")).encode() + b"\n\n"
+
+
+COLUMNAR_KEYS = ("id", "collection_date")
+
+
+def to_columns(rows, fields) -> dict:
+    """
+    Transposes `values_list(*COLUMNAR_KEYS, *fields)` rows into one array per field. Collection
+    dates become `timestamps`, in epoch milliseconds.
+    """
+    names = [*COLUMNAR_KEYS, *fields]
+    values = zip(*rows) if rows else [()] * len(names)
+    columns = dict(zip(names, map(list, values)))
+
+    timestamps = [int(collection_date.timestamp() * 1000) for collection_date in columns.pop("collection_date")]
+    return {"timestamps": timestamps, **columns}
@@ -0,0 +1,184 @@
+import logging
+import time
+from datetime import datetime, timedelta
+
+from django.db import connection
+from django.db.models import Min
+from django.db.models.deletion import Collector
+
+from data_collector.models import CollectionReport
+from measurement.archive import deadline_passed
+from measurement.models import (
+    DailyMeasurementRollup,
+    HourlyMeasurementRollup,
+    MinutelyMeasurement,
+    MonthlyMeasurement,
+    PackedMinutelyHour,
+    QuarterlyMeasurement,
+    ReferenceMeasurement,
+)
+from measurement.packing import HOUR, truncate_hour
+from measurement.rollups import RESOLUTION_DAILY, rebuild_rollups, truncate_bucket
+from transductor.models import Transductor
+
+logger = logging.getLogger("tasks")
+
+# pg_try_advisory_lock key held while the retention policy is applied
+RETENTION_LOCK_ID = 7_300_043
+
+
+class RetentionRule:
+    """Rows of `model` whose `date_field` is older than the retention period, deleted by primary key batches."""
+
+    def __init__(self, model, date_field: str = "collection_date"):
+        self.model = model
+        self.date_field = date_field
+
+    def expired(self, cutoff: datetime):
+        return self.model.objects.filter(**{f"{self.date_field}__lt": cutoff})
+
+    def prepare(self, cutoff: datetime, deadline: float = None) -> bool:
+        """
+        Runs once before the rows older than `cutoff` are deleted. Returns False when stopped by
+        `deadline`: the rows are kept until a run completes it.
+        """
+        return True
+
+    def delete_batch(self, cutoff: datetime, batch_size: int) -> int:
+        return delete_ids(self.model, self.expired(cutoff).order_by("pk").values_list("pk", flat=True)[:batch_size])
+
+
+class MinutelyRetentionRule(RetentionRule):
+    """
+    Raw and packed minutely rows. Before they are deleted, the expired days without a daily rollup
+    get their hourly/daily rollups built, so the history is downsampled rather than lost.
+    """
+
+    def __init__(self):
+        super().__init__(MinutelyMeasurement)
+
+    def prepare(self, cutoff, deadline=None):
+        for transductor_id in Transductor.objects.values_list("id", flat=True):
+            first_dates = [
+                MinutelyMeasurement.objects.filter(transductor_id=transductor_id).aggregate(
+                    first=Min("collection_date")
+                ),
+                PackedMinutelyHour.objects.filter(transductor_id=transductor_id).aggregate(first=Min("hour")),
+            ]
+            first_dates = [first_date["first"] for first_date in first_dates if first_date["first"] is not None]
+            if not first_dates:
+                continue
+
+            day = truncate_bucket(RESOLUTION_DAILY, min(first_dates))
+            while day < cutoff:
+                if deadline_passed(deadline):
+                    return False
+
+                # The extra half day keeps the boundary on the right midnight across DST changes
+                next_day = truncate_bucket(RESOLUTION_DAILY, day + timedelta(hours=36))
+                if not DailyMeasurementRollup.objects.filter(transductor_id=transductor_id, bucket=day).exists():
+                    rows = rebuild_rollups(transductor_id, day, next_day)
+                    if rows:
+                        logger.info(f"Transductor: {transductor_id} - {day:%d/%m/%Y} - rollups built from {rows} rows")
+                day = next_day
+
+        return True
+
+    def delete_batch(self, cutoff, batch_size):
+        deleted = super().delete_batch(cutoff, batch_size)
+        if deleted:
+            return deleted
+
+        # packed hours go once every raw row is gone, as a whole; the readings they hold are counted
+        packed = PackedMinutelyHour.objects.filter(hour__lte=cutoff - HOUR).order_by("pk")
+        packed = list(packed.values_list("pk", "ids")[: max(1, batch_size // 60)])
+        delete_ids(PackedMinutelyHour, [pk for pk, _ in packed])
+        return sum(len(ids) for _, ids in packed)
+
+
+class ReferenceRetentionRule(RetentionRule):
+    """
+    Reference measurements (the counters the quarterly and monthly values are computed from) not
+    updated within the retention period: the transductor stopped reporting and its next reading
+    starts a new reference. References still used by a quarterly or monthly row are kept.
+    """
+
+    def __init__(self):
+        super().__init__(ReferenceMeasurement)
+
+    def expired(self, cutoff):
+        return (
+            super()
+            .expired(cutoff)
+            .exclude(pk__in=QuarterlyMeasurement.objects.values("reference_measurement"))
+            .exclude(pk__in=MonthlyMeasurement.objects.values("reference_measurement"))
+        )
+
+
+RETENTION_RULES = {
+    "minutely": MinutelyRetentionRule(),
+    "quarterly": RetentionRule(QuarterlyMeasurement),
+    "monthly": RetentionRule(MonthlyMeasurement),
+    "reference": ReferenceRetentionRule(),
+    "hourly_rollup": RetentionRule(HourlyMeasurementRollup, date_field="bucket"),
+    "daily_rollup": RetentionRule(DailyMeasurementRollup, date_field="bucket"),
+    "collection_report": RetentionRule(CollectionReport, date_field="slot"),
+}
+
+
+def delete_ids(model, ids) -> int:
+    """
+    Deletes the rows with these primary keys. A plain `DELETE` is issued when Django's collector
+    has nothing to cascade nor signals to send; otherwise the rows go through the collector.
+    """
+    ids = list(ids)
+    if not ids:
+        return 0
+
+    if Collector(using=connection.alias).can_fast_delete(model.objects.all()):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{model._meta.db_table}" WHERE "{model._meta.pk.column}" = ANY(%s)', [ids])
+            return cursor.rowcount
+
+    model.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def retention_cutoff(days: int, now: datetime) -> datetime:
+    """Whole hours, like the archive: both agree on which rows are expired."""
+    return truncate_hour(now - timedelta(days=days))
+
+
+def apply_retention(policy: dict, now: datetime, batch_size: int = 5000, pause: float = 0, deadline: float = None):
+    """
+    Deletes the rows of each rule of `policy` (`{rule name: days}`; 0 keeps forever) older than
+    their retention, one batch per transaction with `pause` seconds between batches so the
+    collector is never blocked for long. Stops at `deadline` (`time.monotonic()`), including
+    while a rule prepares its deletion. Returns the number of rows deleted per rule.
+    """
+    deleted = {}
+    for name, rule in RETENTION_RULES.items():
+        days = policy.get(name)
+        if not days:
+            continue
+
+        deleted[name] = 0
+        cutoff = retention_cutoff(days, now)
+        if deadline_passed(deadline) or not rule.prepare(cutoff, deadline):
+            break
+
+        start_time = time.perf_counter()
+        while not deadline_passed(deadline):
+            batch = rule.delete_batch(cutoff, batch_size)
+            if not batch:
+                break
+
+            deleted[name] += batch
+            rate = deleted[name] / max(time.perf_counter() - start_time, 1e-6)
+            logger.info(
+                f"Retention {name}: {deleted[name]} rows older than {cutoff:%d/%m/%Y %H:%M} deleted "
+                f"({rate:.0f} rows/s)"
+            )
+            time.sleep(pause)
+
+    return deleted
@@ -0,0 +1,309 @@
+import re
+from collections import defaultdict
+from datetime import date, datetime, time
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from data_collector.modbus.helpers import get_tariff_post
+from data_collector.modbus.settings import TariffPosts
+from measurement.deadband import iter_step_fill
+from measurement.models import (
+    DailyMeasurementRollup,
+    HourlyMeasurementRollup,
+    MinutelyMeasurement,
+    MonthlyTariffRollup,
+    QuarterlyMeasurement,
+)
+from measurement.packing import minutely_history
+
+RESOLUTION_MINUTELY = "minutely"
+RESOLUTION_HOURLY = "hourly"
+RESOLUTION_DAILY = "daily"
+
+RESOLUTION_SECONDS = {
+    RESOLUTION_MINUTELY: 60,
+    RESOLUTION_HOURLY: 60 * 60,
+    RESOLUTION_DAILY: 24 * 60 * 60,
+}
+
+# Coarsest first: the query side walks this list to pick the cheapest table.
+ROLLUP_MODELS = {
+    RESOLUTION_DAILY: DailyMeasurementRollup,
+    RESOLUTION_HOURLY: HourlyMeasurementRollup,
+}
+
+UNIT_SECONDS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+ENERGY_FIELDS = ("active_consumption", "active_generated", "reactive_inductive", "reactive_capacitive")
+
+# Names used by the monthly endpoint for each energy field: `<name>_peak_time` / `<name>_off_peak_time`
+TARIFF_SUMMARY_FIELDS = {
+    "consumption": "active_consumption",
+    "generated_energy": "active_generated",
+    "inductive_power": "reactive_inductive",
+    "capacitive_power": "reactive_capacitive",
+}
+
+
+def parse_resolution(value: str) -> int:
+    """
+    Converts a resolution query param into seconds. Accepts the resolution names
+    (`minutely`, `hourly`, `daily`), plain seconds (`900`) or a number with unit (`15m`, `1h`, `7d`).
+    """
+    value = str(value).strip().lower()
+
+    if value in RESOLUTION_SECONDS:
+        return RESOLUTION_SECONDS[value]
+
+    match = re.fullmatch(r"(\d+)([smhd]?)", value)
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Invalid resolution: '{value}'")
+
+    number, unit = match.groups()
+    return int(number) * UNIT_SECONDS[unit or "s"]
+
+
+def select_resolution(resolution_seconds: int) -> str:
+    """Returns the coarsest stored resolution whose bucket still fits in the requested one."""
+    for resolution in ROLLUP_MODELS:
+        if resolution_seconds >= RESOLUTION_SECONDS[resolution]:
+            return resolution
+    return RESOLUTION_MINUTELY
+
+
+def truncate_bucket(resolution: str, date: datetime) -> datetime:
+    """Start of the local (settings.TIME_ZONE) hour or day that contains `date`."""
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+
+    local_date = timezone.localtime(date)
+    if resolution == RESOLUTION_HOURLY:
+        return local_date.replace(minute=0, second=0, microsecond=0)
+    return local_date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def accumulate(rollup, fields: list[str], values: dict, collection_date: datetime) -> None:
+    """Folds one minutely reading into the running aggregates of a rollup instance."""
+    if timezone.is_naive(collection_date):
+        collection_date = timezone.make_aware(collection_date)
+
+    is_latest = rollup.last_collection_date is None or collection_date >= rollup.last_collection_date
+
+    for field in fields:
+        value = values.get(field)
+        if value is None:
+            continue
+
+        aggregate = rollup.data.get(field)
+        if aggregate is None:
+            rollup.data[field] = {"min": value, "max": value, "sum": value, "count": 1, "last": value}
+            continue
+
+        aggregate["min"] = min(aggregate["min"], value)
+        aggregate["max"] = max(aggregate["max"], value)
+        aggregate["sum"] += value
+        aggregate["count"] += 1
+        if is_latest:
+            aggregate["last"] = value
+
+    rollup.samples += 1
+    if is_latest:
+        rollup.last_collection_date = collection_date
+
+
+def update_rollups(measurements: list[MinutelyMeasurement]) -> None:
+    """
+    Incrementally folds a freshly ingested minutely batch into the hourly and daily rollups.
+    Costs one locking SELECT plus one bulk insert/update per rollup table, whatever the batch size.
+    """
+    if not measurements:
+        return
+
+    fields = MinutelyMeasurement.measurement_fields()
+
+    with transaction.atomic():
+        for resolution, model in ROLLUP_MODELS.items():
+            grouped = defaultdict(list)
+            for measurement in measurements:
+                bucket = truncate_bucket(resolution, measurement.collection_date)
+                grouped[(measurement.transductor_id, bucket)].append(measurement)
+
+            existing = model.objects.select_for_update().filter(
+                transductor_id__in={transductor_id for transductor_id, _ in grouped},
+                bucket__in={bucket for _, bucket in grouped},
+            )
+            rollups = {(rollup.transductor_id, rollup.bucket): rollup for rollup in existing}
+
+            new_rollups = []
+            for (transductor_id, bucket), bucket_measurements in grouped.items():
+                rollup = rollups.get((transductor_id, bucket))
+                if rollup is None:
+                    rollup = model(transductor_id=transductor_id, bucket=bucket, data={})
+                    new_rollups.append(rollup)
+
+                for measurement in bucket_measurements:
+                    values = {field: getattr(measurement, field) for field in fields}
+                    accumulate(rollup, fields, values, measurement.collection_date)
+
+            model.objects.bulk_create(new_rollups)
+            model.objects.bulk_update(rollups.values(), fields=["samples", "data", "last_collection_date"])
+
+
+def rebuild_rollups(transductor_id: int, start: datetime, end: datetime) -> int:
+    """
+    Recomputes every rollup of a transductor in [start, end) from the stored minutely history.
+    `start` and `end` must be aligned to local midnights so that daily buckets are complete.
+    Returns the number of minutely rows read.
+    """
+    fields = MinutelyMeasurement.measurement_fields()
+    rollups = {resolution: {} for resolution in ROLLUP_MODELS}
+
+    queryset = minutely_history(start, end).filter(transductor_id=transductor_id)
+    rows = queryset.order_by("collection_date").values_list("transductor", "collection_date", *fields, named=True)
+
+    total = 0
+    for row in iter_step_fill(rows.iterator(chunk_size=2000)):
+        collection_date = row.collection_date
+        values = {field: getattr(row, field) for field in fields}
+        for resolution, model in ROLLUP_MODELS.items():
+            bucket = truncate_bucket(resolution, collection_date)
+            rollup = rollups[resolution].get(bucket)
+            if rollup is None:
+                rollup = model(transductor_id=transductor_id, bucket=bucket, data={})
+                rollups[resolution][bucket] = rollup
+            accumulate(rollup, fields, values, collection_date)
+        total += 1
+
+    with transaction.atomic():
+        for resolution, model in ROLLUP_MODELS.items():
+            model.objects.filter(transductor_id=transductor_id, bucket__gte=start, bucket__lt=end).delete()
+            model.objects.bulk_create(rollups[resolution].values())
+
+    return total
+
+
+def truncate_month(collection_date: datetime) -> date:
+    """First day of the local (settings.TIME_ZONE) month that contains `collection_date`."""
+    if timezone.is_naive(collection_date):
+        collection_date = timezone.make_aware(collection_date)
+    return timezone.localtime(collection_date).date().replace(day=1)
+
+
+def month_start(month: date) -> datetime:
+    return timezone.make_aware(datetime.combine(month.replace(day=1), time.min))
+
+
+def tariff_annotations(peak: Q, off_peak: Q, intermediate: Q = None) -> dict:
+    """`Sum` annotations of the energy fields split into peak, off-peak and (optionally) intermediate time."""
+    annotations = {}
+    for name, field in TARIFF_SUMMARY_FIELDS.items():
+        annotations[f"{name}_peak_time"] = Sum(field, filter=peak)
+        annotations[f"{name}_off_peak_time"] = Sum(field, filter=off_peak)
+        if intermediate is not None:
+            annotations[f"{name}_intermediate_time"] = Sum(field, filter=intermediate)
+    return annotations
+
+
+def tariff_post_filters() -> tuple[Q, Q, Q]:
+    """Peak, off-peak and intermediate filters over a `tariff_post` column."""
+    return (
+        Q(tariff_post=TariffPosts.PEAK),
+        Q(tariff_post=TariffPosts.OFF_PEAK),
+        Q(tariff_post=TariffPosts.INTERMEDIATE),
+    )
+
+
+def monthly_tariff_summary(queryset=None):
+    """Per month and transductor energy of each tariff post, read from the precomputed tariff rollup."""
+    if queryset is None:
+        queryset = MonthlyTariffRollup.objects.all()
+
+    queryset = queryset.values("month", "transductor").annotate(**tariff_annotations(*tariff_post_filters()))
+    return queryset.order_by("-month", "transductor")
+
+
+def range_tariff_summary(start_date, end_date) -> list[dict]:
+    """
+    Per transductor energy of each tariff post over [start_date, end_date], summed on the stored
+    `tariff_post`. The legacy rows not backfilled yet (see `backfill_tariff_post`) are classified
+    with the tariff calendar on read.
+    """
+    queryset = QuarterlyMeasurement.objects.filter(collection_date__range=[start_date, end_date])
+    summary = queryset.values("transductor").annotate(**tariff_annotations(*tariff_post_filters()))
+    rows = {row["transductor"]: row for row in summary.order_by("transductor")}
+
+    legacy = queryset.filter(tariff_post__isnull=True).only("transductor_id", "collection_date", *ENERGY_FIELDS)
+    for (transductor_id, _, tariff_post), totals in tariff_increments(legacy.iterator(chunk_size=2000)).items():
+        row = rows[transductor_id]
+        for name, field in TARIFF_SUMMARY_FIELDS.items():
+            key = f"{name}_{TariffPosts(tariff_post).label}_time"
+            row[key] = (row[key] or 0) + totals[field]
+
+    return list(rows.values())
+
+
+def tariff_increments(measurements) -> dict:
+    """Energy of the quarterly measurements summed per (transductor, month, tariff post)."""
+    increments = {}
+    for measurement in measurements:
+        tariff_post = measurement.tariff_post
+        if tariff_post is None:
+            tariff_post = get_tariff_post(measurement.collection_date)
+
+        key = (measurement.transductor_id, truncate_month(measurement.collection_date), tariff_post)
+        totals = increments.setdefault(key, {**dict.fromkeys(ENERGY_FIELDS, 0.0), "samples": 0})
+
+        for field in ENERGY_FIELDS:
+            totals[field] += getattr(measurement, field) or 0
+        totals["samples"] += 1
+
+    return increments
+
+
+def update_tariff_rollups(measurements: list[QuarterlyMeasurement]) -> None:
+    """Adds freshly ingested quarterly measurements to the monthly tariff rollup."""
+    increments = tariff_increments(measurements)
+
+    with transaction.atomic():
+        for (transductor_id, month, tariff_post), totals in increments.items():
+            rollup, _ = MonthlyTariffRollup.objects.select_for_update().get_or_create(
+                transductor_id=transductor_id,
+                month=month,
+                tariff_post=tariff_post,
+            )
+
+            MonthlyTariffRollup.objects.filter(pk=rollup.pk).update(
+                **{field: F(field) + value for field, value in totals.items()},
+                updated_at=timezone.now(),
+            )
+
+
+def rebuild_tariff_rollups(transductor_id: int, start_month: date, end_month: date) -> int:
+    """
+    Recomputes the tariff rollup of a transductor for the months in [start_month, end_month)
+    from the quarterly history. Returns the number of quarterly rows read.
+    """
+    queryset = QuarterlyMeasurement.objects.filter(
+        transductor_id=transductor_id,
+        collection_date__gte=month_start(start_month),
+        collection_date__lt=month_start(end_month),
+    )
+    queryset = queryset.only("transductor_id", "collection_date", "tariff_post", *ENERGY_FIELDS)
+
+    increments = tariff_increments(queryset.iterator(chunk_size=2000))
+
+    with transaction.atomic():
+        MonthlyTariffRollup.objects.filter(
+            transductor_id=transductor_id,
+            month__gte=start_month,
+            month__lt=end_month,
+        ).delete()
+
+        MonthlyTariffRollup.objects.bulk_create(
+            MonthlyTariffRollup(transductor_id=transductor_id, month=month, tariff_post=tariff_post, **totals)
+            for (_, month, tariff_post), totals in increments.items()
+        )
+
+    return sum(totals["samples"] for totals in increments.values())
@@ -1,16 +1,23 @@
 from datetime import timedelta
 
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
 
-from data_collector.modbus.helpers import is_peak_time
-from data_collector.modbus.settings import DataGroups
+from data_collector.modbus.helpers import get_tariff_post
+from data_collector.modbus.settings import DataGroups, TariffPosts
+from measurement import deadband, realtime
+from measurement.fast import ValuesSerializer
 from measurement.models import (
+    BaseMinutelyMeasurement,
     MinutelyMeasurement,
     MonthlyMeasurement,
     QuarterlyMeasurement,
     ReferenceMeasurement,
 )
+from measurement.rollups import ENERGY_FIELDS, update_rollups, update_tariff_rollups
+from measurement.watermarks import WATERMARK_MINUTELY, bump_watermarks
+from replication import outbox
 
 
 class RealTimeMeasurementSerializer(serializers.ModelSerializer):
@@ -32,9 +39,36 @@ class RealTimeMeasurementSerializer(serializers.ModelSerializer):
         )
 
 
+class MinutelyMeasurementListSerializer(serializers.ListSerializer):
+    """
+    Saves a whole minutely collection with a single INSERT (deadbanded values as NULL) and folds
+    the full readings into the rollups in the same transaction.
+    """
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+
+        with transaction.atomic():
+            instances = [model(**attrs) for attrs in validated_data]
+            suppressed = deadband.compress(instances)
+            model.objects.bulk_create(instances)
+            deadband.restore(instances, suppressed)
+
+            update_rollups(instances)
+            outbox.enqueue("minutely", instances)
+
+            bump_watermarks(WATERMARK_MINUTELY)
+
+            readings = RealTimeMeasurementSerializer(instances, many=True).data
+            transaction.on_commit(lambda: realtime.publish(readings))
+
+        return instances
+
+
 class MinutelyMeasurementSerializer(serializers.ModelSerializer):
     class Meta:
         model = MinutelyMeasurement
+        list_serializer_class = MinutelyMeasurementListSerializer
         fields = (
             "id",
             "transductor",
@@ -70,6 +104,7 @@ class MinutelyMeasurementSerializer(serializers.ModelSerializer):
             "dht_current_a",
             "dht_current_b",
             "dht_current_c",
+            "high_rate_stats",
             "collection_date",
         )
 
@@ -158,6 +193,7 @@ class QuarterlyMeasurementSerializer(BaseMeasurementSerializer):
             "collection_date",
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         data_group = DataGroups.QUARTERLY
 
@@ -174,10 +210,16 @@ class QuarterlyMeasurementSerializer(BaseMeasurementSerializer):
         chunks = self.calculate_data_chunks(reference_collection_date, current_collection_date)
 
         if chunks <= 1:
-            return super().create(validated_data)
+            validated_data["tariff_post"] = get_tariff_post(current_collection_date)
+            instance = super().create(validated_data)
+            update_tariff_rollups([instance])
+            outbox.enqueue("quarterly", [instance])
+            return instance
 
         instances = self.split_data_create_instances(validated_data, reference_collection_date, chunks)
         self.Meta.model.objects.bulk_create(instances)
+        update_tariff_rollups(instances)
+        outbox.enqueue("quarterly", instances)
         return instances[-1]
 
     def calculate_data_chunks(self, ref_collection_date, collection_date) -> int:
@@ -194,6 +236,7 @@ class QuarterlyMeasurementSerializer(BaseMeasurementSerializer):
         for i in range(chunks):
             data_chunk = {key: round(value / chunks, 2) for key, value in validate_data.items()}
             data_chunk["collection_date"] = ref_collection_date + timedelta(minutes=15 * (i + 1))
+            data_chunk["tariff_post"] = get_tariff_post(data_chunk["collection_date"])
             data_chunk["transductor"] = transductor
             data_chunk["reference_measurement"] = reference
             data_chunk["is_calculated"] = True
@@ -216,6 +259,7 @@ class MonthlyMeasurementSerializer(BaseMeasurementSerializer):
             "collection_date",
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         data_group = DataGroups.MONTHLY
 
@@ -224,18 +268,24 @@ class MonthlyMeasurementSerializer(BaseMeasurementSerializer):
 
         reference_measurement = self.get_reference(data_group, validated_data.get("transductor"))
         self.update_reference_measurement(reference_measurement, validated_data)
-        return super().create(validated_data)
+        instance = super().create(validated_data)
+        outbox.enqueue("monthly", [instance])
+        return instance
 
 
 class QuarterlyListMeasurementSerializer(serializers.ModelSerializer):
     consumption_peak_time = serializers.SerializerMethodField()
     consumption_off_peak_time = serializers.SerializerMethodField()
+    consumption_intermediate_time = serializers.SerializerMethodField()
     generated_energy_peak_time = serializers.SerializerMethodField()
     generated_energy_off_peak_time = serializers.SerializerMethodField()
+    generated_energy_intermediate_time = serializers.SerializerMethodField()
     inductive_power_peak_time = serializers.SerializerMethodField()
     inductive_power_off_peak_time = serializers.SerializerMethodField()
+    inductive_power_intermediate_time = serializers.SerializerMethodField()
     capacitive_power_peak_time = serializers.SerializerMethodField()
     capacitive_power_off_peak_time = serializers.SerializerMethodField()
+    capacitive_power_intermediate_time = serializers.SerializerMethodField()
     collection_date = serializers.DateTimeField(default=timezone.now)
 
     class Meta:
@@ -246,47 +296,118 @@ class QuarterlyListMeasurementSerializer(serializers.ModelSerializer):
             "is_calculated",
             "consumption_peak_time",
             "consumption_off_peak_time",
+            "consumption_intermediate_time",
             "generated_energy_peak_time",
             "generated_energy_off_peak_time",
+            "generated_energy_intermediate_time",
             "inductive_power_peak_time",
             "inductive_power_off_peak_time",
+            "inductive_power_intermediate_time",
             "capacitive_power_peak_time",
             "capacitive_power_off_peak_time",
+            "capacitive_power_intermediate_time",
             "collection_date",
         )
 
-    def get_measurement(self, obj, measurement_type, is_peak):
-        date_time = obj.collection_date
-        measurement_value = getattr(obj, measurement_type)
+    def get_measurement(self, obj, measurement_type, tariff_post):
+        obj_tariff_post = obj.tariff_post
+        if obj_tariff_post is None:  # legacy row not backfilled yet (see `backfill_tariff_post`)
+            obj_tariff_post = get_tariff_post(obj.collection_date)
 
-        if is_peak_time(date_time):
-            return measurement_value if is_peak else None
-        else:
-            return None if is_peak else measurement_value
+        return getattr(obj, measurement_type) if obj_tariff_post == tariff_post else None
 
     def get_consumption_peak_time(self, obj):
-        return self.get_measurement(obj, "active_consumption", True)
+        return self.get_measurement(obj, "active_consumption", TariffPosts.PEAK)
 
     def get_consumption_off_peak_time(self, obj):
-        return self.get_measurement(obj, "active_consumption", False)
+        return self.get_measurement(obj, "active_consumption", TariffPosts.OFF_PEAK)
+
+    def get_consumption_intermediate_time(self, obj):
+        return self.get_measurement(obj, "active_consumption", TariffPosts.INTERMEDIATE)
 
     def get_generated_energy_peak_time(self, obj):
-        return self.get_measurement(obj, "active_generated", True)
+        return self.get_measurement(obj, "active_generated", TariffPosts.PEAK)
 
     def get_generated_energy_off_peak_time(self, obj):
-        return self.get_measurement(obj, "active_generated", False)
+        return self.get_measurement(obj, "active_generated", TariffPosts.OFF_PEAK)
+
+    def get_generated_energy_intermediate_time(self, obj):
+        return self.get_measurement(obj, "active_generated", TariffPosts.INTERMEDIATE)
 
     def get_inductive_power_peak_time(self, obj):
-        return self.get_measurement(obj, "reactive_inductive", True)
+        return self.get_measurement(obj, "reactive_inductive", TariffPosts.PEAK)
 
     def get_inductive_power_off_peak_time(self, obj):
-        return self.get_measurement(obj, "reactive_inductive", False)
+        return self.get_measurement(obj, "reactive_inductive", TariffPosts.OFF_PEAK)
+
+    def get_inductive_power_intermediate_time(self, obj):
+        return self.get_measurement(obj, "reactive_inductive", TariffPosts.INTERMEDIATE)
 
     def get_capacitive_power_peak_time(self, obj):
-        return self.get_measurement(obj, "reactive_capacitive", True)
+        return self.get_measurement(obj, "reactive_capacitive", TariffPosts.PEAK)
 
     def get_capacitive_power_off_peak_time(self, obj):
-        return self.get_measurement(obj, "reactive_capacitive", False)
+        return self.get_measurement(obj, "reactive_capacitive", TariffPosts.OFF_PEAK)
+
+    def get_capacitive_power_intermediate_time(self, obj):
+        return self.get_measurement(obj, "reactive_capacitive", TariffPosts.INTERMEDIATE)
+
+
+class MinutelyMeasurementValuesSerializer(ValuesSerializer):
+    serializer_class = MinutelyMeasurementSerializer
+
+    def prepare_rows(self, rows):
+        return deadband.step_fill(rows)
+
+
+class QuarterlyListMeasurementValuesSerializer(ValuesSerializer):
+    """Same output as `QuarterlyListMeasurementSerializer`, with the energy split by the stored tariff post."""
+
+    serializer_class = QuarterlyListMeasurementSerializer
+    extra_source_fields = ("tariff_post", *ENERGY_FIELDS)
+
+    def get_measurement(self, row, measurement_type, tariff_post):
+        row_tariff_post = row.tariff_post
+        if row_tariff_post is None:  # legacy row not backfilled yet (see `backfill_tariff_post`)
+            row_tariff_post = get_tariff_post(row.collection_date)
+
+        return getattr(row, measurement_type) if row_tariff_post == tariff_post else None
+
+    def get_consumption_peak_time(self, row):
+        return self.get_measurement(row, "active_consumption", TariffPosts.PEAK)
+
+    def get_consumption_off_peak_time(self, row):
+        return self.get_measurement(row, "active_consumption", TariffPosts.OFF_PEAK)
+
+    def get_consumption_intermediate_time(self, row):
+        return self.get_measurement(row, "active_consumption", TariffPosts.INTERMEDIATE)
+
+    def get_generated_energy_peak_time(self, row):
+        return self.get_measurement(row, "active_generated", TariffPosts.PEAK)
+
+    def get_generated_energy_off_peak_time(self, row):
+        return self.get_measurement(row, "active_generated", TariffPosts.OFF_PEAK)
+
+    def get_generated_energy_intermediate_time(self, row):
+        return self.get_measurement(row, "active_generated", TariffPosts.INTERMEDIATE)
+
+    def get_inductive_power_peak_time(self, row):
+        return self.get_measurement(row, "reactive_inductive", TariffPosts.PEAK)
+
+    def get_inductive_power_off_peak_time(self, row):
+        return self.get_measurement(row, "reactive_inductive", TariffPosts.OFF_PEAK)
+
+    def get_inductive_power_intermediate_time(self, row):
+        return self.get_measurement(row, "reactive_inductive", TariffPosts.INTERMEDIATE)
+
+    def get_capacitive_power_peak_time(self, row):
+        return self.get_measurement(row, "reactive_capacitive", TariffPosts.PEAK)
+
+    def get_capacitive_power_off_peak_time(self, row):
+        return self.get_measurement(row, "reactive_capacitive", TariffPosts.OFF_PEAK)
+
+    def get_capacitive_power_intermediate_time(self, row):
+        return self.get_measurement(row, "reactive_capacitive", TariffPosts.INTERMEDIATE)
 
 
 class MonthlyListMeasurementSerializer(serializers.Serializer):
@@ -295,12 +416,16 @@ class MonthlyListMeasurementSerializer(serializers.Serializer):
     end_date = serializers.DateTimeField()
     consumption_peak_time = serializers.FloatField()
     consumption_off_peak_time = serializers.FloatField()
+    consumption_intermediate_time = serializers.FloatField(required=False)
     generated_energy_peak_time = serializers.FloatField()
     generated_energy_off_peak_time = serializers.FloatField()
+    generated_energy_intermediate_time = serializers.FloatField(required=False)
     inductive_power_peak_time = serializers.FloatField()
     inductive_power_off_peak_time = serializers.FloatField()
+    inductive_power_intermediate_time = serializers.FloatField(required=False)
     capacitive_power_peak_time = serializers.FloatField()
     capacitive_power_off_peak_time = serializers.FloatField()
+    capacitive_power_intermediate_time = serializers.FloatField(required=False)
 
     def to_representation(self, instance):
         start_date = self.context.get("start_date")
@@ -316,3 +441,45 @@ class MonthlyListMeasurementSerializer(serializers.Serializer):
             instance["end_date"] = ld_month.strftime("%d-%m-%Y")
 
         return super().to_representation(instance)
+
+
+class MeasurementRollupSerializer(serializers.BaseSerializer):
+    """
+    Read-only representation shared by the hourly/daily rollups and the raw minutely rows,
+    so clients get the same shape whatever table answered the query.
+    """
+
+    date_field = serializers.DateTimeField()
+
+    def to_representation(self, instance):
+        resolution = self.context.get("resolution")
+        fields = self.context.get("fields") or MinutelyMeasurement.measurement_fields()
+
+        if isinstance(instance, BaseMinutelyMeasurement):
+            bucket, samples = instance.collection_date, 1
+            aggregates = {}
+            for field in fields:
+                value = getattr(instance, field)
+                aggregates[field] = {"min": value, "max": value, "avg": value, "last": value}
+        else:
+            bucket, samples = instance.bucket, instance.samples
+            aggregates = {field: self.get_aggregate(instance.data.get(field)) for field in fields}
+
+        return {
+            "transductor": instance.transductor_id,
+            "resolution": resolution,
+            "bucket": self.date_field.to_representation(bucket),
+            "samples": samples,
+            **aggregates,
+        }
+
+    def get_aggregate(self, aggregate):
+        if not aggregate:
+            return {"min": None, "max": None, "avg": None, "last": None}
+
+        return {
+            "min": aggregate["min"],
+            "max": aggregate["max"],
+            "avg": round(aggregate["sum"] / aggregate["count"], 2),
+            "last": aggregate["last"],
+        }
@@ -0,0 +1,153 @@
+import csv
+import importlib.util
+import io
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from data_collector.modbus.settings import DataGroups
+from data_collector.models import MemoryMap
+from measurement.archive import (
+    ARCHIVE_TABLES,
+    archive_transductor,
+    read_archive,
+    restore_archive,
+)
+from measurement.models import (
+    MinutelyMeasurement,
+    MinutelyMeasurementHistory,
+    PackedMinutelyHour,
+    QuarterlyMeasurement,
+    ReferenceMeasurement,
+)
+from measurement.packing import pack_minutely
+from transductor.models import Transductor
+
+
+@skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+class MeasurementArchiveTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+        # the last day of May and the first of June (local time)
+        self.start = timezone.make_aware(datetime(2023, 5, 31, 23, 0, 0))
+        MinutelyMeasurement.objects.bulk_create(
+            MinutelyMeasurement(
+                transductor=self.transductor,
+                voltage_a=220 + step,
+                high_rate_stats={"voltage_a": {"min": 219.5}} if step == 1 else None,
+                collection_date=self.start + timedelta(minutes=30 * step),
+            )
+            for step in range(4)
+        )
+        pack_minutely(self.transductor.id, self.start + timedelta(hours=1))
+
+        reference = ReferenceMeasurement.objects.create(transductor=self.transductor, data_group=DataGroups.QUARTERLY)
+        QuarterlyMeasurement.objects.create(
+            transductor=self.transductor,
+            active_consumption=12.5,
+            reference_measurement=reference,
+            collection_date=self.start + timedelta(hours=1),
+        )
+
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.before = self.start + timedelta(days=1)
+
+    def test_archive_and_restore(self):
+        history = list(MinutelyMeasurementHistory.objects.order_by("id").values("id", "voltage_a", "high_rate_stats"))
+
+        self.assertEqual(
+            4, archive_transductor(ARCHIVE_TABLES["minutely"], 1, self.before, self.directory, delete=True)
+        )
+        self.assertEqual(
+            1, archive_transductor(ARCHIVE_TABLES["quarterly"], 1, self.before, self.directory, delete=True)
+        )
+
+        self.assertEqual(
+            ["2023-05.arrow", "2023-06.arrow"],
+            sorted(path.name for path in (self.directory / "minutely" / "transductor=1").iterdir()),
+        )
+        self.assertFalse(MinutelyMeasurement.objects.exists())
+        self.assertFalse(PackedMinutelyHour.objects.exists())
+        self.assertFalse(QuarterlyMeasurement.objects.exists())
+
+        june = timezone.make_aware(datetime(2023, 6, 1))
+        archived = read_archive(ARCHIVE_TABLES["minutely"], self.directory, transductor_id=1, start=june)
+        self.assertEqual([222.0, 223.0], archived["voltage_a"].to_pylist())
+
+        archived = read_archive(ARCHIVE_TABLES["minutely"], self.directory)
+        self.assertEqual(4, restore_archive(ARCHIVE_TABLES["minutely"], archived))
+        self.assertEqual(0, restore_archive(ARCHIVE_TABLES["minutely"], archived))
+        restored = list(MinutelyMeasurementHistory.objects.order_by("id").values("id", "voltage_a", "high_rate_stats"))
+        self.assertEqual(history, restored)
+
+        archived = read_archive(ARCHIVE_TABLES["quarterly"], self.directory)
+        self.assertEqual(1, restore_archive(ARCHIVE_TABLES["quarterly"], archived))
+        self.assertEqual(12.5, QuarterlyMeasurement.objects.get().active_consumption)
+
+    def test_archiving_again_merges_the_month(self):
+        table = ARCHIVE_TABLES["minutely"]
+        archive_transductor(table, 1, self.before, self.directory)
+        MinutelyMeasurement.objects.filter(voltage_a=223).update(voltage_a=300)
+
+        archive_transductor(table, 1, self.before, self.directory)
+
+        archived = read_archive(table, self.directory)
+        self.assertEqual([220.0, 221.0, 222.0, 300.0], archived["voltage_a"].to_pylist())
+
+    @override_settings(MEASUREMENT_ARCHIVE_DIR="")
+    def test_commands(self):
+        call_command(
+            "archive_measurements", before_days=0, directory=str(self.directory), delete=True, stdout=io.StringIO()
+        )
+        self.assertFalse(MinutelyMeasurement.objects.exists())
+
+        output = io.StringIO()
+        call_command(
+            "read_archive",
+            "minutely",
+            directory=str(self.directory),
+            start_date="2023-05-31T23:30:00-03:00",
+            stdout=output,
+        )
+        rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+        self.assertEqual(["221.0", "222.0", "223.0"], [row["voltage_a"] for row in rows])
+        self.assertEqual('{"voltage_a": {"min": 219.5}}', rows[0]["high_rate_stats"])
+
+    def test_retention_keeps_the_rows_the_archive_did_not_reach(self):
+        output = io.StringIO()
+        with override_settings(
+            MEASUREMENT_ARCHIVE_DIR=str(self.directory),
+            MEASUREMENT_RETENTION={"minutely": 1, "quarterly": 1},
+            RETENTION_PAUSE=0,
+        ), mock.patch("measurement.archive.deadline_passed", return_value=True):
+            call_command("delete_old_measurements", max_seconds=60, stdout=output)
+
+        self.assertIn("0 old measurements deleted", output.getvalue())
+        self.assertEqual(4, MinutelyMeasurementHistory.objects.count())
+        self.assertEqual(1, QuarterlyMeasurement.objects.count())
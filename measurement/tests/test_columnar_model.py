@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from data_collector.models import MemoryMap
+from measurement.models import MinutelyMeasurement
+from transductor.models import Transductor
+
+
+@override_settings(DEBUG_TOOLBAR_CONFIG={"SHOW_TOOLBAR_CALLBACK": lambda request: False})
+class ColumnarFormatTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+        self.start = timezone.make_aware(datetime(2023, 6, 5, 14, 0, 0))
+        MinutelyMeasurement.objects.bulk_create(
+            MinutelyMeasurement(
+                transductor=self.transductor,
+                voltage_a=220 + minute,
+                collection_date=self.start + timedelta(minutes=minute),
+            )
+            for minute in range(3)
+        )
+
+    def test_columnar_matches_row_format(self):
+        rows = self.client.get(reverse("minutely-list")).json()["results"]
+        response = self.client.get(reverse("minutely-list"), {"format": "columnar"})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("application/vnd.sige.columnar+json", response["Content-Type"])
+
+        columns = response.json()["results"]
+        self.assertEqual([row["id"] for row in rows], columns["id"])
+        self.assertEqual([row["voltage_a"] for row in rows], columns["voltage_a"])
+        self.assertEqual([self.transductor.id] * 3, columns["transductor"])
+
+        timestamps = [int((self.start + timedelta(minutes=minute)).timestamp() * 1000) for minute in [2, 1, 0]]
+        self.assertEqual(timestamps, columns["timestamps"])
+
+    def test_columnar_with_accept_header_and_fields(self):
+        response = self.client.get(
+            reverse("minutely-list"),
+            {"fields": "voltage_a"},
+            HTTP_ACCEPT="application/vnd.sige.columnar+json",
+        )
+
+        columns = response.json()["results"]
+        self.assertEqual({"timestamps", "id", "transductor", "voltage_a"}, set(columns))
+
+        response = self.client.get(reverse("minutely-list"), {"format": "columnar", "fields": "unknown"})
+        self.assertEqual(400, response.status_code)
+
+    def test_columnar_pagination(self):
+        response = self.client.get(reverse("minutely-list"), {"format": "columnar", "page_size": 2})
+        self.assertEqual(2, len(response.json()["results"]["id"]))
+
+        response = self.client.get(response.json()["next"])
+        self.assertEqual(1, len(response.json()["results"]["id"]))
+
+    def test_empty_columnar_page(self):
+        response = self.client.get(reverse("quarterly-list"), {"format": "columnar"})
+        self.assertEqual([], response.json()["results"]["active_consumption"])
@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from data_collector.models import MemoryMap
+from measurement.models import HourlyMeasurementRollup, MinutelyMeasurement
+from measurement.realtime import RealtimeHub
+from measurement.serializers import MinutelyMeasurementSerializer
+from transductor.models import Transductor
+
+
+@override_settings(
+    DEBUG_TOOLBAR_CONFIG={"SHOW_TOOLBAR_CALLBACK": lambda request: False},
+    MINUTELY_DEADBANDS={"frequency_a": 0.05},
+    DEADBAND_KEYFRAME_MINUTES=60,
+)
+class DeadbandTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+        self.start = timezone.make_aware(datetime(2023, 6, 5, 14, 0, 0))
+
+    def save_minutely(self, frequencies):
+        for minute, frequency in enumerate(frequencies):
+            data = {
+                "transductor": self.transductor.id,
+                "frequency_a": frequency,
+                "voltage_a": 220 + minute,
+                "collection_date": self.start + timedelta(minutes=minute),
+            }
+            serializer = MinutelyMeasurementSerializer(data=[data], many=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+    def stored(self, field="frequency_a"):
+        return list(MinutelyMeasurement.objects.order_by("collection_date").values_list(field, flat=True))
+
+    def test_values_within_tolerance_are_not_stored(self):
+        self.save_minutely([60.0, 60.02, 60.1, 60.11, 60.04])
+
+        self.assertEqual([60.0, None, 60.1, None, 60.04], self.stored())
+        self.assertEqual([220, 221, 222, 223, 224], self.stored("voltage_a"))
+
+        rollup = HourlyMeasurementRollup.objects.get()
+        self.assertEqual(
+            {"min": 60.0, "max": 60.11, "count": 5},
+            {key: rollup.data["frequency_a"][key] for key in ["min", "max", "count"]},
+        )
+
+    @override_settings(DEADBAND_KEYFRAME_MINUTES=2)
+    def test_keyframe_interval_forces_a_stored_value(self):
+        self.save_minutely([60.0] * 5)
+        self.assertEqual([60.0, None, 60.0, None, 60.0], self.stored())
+
+    def test_read_paths_step_fill(self):
+        self.save_minutely([60.0, 60.02, 60.1, 60.11, 60.04])
+        expected = [60.04, 60.1, 60.1, 60.0, 60.0]
+
+        results = self.client.get(reverse("minutely-list")).json()["results"]
+        self.assertEqual(expected, [row["frequency_a"] for row in results])
+
+        # The newest row of the second page is filled from the row before it in the database
+        response = self.client.get(reverse("minutely-list"), {"page_size": 2})
+        results = self.client.get(response.json()["next"]).json()["results"]
+        self.assertEqual([60.1, 60.0], [row["frequency_a"] for row in results])
+
+        columns = self.client.get(reverse("minutely-list"), {"format": "columnar"}).json()["results"]
+        self.assertEqual(expected, columns["frequency_a"])
+
+        response = self.client.get(reverse("minutely-export"))
+        rows = csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode()))
+        self.assertEqual(["60.0", "60.0", "60.1", "60.1", "60.04"], [row["frequency_a"] for row in rows])
+
+        url = reverse("transductor-minutely", kwargs={"pk": self.transductor.pk})
+        results = self.client.get(url).json()["results"]
+        self.assertEqual(expected, [row["frequency_a"] for row in results])
+
+        params = {"resolution": "minutely", "fields": "frequency_a"}
+        results = self.client.get(reverse("rollup-list"), params).json()["results"]
+        self.assertEqual(expected[::-1], [row["frequency_a"]["last"] for row in results])
+
+    @override_settings(MINUTELY_DEADBANDS={"voltage_a": 5})
+    def test_realtime_snapshot_step_fills(self):
+        self.save_minutely([60.0, 60.0])
+        self.assertEqual([220, None], self.stored("voltage_a"))
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(REALTIME_SOCKET_DIR=directory):
+            hub = RealtimeHub(directory)
+            with mock.patch("measurement.views.get_hub", return_value=hub):
+                response = self.client.get(reverse("realtime-stream"), HTTP_ACCEPT="text/event-stream")
+
+            chunks = iter(response.streaming_content)
+            next(chunks)
+            snapshot = next(chunks)
+            hub.close()
+
+        data = snapshot.decode().strip().split("\n")[1].removeprefix("data: ")
+        self.assertEqual([220.0], [reading["voltage_a"] for reading in json.loads(data)])
+
+    @override_settings(MINUTELY_DEADBANDS={})
+    def test_disabled_by_default(self):
+        self.save_minutely([60.0, 60.0])
+        self.assertEqual([60.0, 60.0], self.stored())
@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from data_collector.models import MemoryMap
+from measurement.downsampling import lttb
+from measurement.models import MinutelyMeasurement
+from measurement.rollups import rebuild_rollups
+from transductor.models import Transductor
+
+
+class LttbTestCase(TestCase):
+    def test_keeps_extremes_and_endpoints(self):
+        x = np.arange(1000, dtype=float)
+        y = np.zeros(1000)
+        y[300], y[700] = 50, -50
+
+        indices = lttb(x, y, 20)
+
+        self.assertEqual(20, len(indices))
+        self.assertEqual(0, indices[0])
+        self.assertEqual(999, indices[-1])
+        self.assertIn(300, indices)
+        self.assertIn(700, indices)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+    def test_short_series_is_returned_whole(self):
+        x = np.arange(5, dtype=float)
+        self.assertEqual([0, 1, 2, 3, 4], lttb(x, x, 10).tolist())
+
+
+@override_settings(DEBUG_TOOLBAR_CONFIG={"SHOW_TOOLBAR_CALLBACK": lambda request: False})
+class DownsampledMeasurementTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+        self.start = timezone.make_aware(datetime(2023, 6, 5, 14, 0, 0))
+        MinutelyMeasurement.objects.bulk_create(
+            MinutelyMeasurement(
+                transductor=self.transductor,
+                voltage_a=200 + minute,
+                collection_date=self.start + timedelta(minutes=minute),
+            )
+            for minute in range(120)
+        )
+
+    def test_resolution_aggregates_buckets(self):
+        response = self.client.get(reverse("minutely-list"), {"resolution": "30m", "fields": "voltage_a"})
+        self.assertEqual(200, response.status_code)
+
+        data = response.json()
+        self.assertEqual(1800, data["resolution"])
+        self.assertEqual(4, len(data["results"]))
+
+        first = data["results"][0]
+        self.assertEqual(self.start, datetime.fromisoformat(first["bucket"]))
+        self.assertEqual(30, first["samples"])
+        self.assertEqual({"avg": 214.5, "min": 200.0, "max": 229.0, "last": 229.0}, first["voltage_a"])
+        self.assertNotIn("voltage_b", first)
+
+    def test_whole_hours_are_read_from_the_rollups(self):
+        rebuild_rollups(
+            self.transductor.id, self.start.replace(hour=0), self.start.replace(hour=0) + timedelta(days=1)
+        )
+        MinutelyMeasurement.objects.all().delete()  # the rollups alone answer
+
+        response = self.client.get(reverse("minutely-list"), {"resolution": "1h", "fields": "voltage_a"})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            {
+                "transductor": 1,
+                "resolution": 3600,
+                "bucket": "2023-06-05T15:00:00-03:00",
+                "samples": 60,
+                "voltage_a": {"min": 260.0, "max": 319.0, "avg": 289.5, "last": 319.0},
+            },
+            response.json()["results"][1],
+        )
+
+    @override_settings(MINUTELY_DEADBANDS={"voltage_a": 0.5})
+    def test_buckets_of_suppressed_readings_are_step_filled(self):
+        MinutelyMeasurement.objects.all().delete()
+        # stored before the range, then suppressed up to 14:40 (the value did not change)
+        MinutelyMeasurement.objects.create(
+            transductor=self.transductor, voltage_a=220.0, collection_date=self.start - timedelta(minutes=1)
+        )
+        MinutelyMeasurement.objects.bulk_create(
+            MinutelyMeasurement(
+                transductor=self.transductor,
+                voltage_a=230.0 if minute == 40 else None,
+                collection_date=self.start + timedelta(minutes=minute),
+            )
+            for minute in range(60)
+        )
+
+        response = self.client.get(
+            reverse("minutely-list"),
+            {"resolution": "20m", "fields": "voltage_a", "start_date": self.start.isoformat()},
+        )
+
+        self.assertEqual(
+            [
+                {"min": 220.0, "max": 220.0, "avg": 220.0, "last": 220.0},
+                {"min": 220.0, "max": 220.0, "avg": 220.0, "last": 220.0},
+                {"min": 230.0, "max": 230.0, "avg": 230.0, "last": 230.0},
+            ],
+            [bucket["voltage_a"] for bucket in response.json()["results"]],
+        )
+
+    def test_transductor_minutely_applies_the_date_filters(self):
+        url = reverse("transductor-minutely", kwargs={"pk": self.transductor.pk})
+        response = self.client.get(url, {"start_date": (self.start + timedelta(minutes=100)).isoformat()})
+
+        self.assertEqual(20, len(response.json()["results"]))
+
+    def test_points_selects_lttb_series(self):
+        url = reverse("transductor-minutely", kwargs={"pk": self.transductor.pk})
+        response = self.client.get(url, {"points": 10, "fields": "voltage_a,voltage_b"})
+        self.assertEqual(200, response.status_code)
+
+        series = {item["field"]: item for item in response.json()["results"]}
+        self.assertEqual(10, len(series["voltage_a"]["values"]))
+        self.assertEqual(200.0, series["voltage_a"]["values"][0])
+        self.assertEqual(int(self.start.timestamp() * 1000), series["voltage_a"]["timestamps"][0])
+        self.assertEqual([], series["voltage_b"]["values"])
+
+    def test_invalid_parameters(self):
+        url = reverse("minutely-list")
+        self.assertEqual(400, self.client.get(url, {"resolution": "soon"}).status_code)
+        self.assertEqual(400, self.client.get(url, {"points": 2}).status_code)
+        self.assertEqual(400, self.client.get(url, {"points": 10, "resolution": "1h"}).status_code)
+        self.assertEqual(400, self.client.get(url, {"resolution": "1h", "fields": "unknown"}).status_code)
@@ -0,0 +1,85 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from data_collector.models import MemoryMap
+from measurement.models import MinutelyMeasurement
+from transductor.models import Transductor
+
+
+@override_settings(DEBUG_TOOLBAR_CONFIG={"SHOW_TOOLBAR_CALLBACK": lambda request: False})
+class MeasurementExportTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductors = [
+            Transductor.objects.create(
+                id=transductor_id,
+                serial_number=f"8765432{transductor_id}",
+                ip_address=f"111.111.111.1{transductor_id}",
+                port="1234",
+                model="TR4020",
+                firmware_version="12.1.3215",
+                geolocation_longitude=-24.4556,
+                geolocation_latitude=-24.45996,
+                memory_map=self.memory_map,
+            )
+            for transductor_id in [1, 2]
+        ]
+
+        self.start = timezone.make_aware(datetime(2023, 6, 5, 14, 0, 0))
+        MinutelyMeasurement.objects.bulk_create(
+            MinutelyMeasurement(
+                transductor=transductor,
+                voltage_a=220 + minute,
+                collection_date=self.start + timedelta(minutes=minute),
+            )
+            for transductor in self.transductors
+            for minute in range(5)
+        )
+
+    def export(self, **params):
+        response = self.client.get(reverse("minutely-export"), params)
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    def test_csv_export(self):
+        response, content = self.export(transductor=1)
+
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual("text/csv", response["Content-Type"])
+        self.assertEqual(5, len(rows))
+        self.assertEqual(["220.0", "221.0", "222.0", "223.0", "224.0"], [row["voltage_a"] for row in rows])
+        self.assertEqual(self.start, datetime.fromisoformat(rows[0]["collection_date"]))
+
+    def test_ndjson_export_with_date_range(self):
+        params = {"output": "ndjson", "start_date": (self.start + timedelta(minutes=3)).isoformat()}
+        _, content = self.export(**params)
+
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(4, len(rows))
+        self.assertEqual({1, 2}, {row["transductor_id"] for row in rows})
+
+    def test_gzip_export(self):
+        response, content = self.export(compress="true")
+
+        self.assertEqual("application/gzip", response["Content-Type"])
+        self.assertIn("minutely-measurements.csv.gz", response["Content-Disposition"])
+        self.assertEqual(11, len(gzip.decompress(content).decode().splitlines()))
+
+    def test_invalid_output(self):
+        response = self.client.get(reverse("minutely-export"), {"output": "xml"})
+        self.assertEqual(400, response.status_code)
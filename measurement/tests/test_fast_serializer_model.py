@@ -0,0 +1,120 @@
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from data_collector.modbus.settings import DataGroups, TariffPosts
+from data_collector.models import MemoryMap
+from measurement.models import (
+    MinutelyMeasurement,
+    QuarterlyMeasurement,
+    ReferenceMeasurement,
+)
+from measurement.renderers import FastJSONRenderer
+from measurement.serializers import (
+    MinutelyMeasurementSerializer,
+    MinutelyMeasurementValuesSerializer,
+    QuarterlyListMeasurementSerializer,
+    QuarterlyListMeasurementValuesSerializer,
+)
+from transductor.models import Transductor
+from transductor.serializers import TransductorSerializer
+
+
+@override_settings(DEBUG_TOOLBAR_CONFIG={"SHOW_TOOLBAR_CALLBACK": lambda request: False})
+class FastSerializerContractTestCase(TestCase):
+    """The values-based serializers must render exactly what the DRF serializers render."""
+
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=Decimal("-24.4556"),
+            geolocation_latitude=Decimal("-24.45996"),
+            memory_map=self.memory_map,
+        )
+
+        start = timezone.make_aware(datetime(2023, 6, 5, 17, 30, 0))
+        MinutelyMeasurement.objects.bulk_create(
+            MinutelyMeasurement(
+                transductor=self.transductor,
+                voltage_a=220.5 + minute,
+                current_a=None if minute % 2 else 10,
+                total_power_factor=0.92,
+                collection_date=start + timedelta(minutes=minute, microseconds=minute * 1500),
+            )
+            for minute in range(3)
+        )
+
+        reference = ReferenceMeasurement.objects.create(transductor=self.transductor, data_group=DataGroups.QUARTERLY)
+        for quarter, tariff_post in enumerate(
+            [None, TariffPosts.PEAK, TariffPosts.OFF_PEAK, TariffPosts.INTERMEDIATE]
+        ):
+            QuarterlyMeasurement.objects.create(
+                transductor=self.transductor,
+                reference_measurement=reference,
+                active_consumption=10 + quarter,
+                active_generated=1.5,
+                reactive_inductive=None,
+                reactive_capacitive=0,
+                tariff_post=tariff_post,
+                collection_date=start + timedelta(minutes=15 * quarter),
+            )
+
+    def assertSameJSON(self, drf_data, fast_data):
+        expected = json.loads(JSONRenderer().render(drf_data))
+        self.assertEqual(expected, json.loads(FastJSONRenderer().render(fast_data)))
+
+    def test_minutely_contract(self):
+        queryset = MinutelyMeasurement.objects.order_by("id")
+        fast = MinutelyMeasurementValuesSerializer()
+
+        self.assertSameJSON(MinutelyMeasurementSerializer(queryset, many=True).data, fast.many(fast.rows(queryset)))
+
+    def test_quarterly_list_contract(self):
+        queryset = QuarterlyMeasurement.objects.order_by("id")
+        fast = QuarterlyListMeasurementValuesSerializer()
+
+        drf_data = QuarterlyListMeasurementSerializer(queryset, many=True).data
+        self.assertSameJSON(drf_data, fast.many(fast.rows(queryset)))
+
+    def test_endpoints_use_same_schema(self):
+        queryset = MinutelyMeasurement.objects.order_by("-collection_date", "-id")
+        expected = json.loads(JSONRenderer().render(MinutelyMeasurementSerializer(queryset, many=True).data))
+
+        response = self.client.get(reverse("minutely-list"))
+        self.assertEqual(expected, response.json()["results"])
+
+        response = self.client.get(reverse("minutely-detail", kwargs={"pk": expected[0]["id"]}))
+        self.assertEqual(expected[0], response.json())
+
+        response = self.client.get(reverse("minutely-detail", kwargs={"pk": 0}))
+        self.assertEqual(404, response.status_code)
+
+    def test_transductor_contract(self):
+        response = self.client.get(reverse("transductor-list"))
+        result = response.json()["results"][0]
+
+        context = {"request": response.wsgi_request}
+        expected = json.loads(JSONRenderer().render(TransductorSerializer(self.transductor, context=context).data))
+        self.assertEqual(expected, result)
+        self.assertTrue(result["minutely_measurement_url"].endswith("/energy-transductors/1/minutely-measurements/"))
+
+        response = self.client.get(reverse("transductor-detail", kwargs={"pk": 1}))
+        self.assertEqual(expected, response.json())
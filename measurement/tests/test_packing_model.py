@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from data_collector.models import MemoryMap
+from measurement.models import (
+    HourlyMeasurementRollup,
+    MinutelyMeasurement,
+    MinutelyMeasurementHistory,
+    PackedMinutelyHour,
+)
+from measurement.packing import history_page, minutely_history, pack_minutely
+from measurement.rollups import rebuild_rollups
+from replication.models import SyncCheckpoint
+from transductor.models import Transductor
+
+
+@override_settings(DEBUG_TOOLBAR_CONFIG={"SHOW_TOOLBAR_CALLBACK": lambda request: False})
+class PackedMinutelyTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+        self.start = timezone.make_aware(datetime(2023, 6, 5, 14, 0, 0))
+        # two hours and a half of readings, one every 10 minutes
+        self.measurements = MinutelyMeasurement.objects.bulk_create(
+            MinutelyMeasurement(
+                transductor=self.transductor,
+                frequency_a=60.1,
+                voltage_a=220.35 + step,
+                total_active_power=123456.78 if step % 2 else None,
+                high_rate_stats={"voltage_a": {"min": 219.0}} if step == 3 else None,
+                slave_collection_date=self.start + timedelta(minutes=10 * step, seconds=5),
+                collection_date=self.start + timedelta(minutes=10 * step),
+            )
+            for step in range(15)
+        )
+        self.until = self.start + timedelta(hours=2)
+
+    def list_minutely(self, **params):
+        response = self.client.get(reverse("minutely-list"), {"page_size": 100, **params})
+        self.assertEqual(200, response.status_code)
+        return response.json()["results"]
+
+    def test_packing_keeps_the_api_output(self):
+        before = self.list_minutely()
+        before_filtered = self.list_minutely(
+            start_date="2023-06-05T15:25:00-03:00", end_date="2023-06-05T16:10:00-03:00"
+        )
+
+        self.assertEqual(12, pack_minutely(self.transductor.id, self.until))
+
+        self.assertEqual(3, MinutelyMeasurement.objects.count())
+        self.assertEqual(2, PackedMinutelyHour.objects.count())
+        self.assertEqual(before, self.list_minutely())
+        self.assertEqual(
+            before_filtered,
+            self.list_minutely(start_date="2023-06-05T15:25:00-03:00", end_date="2023-06-05T16:10:00-03:00"),
+        )
+        self.assertEqual(5, len(before_filtered))
+
+        packed = before[-1]
+        self.assertEqual(self.measurements[0].id, packed["id"])
+        self.assertEqual(60.1, packed["frequency_a"])
+        self.assertEqual(220.35, packed["voltage_a"])
+        self.assertEqual({"voltage_a": {"min": 219.0}}, before[-4]["high_rate_stats"])
+        self.assertEqual(123456.78, before[-2]["total_active_power"])
+
+        url = reverse("minutely-detail", kwargs={"pk": self.measurements[1].id})
+        self.assertEqual(before[-2], self.client.get(url).json())
+
+    def test_late_rows_are_merged_into_the_packed_hour(self):
+        pack_minutely(self.transductor.id, self.until)
+        late = MinutelyMeasurement.objects.create(
+            transductor=self.transductor,
+            voltage_a=100,
+            collection_date=self.start + timedelta(minutes=15),
+        )
+
+        self.assertEqual(1, pack_minutely(self.transductor.id, self.until))
+
+        packed = PackedMinutelyHour.objects.get(hour=self.start)
+        self.assertEqual(7, len(packed.ids))
+        self.assertEqual(late.id, packed.ids[2])
+        self.assertEqual(15 * 60 * 10**6, packed.offsets[2])
+
+        rows = minutely_history(self.start, self.start + timedelta(minutes=20)).order_by("collection_date")
+        self.assertEqual([220.35, 221.35, 100], list(rows.values_list("voltage_a", flat=True)))
+
+    def test_rollups_rebuilt_from_packed_hours(self):
+        pack_minutely(self.transductor.id, self.until)
+        HourlyMeasurementRollup.objects.all().delete()
+
+        rows = rebuild_rollups(self.transductor.id, self.start - timedelta(hours=14), self.start + timedelta(hours=10))
+
+        self.assertEqual(15, rows)
+        rollup = HourlyMeasurementRollup.objects.get(bucket=self.start)
+        self.assertEqual(6, rollup.samples)
+        self.assertEqual(220.35, rollup.data["voltage_a"]["min"])
+
+    def test_command_keeps_unshipped_rows_raw(self):
+        SyncCheckpoint.objects.create(consumer="master", positions={"minutely": self.measurements[3].id})
+
+        call_command("pack_minutely_measurements", after_hours=0)
+
+        self.assertEqual(4, sum(len(packed.ids) for packed in PackedMinutelyHour.objects.all()))
+        self.assertEqual(11, MinutelyMeasurement.objects.count())
+
+    def test_date_filters_skip_packed_hours(self):
+        pack_minutely(self.transductor.id, self.until)
+
+        queryset = minutely_history(self.start + timedelta(hours=1, minutes=30), self.until)
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN {sql}", params)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+
+        self.assertIn("packed_minutely_hour_idx", plan)
+        self.assertEqual(3, queryset.count())
+
+    def test_cursor_pages_read_only_the_packed_hours_they_reach(self):
+        before = self.list_minutely()
+        pack_minutely(self.transductor.id, self.until)
+
+        # the raw rows fill the first page: their oldest date bounds the packed hours
+        queryset = MinutelyMeasurementHistory.objects.order_by("-collection_date", "-id")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(
+                [row["id"] for row in before[:2]], [row["id"] for row in history_page(queryset.values("id"), 2)]
+            )
+        self.assertIn('"packed_hour" >', queries[-1]["sql"])
+
+        pages, url, params = [], reverse("minutely-list"), {"page_size": 4}
+        while url:
+            response = self.client.get(url, params).json()
+            pages.append([row["id"] for row in response["results"]])
+            url, params = response["next"], None
+        self.assertEqual([row["id"] for row in before], sum(pages, []))
+
+        previous = self.client.get(response["previous"]).json()["results"]
+        self.assertEqual(pages[-2], [row["id"] for row in previous])
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from data_collector.models import MemoryMap
+from measurement.models import MinutelyMeasurement
+from transductor.models import Transductor
+
+
+@override_settings(DEBUG_TOOLBAR_CONFIG={"SHOW_TOOLBAR_CALLBACK": lambda request: False})
+class MeasurementCursorPaginationTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+        start = timezone.make_aware(datetime(2023, 6, 5, 14, 0, 0))
+        # two rows share each collection date to exercise the `id` tie-breaker
+        self.measurements = MinutelyMeasurement.objects.bulk_create(
+            MinutelyMeasurement(
+                transductor=self.transductor,
+                voltage_a=220,
+                collection_date=start + timedelta(minutes=minute // 2),
+            )
+            for minute in range(10)
+        )
+        self.expected_ids = [
+            measurement.id
+            for measurement in sorted(self.measurements, key=lambda m: (m.collection_date, m.id), reverse=True)
+        ]
+
+    def walk(self, url, params=None):
+        ids, pages = [], []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(200, response.status_code)
+            data = response.json()
+            self.assertNotIn("count", data)
+            pages.append(data)
+            ids += [result["id"] for result in data["results"]]
+            if data["next"] is None:
+                return ids, pages
+            response = self.client.get(data["next"])
+
+    def test_cursor_pages_cover_every_row_once(self):
+        ids, pages = self.walk(reverse("minutely-list"), {"page_size": 3})
+
+        self.assertEqual(self.expected_ids, ids)
+        self.assertEqual(4, len(pages))
+        self.assertIsNone(pages[0]["previous"])
+
+    def test_previous_link_returns_the_same_page(self):
+        _, pages = self.walk(reverse("minutely-list"), {"page_size": 3})
+
+        response = self.client.get(pages[2]["previous"])
+        self.assertEqual(pages[1]["results"], response.json()["results"])
+
+        response = self.client.get(response.json()["previous"])
+        self.assertEqual(pages[0]["results"], response.json()["results"])
+        self.assertIsNone(response.json()["previous"])
+
+    def test_new_rows_do_not_shift_following_pages(self):
+        response = self.client.get(reverse("minutely-list"), {"page_size": 4})
+        MinutelyMeasurement.objects.create(transductor=self.transductor, voltage_a=220, collection_date=timezone.now())
+
+        response = self.client.get(response.json()["next"])
+        self.assertEqual(self.expected_ids[4:8], [result["id"] for result in response.json()["results"]])
+
+    def test_page_number_mode(self):
+        response = self.client.get(reverse("minutely-list"), {"page": 1})
+
+        self.assertEqual(10, response.json()["count"])
+        self.assertEqual(self.expected_ids, [result["id"] for result in response.json()["results"]])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("minutely-list"), {"cursor": "invalid"})
+        self.assertEqual(404, response.status_code)
+
+    def test_transductor_minutely_action_is_paginated(self):
+        url = reverse("transductor-minutely", kwargs={"pk": self.transductor.id})
+        ids, _ = self.walk(url, {"page_size": 4})
+
+        self.assertEqual(self.expected_ids, ids)
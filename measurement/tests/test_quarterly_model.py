@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from data_collector.modbus.settings import DataGroups
+from data_collector.models import CollectionReport, MemoryMap
+from data_collector.scheduler import plan_sessions
+from measurement.models import (
+    MinutelyMeasurement,
+    MonthlyTariffRollup,
+    QuarterlyMeasurement,
+    ReferenceMeasurement,
+)
+from measurement.quarterly import (
+    QUARTERLY_COUNTERS,
+    QuarterlyCounterCache,
+    minutely_plan,
+)
+from transductor.models import Transductor
+
+
+def block(address, attributes):
+    return {
+        "start_address": address,
+        "size": 2 * len(attributes),
+        "type": "float32",
+        "byteorder": "f2-1-0-3",
+        "function": "read_input_register",
+        "attributes": attributes,
+    }
+
+
+MINUTELY_BLOCKS = [block(10, ["voltage_a", "voltage_b"])]
+QUARTERLY_BLOCKS = [
+    block(100, ["active_consumption", "active_generated", "reactive_inductive", "reactive_capacitive"])
+]
+
+
+class CounterReader:
+    """Stands in for a Modbus reader: answers the counters given in `values` and 220.0 for the rest."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def read_block_values(self, register_blocks, slave_id=None):
+        return [
+            {attribute: self.values.get(attribute, 220.0) for attribute in register_block["attributes"]}
+            for register_block in register_blocks
+        ]
+
+
+class QuarterlyFromMinutelyTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="Kron Konect",
+            minutely=MINUTELY_BLOCKS,
+            quarterly=QUARTERLY_BLOCKS,
+            monthly=[],
+        )
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port=502,
+            model="Kron Konect",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+        self.quarter = timezone.make_aware(datetime(2023, 6, 5, 14, 45))
+
+    def reading(self, active_consumption):
+        return {
+            "transductor": self.transductor.id,
+            "voltage_a": 220.0,
+            "active_consumption": active_consumption,
+            "active_generated": 0.0,
+            "reactive_inductive": 10.0,
+            "reactive_capacitive": 0.0,
+        }
+
+    def test_first_reading_becomes_the_reference(self):
+        cache = QuarterlyCounterCache()
+
+        self.assertEqual([], cache.add([self.reading(100.0)], self.quarter + timedelta(minutes=3)))
+        self.assertEqual([], cache.add([self.reading(101.0)], self.quarter + timedelta(minutes=4)))
+
+        reference = ReferenceMeasurement.objects.get(transductor=self.transductor, data_group=DataGroups.QUARTERLY)
+        self.assertEqual(100.0, reference.active_consumption)
+        self.assertFalse(QuarterlyMeasurement.objects.exists())
+
+    def test_new_quarter_saves_the_deltas(self):
+        ReferenceMeasurement.objects.create(
+            transductor=self.transductor,
+            data_group=DataGroups.QUARTERLY,
+            collection_date=self.quarter - timedelta(minutes=14),
+            active_consumption=100.0,
+            active_generated=0.0,
+            reactive_inductive=10.0,
+            reactive_capacitive=0.0,
+        )
+        cache = QuarterlyCounterCache()
+
+        self.assertEqual([], cache.add([self.reading(104.0)], self.quarter - timedelta(minutes=1)))
+        with self.assertNumQueries(0):
+            cache.add([self.reading(105.0)], self.quarter - timedelta(seconds=30))
+
+        instances = cache.add([self.reading(106.5)], self.quarter + timedelta(seconds=2))
+
+        self.assertEqual(1, len(instances))
+        measurement = QuarterlyMeasurement.objects.get()
+        self.assertEqual(6.5, measurement.active_consumption)
+        self.assertEqual(0.0, measurement.reactive_inductive)
+        self.assertEqual(self.quarter, measurement.collection_date)
+        self.assertFalse(measurement.is_calculated)
+        self.assertIsNotNone(measurement.tariff_post)
+        self.assertTrue(MonthlyTariffRollup.objects.exists())
+
+        reference = ReferenceMeasurement.objects.get(transductor=self.transductor, data_group=DataGroups.QUARTERLY)
+        self.assertEqual(106.5, reference.active_consumption)
+        self.assertEqual(self.quarter + timedelta(seconds=2), reference.collection_date)
+
+    def test_missed_quarters_share_the_delta(self):
+        cache = QuarterlyCounterCache()
+        cache.add([self.reading(100.0)], self.quarter + timedelta(minutes=1))
+
+        instances = cache.add([self.reading(110.0)], self.quarter + timedelta(minutes=30, seconds=5))
+
+        self.assertEqual(
+            [self.quarter + timedelta(minutes=15), self.quarter + timedelta(minutes=30)],
+            [instance.collection_date for instance in instances],
+        )
+        self.assertEqual([5.0, 5.0], [instance.active_consumption for instance in instances])
+        self.assertTrue(all(instance.is_calculated for instance in instances))
+
+    def test_minutely_plan(self):
+        self.assertEqual(MINUTELY_BLOCKS, minutely_plan(self.transductor))
+
+        with override_settings(QUARTERLY_FROM_MINUTELY=True):
+            plan = minutely_plan(self.transductor)
+            self.assertEqual([*MINUTELY_BLOCKS, *QUARTERLY_BLOCKS], plan)
+
+            self.memory_map.quarterly = [block(100, ["generated_energy_peak_time"])]
+            self.assertEqual(MINUTELY_BLOCKS, minutely_plan(self.transductor))
+
+    @override_settings(QUARTERLY_FROM_MINUTELY=True, COLLECTOR_INSTANCE="collector-a", COLLECTOR_INSTANCE_TTL=180)
+    def test_scheduled_collection_derives_the_quarterly_group(self):
+        sessions, _ = plan_sessions(Transductor.objects.all(), ["minutely", "quarterly"], now=self.quarter)
+        self.assertEqual({"minutely"}, set(sessions[0].deadlines))
+
+        reader = CounterReader(dict.fromkeys(QUARTERLY_COUNTERS, 50.0))
+        with mock.patch("data_collector.scheduler.create_reader", return_value=reader):
+            call_command("collect_scheduled", stdout=mock.MagicMock())
+
+        self.assertEqual(1, MinutelyMeasurement.objects.count())
+        reference = ReferenceMeasurement.objects.get(transductor=self.transductor, data_group=DataGroups.QUARTERLY)
+        self.assertEqual(50.0, reference.active_consumption)
+        self.assertEqual(0, CollectionReport.objects.get().data_groups["quarterly"]["derived"])
@@ -0,0 +1,124 @@
+import json
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from data_collector.models import MemoryMap
+from measurement.models import MinutelyMeasurement
+from measurement.realtime import DATAGRAM_SIZE, RealtimeHub, encode_readings, publish
+from measurement.serializers import (
+    MinutelyMeasurementSerializer,
+    RealTimeMeasurementSerializer,
+)
+from transductor.models import Transductor
+
+
+def event_data(chunk: bytes):
+    event, data = chunk.decode().strip().split("\n")
+    return event, json.loads(data.removeprefix("data: "))
+
+
+@override_settings(DEBUG_TOOLBAR_CONFIG={"SHOW_TOOLBAR_CALLBACK": lambda request: False})
+class RealtimeStreamTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+        self.start = timezone.make_aware(datetime(2023, 6, 5, 14, 0, 0))
+        for minute in range(2):
+            MinutelyMeasurement.objects.create(
+                transductor=self.transductor,
+                voltage_a=220 + minute,
+                collection_date=self.start + timedelta(minutes=minute),
+            )
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_settings = override_settings(REALTIME_SOCKET_DIR=self.directory.name)
+        self.socket_settings.enable()
+
+        self.hub = RealtimeHub(self.directory.name)
+
+    def tearDown(self):
+        self.hub.close()
+        self.socket_settings.disable()
+        self.directory.cleanup()
+
+    def test_encode_splits_large_batches(self):
+        readings = [{"id": reading_id, "padding": "x" * 1000} for reading_id in range(200)]
+        datagrams = encode_readings(readings)
+
+        self.assertGreater(len(datagrams), 1)
+        self.assertTrue(all(len(datagram) <= DATAGRAM_SIZE for datagram in datagrams))
+        self.assertEqual(readings, [reading for datagram in datagrams for reading in json.loads(datagram)])
+
+    def test_publish_fans_out_to_every_client(self):
+        self.assertEqual(0, publish([{"id": 1}]))
+
+        first, second = self.hub.subscribe(), self.hub.subscribe()
+        self.assertEqual(1, publish([{"id": 1}]))
+
+        self.assertEqual(b'[{"id":1}]', first.get(timeout=5))
+        self.assertEqual(b'[{"id":1}]', second.get(timeout=5))
+
+    def test_stale_socket_is_removed(self):
+        self.hub.subscribe()
+        self.hub.close()
+        stale = self.hub.path
+        stale.touch()
+
+        self.assertEqual(0, publish([{"id": 1}]))
+        self.assertFalse(stale.exists())
+
+    def test_stream_pushes_saved_batches(self):
+        with mock.patch("measurement.views.get_hub", return_value=self.hub):
+            response = self.client.get(reverse("realtime-stream"), HTTP_ACCEPT="text/event-stream")
+
+        self.assertEqual("text/event-stream", response["Content-Type"])
+        chunks = iter(response.streaming_content)
+
+        self.assertEqual(b"retry: 5000\n\n", next(chunks))
+        event, snapshot = event_data(next(chunks))
+        self.assertEqual("event: measurements", event)
+        self.assertEqual([221.0], [reading["voltage_a"] for reading in snapshot])
+
+        serializer = MinutelyMeasurementSerializer(
+            data=[
+                {
+                    "transductor": self.transductor.id,
+                    "voltage_a": 230,
+                    "collection_date": self.start + timedelta(minutes=2),
+                }
+            ],
+            many=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+
+        _, batch = event_data(next(chunks))
+        self.assertEqual([230.0], [reading["voltage_a"] for reading in batch])
+        self.assertEqual(set(RealTimeMeasurementSerializer.Meta.fields), set(batch[0]))
+
+        response.close()
+        self.assertEqual(set(), self.hub.subscribers)
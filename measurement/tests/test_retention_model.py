@@ -0,0 +1,146 @@
+import io
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from data_collector.modbus.settings import DataGroups
+from data_collector.models import MemoryMap
+from measurement.models import (
+    DailyMeasurementRollup,
+    HourlyMeasurementRollup,
+    MinutelyMeasurement,
+    PackedMinutelyHour,
+    QuarterlyMeasurement,
+    ReferenceMeasurement,
+)
+from measurement.packing import pack_minutely, truncate_hour
+from measurement.retention import apply_retention, retention_cutoff
+from measurement.rollups import RESOLUTION_DAILY, truncate_bucket
+from transductor.models import Transductor
+
+
+class RetentionTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+        self.now = timezone.now()
+        self.old_day = truncate_bucket(RESOLUTION_DAILY, self.now - timedelta(days=40))
+        self.recent = self.now - timedelta(days=10)
+
+        MinutelyMeasurement.objects.bulk_create(
+            MinutelyMeasurement(transductor=self.transductor, voltage_a=220 + minute, collection_date=collection_date)
+            for minute, collection_date in enumerate(
+                [self.old_day + timedelta(hours=2, minutes=minute) for minute in range(5)] + [self.recent]
+            )
+        )
+        # the first hour of the old day is packed
+        MinutelyMeasurement.objects.bulk_create(
+            MinutelyMeasurement(
+                transductor=self.transductor,
+                voltage_a=210,
+                collection_date=self.old_day + timedelta(minutes=minute),
+            )
+            for minute in range(3)
+        )
+        pack_minutely(self.transductor.id, truncate_hour(self.old_day + timedelta(hours=1)))
+
+        reference = ReferenceMeasurement.objects.create(transductor=self.transductor, data_group=DataGroups.QUARTERLY)
+        QuarterlyMeasurement.objects.bulk_create(
+            QuarterlyMeasurement(transductor=self.transductor, reference_measurement=reference, collection_date=date)
+            for date in [self.old_day, self.recent]
+        )
+
+    def test_expired_rows_are_downsampled_and_deleted(self):
+        deleted = apply_retention({"minutely": 30, "quarterly": 30, "monthly": 0}, self.now, batch_size=2)
+
+        self.assertEqual({"minutely": 8, "quarterly": 1}, deleted)
+        self.assertEqual([self.recent], list(MinutelyMeasurement.objects.values_list("collection_date", flat=True)))
+        self.assertFalse(PackedMinutelyHour.objects.exists())
+        self.assertEqual([self.recent], list(QuarterlyMeasurement.objects.values_list("collection_date", flat=True)))
+        self.assertTrue(ReferenceMeasurement.objects.exists())
+
+        daily = DailyMeasurementRollup.objects.get(bucket=self.old_day)
+        self.assertEqual(8, daily.samples)
+        self.assertEqual(210, daily.data["voltage_a"]["min"])
+        self.assertEqual(
+            2, HourlyMeasurementRollup.objects.filter(bucket__lt=self.old_day + timedelta(days=1)).count()
+        )
+
+        deleted = apply_retention({"hourly_rollup": 30, "daily_rollup": 0}, self.now)
+        self.assertEqual({"hourly_rollup": 2}, deleted)
+        self.assertTrue(DailyMeasurementRollup.objects.filter(bucket=self.old_day).exists())
+
+    def test_deadline_stops_the_deletion(self):
+        deleted = apply_retention({"minutely": 30}, self.now, deadline=time.monotonic())
+
+        self.assertEqual({"minutely": 0}, deleted)
+        self.assertEqual(6, MinutelyMeasurement.objects.count())
+
+    @override_settings(
+        MEASUREMENT_RETENTION={"minutely": 30, "quarterly": 0},
+        MEASUREMENT_ARCHIVE_DIR="",
+        RETENTION_PAUSE=0,
+    )
+    def test_command(self):
+        output = io.StringIO()
+        call_command("delete_old_measurements", batch_size=3, stdout=output)
+
+        self.assertIn("8 old measurements deleted (minutely: 8)", output.getvalue())
+        self.assertEqual(1, MinutelyMeasurement.objects.count())
+        self.assertEqual(2, QuarterlyMeasurement.objects.count())
+
+    def test_deadline_stops_the_rollups_before_any_deletion(self):
+        deadlines = iter([False, True])
+        with mock.patch("measurement.retention.deadline_passed", side_effect=lambda deadline: next(deadlines, True)):
+            deleted = apply_retention({"minutely": 30}, self.now, deadline=0)
+
+        self.assertEqual({"minutely": 0}, deleted)
+        self.assertEqual(6, MinutelyMeasurement.objects.count())
+        self.assertFalse(DailyMeasurementRollup.objects.exists())
+
+    def test_packed_hour_ending_at_the_cutoff_is_deleted(self):
+        cutoff = retention_cutoff(30, self.now)
+        MinutelyMeasurement.objects.create(
+            transductor=self.transductor, voltage_a=220, collection_date=cutoff - timedelta(minutes=1)
+        )
+        pack_minutely(self.transductor.id, cutoff)
+        self.assertTrue(PackedMinutelyHour.objects.filter(hour=cutoff - timedelta(hours=1)).exists())
+
+        apply_retention({"minutely": 30}, self.now)
+        self.assertFalse(PackedMinutelyHour.objects.exists())
+
+    def test_stale_references_are_deleted_once_unused(self):
+        stale = ReferenceMeasurement.objects.create(
+            transductor=self.transductor, data_group=DataGroups.MONTHLY, collection_date=self.old_day
+        )
+        ReferenceMeasurement.objects.filter(data_group=DataGroups.QUARTERLY).update(collection_date=self.old_day)
+
+        deleted = apply_retention({"reference": 30}, self.now)
+
+        self.assertEqual({"reference": 1}, deleted)
+        self.assertEqual(
+            [DataGroups.QUARTERLY], list(ReferenceMeasurement.objects.values_list("data_group", flat=True))
+        )
+        self.assertFalse(ReferenceMeasurement.objects.filter(pk=stale.pk).exists())
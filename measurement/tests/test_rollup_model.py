@@ -0,0 +1,267 @@
+from datetime import datetime, timedelta
+from io import StringIO
+from zoneinfo import ZoneInfo
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from data_collector.modbus.helpers import is_peak_time
+from data_collector.modbus.settings import DataGroups, TariffPosts
+from data_collector.models import MemoryMap
+from measurement.models import (
+    DailyMeasurementRollup,
+    HourlyMeasurementRollup,
+    MinutelyMeasurement,
+    MonthlyTariffRollup,
+    QuarterlyMeasurement,
+    ReferenceMeasurement,
+)
+from measurement.rollups import (
+    RESOLUTION_DAILY,
+    RESOLUTION_HOURLY,
+    RESOLUTION_MINUTELY,
+    parse_resolution,
+    rebuild_rollups,
+    rebuild_tariff_rollups,
+    select_resolution,
+    truncate_bucket,
+    update_tariff_rollups,
+)
+from measurement.serializers import (
+    MinutelyMeasurementSerializer,
+    QuarterlyListMeasurementSerializer,
+)
+from transductor.models import Transductor
+
+
+@override_settings(DEBUG_TOOLBAR_CONFIG={"SHOW_TOOLBAR_CALLBACK": lambda request: False})
+class MeasurementRollupTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+        self.hour = timezone.make_aware(datetime(2023, 6, 5, 14, 0, 0))
+
+    def save_minutely(self, values, start=0):
+        data = [
+            {
+                "transductor": self.transductor.id,
+                "voltage_a": value,
+                "collection_date": self.hour + timedelta(minutes=minute),
+            }
+            for minute, value in enumerate(values, start=start)
+        ]
+        serializer = MinutelyMeasurementSerializer(data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_parse_resolution(self):
+        self.assertEqual(3600, parse_resolution("hourly"))
+        self.assertEqual(900, parse_resolution("15m"))
+        self.assertEqual(604800, parse_resolution("7d"))
+        self.assertEqual(300, parse_resolution("300"))
+
+        with self.assertRaises(ValueError):
+            parse_resolution("0")
+
+    def test_select_coarsest_resolution(self):
+        self.assertEqual(RESOLUTION_MINUTELY, select_resolution(900))
+        self.assertEqual(RESOLUTION_HOURLY, select_resolution(4 * 3600))
+        self.assertEqual(RESOLUTION_DAILY, select_resolution(7 * 86400))
+
+    def test_ingestion_updates_rollups_incrementally(self):
+        self.save_minutely([220, 210, 230])
+        self.save_minutely([200], start=3)
+
+        hourly = HourlyMeasurementRollup.objects.get(transductor=self.transductor)
+        self.assertEqual(self.hour, hourly.bucket)
+        self.assertEqual(4, hourly.samples)
+        self.assertEqual(200, hourly.data["voltage_a"]["min"])
+        self.assertEqual(230, hourly.data["voltage_a"]["max"])
+        self.assertEqual(860, hourly.data["voltage_a"]["sum"])
+        self.assertEqual(200, hourly.data["voltage_a"]["last"])
+
+        daily = DailyMeasurementRollup.objects.get(transductor=self.transductor)
+        self.assertEqual(truncate_bucket(RESOLUTION_DAILY, self.hour), daily.bucket)
+        self.assertEqual(4, daily.samples)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.save_minutely([220, 210, 230, 200])
+        incremental = HourlyMeasurementRollup.objects.get(transductor=self.transductor).data
+
+        day = truncate_bucket(RESOLUTION_DAILY, self.hour)
+        rows = rebuild_rollups(self.transductor.id, day, day + timedelta(days=1))
+
+        self.assertEqual(4, rows)
+        self.assertEqual(1, HourlyMeasurementRollup.objects.count())
+        self.assertEqual(incremental, HourlyMeasurementRollup.objects.get(transductor=self.transductor).data)
+
+    def test_rollup_endpoint_reads_coarsest_table(self):
+        self.save_minutely([220, 210, 230, 200])
+
+        response = self.client.get(reverse("rollup-list"), {"resolution": "1d", "fields": "voltage_a"})
+        self.assertEqual(200, response.status_code)
+
+        results = response.json()["results"]
+        self.assertEqual(1, len(results))
+        self.assertEqual(RESOLUTION_DAILY, results[0]["resolution"])
+        self.assertEqual(215, results[0]["voltage_a"]["avg"])
+        self.assertNotIn("voltage_b", results[0])
+
+        response = self.client.get(reverse("rollup-list"), {"resolution": "1m"})
+        self.assertEqual(MinutelyMeasurement.objects.count(), response.json()["count"])
+
+    def test_rollup_endpoint_rejects_invalid_params(self):
+        response = self.client.get(reverse("rollup-list"), {"resolution": "abc"})
+        self.assertEqual(400, response.status_code)
+
+        response = self.client.get(reverse("rollup-list"), {"fields": "unknown"})
+        self.assertEqual(400, response.status_code)
+
+
+@override_settings(DEBUG_TOOLBAR_CONFIG={"SHOW_TOOLBAR_CALLBACK": lambda request: False})
+class MonthlyTariffRollupTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+        self.reference = ReferenceMeasurement.objects.create(
+            transductor=self.transductor,
+            data_group=DataGroups.QUARTERLY,
+        )
+
+        # 05/06/2023 is a monday
+        self.peak_date = timezone.make_aware(datetime(2023, 6, 5, 19, 0, 0))
+        self.off_peak_date = timezone.make_aware(datetime(2023, 6, 5, 10, 0, 0))
+
+    def create_quarterly(self, collection_date, active_consumption):
+        return QuarterlyMeasurement.objects.create(
+            transductor=self.transductor,
+            reference_measurement=self.reference,
+            active_consumption=active_consumption,
+            active_generated=0,
+            reactive_inductive=0,
+            reactive_capacitive=0,
+            collection_date=collection_date,
+        )
+
+    def test_is_peak_time_uses_local_time(self):
+        self.assertTrue(is_peak_time(self.peak_date.astimezone(ZoneInfo("UTC"))))
+        self.assertFalse(is_peak_time(self.off_peak_date.astimezone(ZoneInfo("UTC"))))
+
+    def test_update_tariff_rollups(self):
+        update_tariff_rollups([self.create_quarterly(self.peak_date, 10), self.create_quarterly(self.peak_date, 5)])
+        update_tariff_rollups([self.create_quarterly(self.off_peak_date, 7)])
+
+        peak = MonthlyTariffRollup.objects.get(tariff_post=TariffPosts.PEAK)
+        self.assertEqual(15, peak.active_consumption)
+        self.assertEqual(2, peak.samples)
+        self.assertEqual(datetime(2023, 6, 1).date(), peak.month)
+
+        off_peak = MonthlyTariffRollup.objects.get(tariff_post=TariffPosts.OFF_PEAK)
+        self.assertEqual(7, off_peak.active_consumption)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        update_tariff_rollups(
+            [self.create_quarterly(self.peak_date, 10), self.create_quarterly(self.off_peak_date, 7)]
+        )
+        incremental = list(MonthlyTariffRollup.objects.values_list("tariff_post", "active_consumption", "samples"))
+
+        rows = rebuild_tariff_rollups(self.transductor.id, datetime(2023, 6, 1).date(), datetime(2023, 7, 1).date())
+
+        self.assertEqual(2, rows)
+        rebuilt = list(MonthlyTariffRollup.objects.values_list("tariff_post", "active_consumption", "samples"))
+        self.assertCountEqual(incremental, rebuilt)
+
+    def test_monthly_endpoint_reads_rollup(self):
+        update_tariff_rollups(
+            [self.create_quarterly(self.peak_date, 10), self.create_quarterly(self.off_peak_date, 7)]
+        )
+
+        response = self.client.get(reverse("monthly-list"))
+        self.assertEqual(200, response.status_code)
+
+        results = response.json()["results"]
+        self.assertEqual(1, len(results))
+        self.assertEqual(10, results[0]["consumption_peak_time"])
+        self.assertEqual(7, results[0]["consumption_off_peak_time"])
+        self.assertEqual("01-06-2023", results[0]["start_date"])
+
+    def test_monthly_endpoint_custom_peak_window(self):
+        self.create_quarterly(self.peak_date, 10)
+        self.create_quarterly(self.off_peak_date, 7)
+
+        params = {"peak_time_start": "09:00:00", "peak_time_end": "10:59:59"}
+        response = self.client.get(reverse("monthly-list"), params)
+
+        results = response.json()["results"]
+        self.assertEqual(7, results[0]["consumption_peak_time"])
+        self.assertEqual(10, results[0]["consumption_off_peak_time"])
+
+    def test_monthly_endpoint_range_classifies_legacy_rows(self):
+        stored = self.create_quarterly(self.off_peak_date, 3)
+        QuarterlyMeasurement.objects.filter(id=stored.id).update(tariff_post=TariffPosts.OFF_PEAK)
+        self.create_quarterly(self.peak_date, 10)
+        self.create_quarterly(self.off_peak_date, 7)
+
+        params = {"start_date": "2023-06-05T00:00:00-03:00", "end_date": "2023-06-06T00:00:00-03:00"}
+        response = self.client.get(reverse("monthly-list"), params)
+
+        results = response.json()["results"]
+        self.assertEqual(10, results[0]["consumption_peak_time"])
+        self.assertEqual(10, results[0]["consumption_off_peak_time"])
+
+    def test_list_serializer_reads_stored_tariff_post(self):
+        measurement = self.create_quarterly(self.off_peak_date, 7)
+        measurement.tariff_post = TariffPosts.PEAK
+
+        data = QuarterlyListMeasurementSerializer(measurement).data
+        self.assertEqual(7, data["consumption_peak_time"])
+        self.assertIsNone(data["consumption_off_peak_time"])
+
+    def test_backfill_tariff_post(self):
+        peak = self.create_quarterly(self.peak_date, 10)
+        off_peak = self.create_quarterly(self.off_peak_date, 7)
+
+        call_command("backfill_tariff_post", batch_size=1, stdout=StringIO())
+
+        peak.refresh_from_db()
+        off_peak.refresh_from_db()
+        self.assertEqual(TariffPosts.PEAK, peak.tariff_post)
+        self.assertEqual(TariffPosts.OFF_PEAK, off_peak.tariff_post)
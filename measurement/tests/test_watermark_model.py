@@ -0,0 +1,124 @@
+from datetime import datetime
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from data_collector.models import MemoryMap
+from events.models import CriticalVoltageEvent, FailedConnectionTransductorEvent
+from measurement.models import TableWatermark
+from measurement.serializers import MinutelyMeasurementSerializer
+from measurement.watermarks import (
+    WATERMARK_FAILED_CONNECTION_EVENT,
+    WATERMARK_MINUTELY,
+    WATERMARK_VOLTAGE_EVENT,
+    bump_watermarks,
+)
+from transductor.models import Transductor
+
+
+@override_settings(DEBUG_TOOLBAR_CONFIG={"SHOW_TOOLBAR_CALLBACK": lambda request: False})
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.transductor = Transductor.objects.create(
+                id=1,
+                serial_number="87654321",
+                ip_address="111.111.111.11",
+                port="1234",
+                model="TR4020",
+                firmware_version="12.1.3215",
+                geolocation_longitude=-24.4556,
+                geolocation_latitude=-24.45996,
+                memory_map=self.memory_map,
+            )
+
+    def save_minutely(self):
+        serializer = MinutelyMeasurementSerializer(
+            data=[
+                {
+                    "transductor": self.transductor.id,
+                    "voltage_a": 220,
+                    "collection_date": timezone.make_aware(datetime(2023, 6, 5, 14, 0, 0)),
+                }
+            ],
+            many=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+
+    def version(self, table):
+        return TableWatermark.objects.get(table=table).version
+
+    def test_bump_happens_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            bump_watermarks(WATERMARK_MINUTELY, WATERMARK_MINUTELY)
+            self.assertFalse(TableWatermark.objects.filter(table=WATERMARK_MINUTELY).exists())
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(1, self.version(WATERMARK_MINUTELY))
+
+    def test_ingestion_and_events_bump_their_tables(self):
+        self.save_minutely()
+        self.assertEqual(1, self.version(WATERMARK_MINUTELY))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            event = CriticalVoltageEvent.objects.create(transductor=self.transductor)
+            FailedConnectionTransductorEvent.objects.create(transductor=self.transductor)
+        self.assertEqual(1, self.version(WATERMARK_VOLTAGE_EVENT))
+        self.assertEqual(1, self.version(WATERMARK_FAILED_CONNECTION_EVENT))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            event.ended_at = timezone.now()
+            event.save()
+        self.assertEqual(2, self.version(WATERMARK_VOLTAGE_EVENT))
+
+    def test_realtime_not_modified_until_new_batch(self):
+        url = reverse("realtime-list")
+        self.save_minutely()
+
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        self.assertIn("no-cache", response["Cache-Control"])
+        etag = response["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response["ETag"])
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(304, response.status_code)
+
+        self.save_minutely()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response["ETag"])
+
+    def test_event_lists_are_conditional(self):
+        Transductor.objects.all().delete()
+
+        etags = {}
+        for name in ["voltage-events", "failed-connection-events"]:
+            url = reverse(f"{name}-list")
+            etags[name] = self.client.get(url)["ETag"]
+            self.assertEqual(304, self.client.get(url, HTTP_IF_NONE_MATCH=etags[name]).status_code)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_watermarks(WATERMARK_FAILED_CONNECTION_EVENT)
+
+        url = reverse("failed-connection-events-list")
+        self.assertEqual(200, self.client.get(url, HTTP_IF_NONE_MATCH=etags["failed-connection-events"]).status_code)
+
+        url = reverse("voltage-events-list")
+        self.assertEqual(304, self.client.get(url, HTTP_IF_NONE_MATCH=etags["voltage-events"]).status_code)
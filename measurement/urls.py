@@ -1,6 +1,7 @@
 from rest_framework import routers
 
 from measurement.views import (
+    MeasurementRollupViewSet,
     MinutelyMeasurementViewSet,
     MonthlyMeasurementViewSet,
     QuarterlyMeasurementViewSet,
@@ -14,3 +15,4 @@ router.register(r"minutely-measurements", MinutelyMeasurementViewSet, basename="
 router.register(r"quarterly-measurements", QuarterlyMeasurementViewSet, basename="quarterly")
 router.register(r"monthly-measurements", MonthlyMeasurementViewSet, basename="monthly")
 router.register(r"realtime-measurements", RealTimeMeasurementViewSet, basename="realtime")
+router.register(r"rollup-measurements", MeasurementRollupViewSet, basename="rollup")
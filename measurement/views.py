@@ -1,38 +1,261 @@
-from django.db.models import Q, Sum
+from datetime import timedelta
+
+from django.db.models import DateTimeField, ExpressionWrapper, F, Q
 from django.db.models.functions import TruncMonth
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets
+from rest_framework import serializers, viewsets
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
 from data_collector.modbus.settings import ON_PEAK_TIME_END, ON_PEAK_TIME_START
-from measurement.filters import MinutelyMeasurementFilter, QuarterlyMeasurementFilter
-from measurement.models import MinutelyMeasurement, QuarterlyMeasurement, Transductor
+from measurement.deadband import iter_step_fill, step_fill
+from measurement.downsampling import downsampled_measurements
+from measurement.exports import EXPORT_FORMATS, export_stream
+from measurement.fast import FastReadMixin
+from measurement.filters import (
+    DailyRollupFilter,
+    HourlyRollupFilter,
+    MinutelyMeasurementFilter,
+    QuarterlyMeasurementFilter,
+)
+from measurement.models import (
+    MinutelyMeasurement,
+    MinutelyMeasurementHistory,
+    QuarterlyMeasurement,
+    Transductor,
+)
+from measurement.pagination import MeasurementCursorPagination
+from measurement.realtime import encode_readings, event_stream, get_hub
+from measurement.renderers import (
+    COLUMNAR_KEYS,
+    ColumnarRenderer,
+    EventStreamRenderer,
+    to_columns,
+)
+from measurement.rollups import (
+    ENERGY_FIELDS,
+    RESOLUTION_DAILY,
+    RESOLUTION_HOURLY,
+    ROLLUP_MODELS,
+    monthly_tariff_summary,
+    parse_resolution,
+    range_tariff_summary,
+    select_resolution,
+    tariff_annotations,
+)
 from measurement.serializers import (
+    MeasurementRollupSerializer,
     MinutelyMeasurementSerializer,
+    MinutelyMeasurementValuesSerializer,
     MonthlyListMeasurementSerializer,
     QuarterlyListMeasurementSerializer,
+    QuarterlyListMeasurementValuesSerializer,
     QuarterlyMeasurementSerializer,
     RealTimeMeasurementSerializer,
 )
+from measurement.watermarks import (
+    WATERMARK_MINUTELY,
+    WATERMARK_TRANSDUCTOR,
+    conditional_on,
+)
+
+
+class MeasurementExportMixin:
+    """
+    `export/` streams every row matching the filters (`transductor`, `start_date`, `end_date`)
+    as CSV or NDJSON (`output=csv|ndjson`), gzip compressed with `compress=true`.
+    """
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        output = request.query_params.get("output", "csv")
+        if output not in EXPORT_FORMATS:
+            raise serializers.ValidationError({"output": [f"Expected one of {sorted(EXPORT_FORMATS)}"]})
+
+        compress = request.query_params.get("compress", "false").lower() in ["true", "1", "yes"]
+
+        queryset = self.filter_queryset(self.get_queryset()).order_by("collection_date", "id")
+        fields = self.get_export_fields(queryset)
+
+        response = StreamingHttpResponse(
+            export_stream(queryset, fields, output, compress, transform=self.export_transform),
+            content_type="application/gzip" if compress else EXPORT_FORMATS[output],
+        )
+
+        filename = f"{self.basename}-measurements.{output}" + (".gz" if compress else "")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    def get_export_fields(self, queryset) -> list[str]:
+        return [field.attname for field in queryset.model._meta.concrete_fields]
+
+    def export_transform(self, rows):
+        """Lazy hook over the exported rows, read in ascending collection date."""
+        return rows
+
 
+class ColumnarListMixin:
+    """
+    `?format=columnar` lists return one array per field plus a `timestamps` array, read with
+    `values_list` instead of serializing each row. `fields` (comma separated) restricts the columns.
+    """
 
-class MinutelyMeasurementViewSet(viewsets.ReadOnlyModelViewSet):
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarRenderer]
+    columnar_fields = []
+
+    def list(self, request, *args, **kwargs):
+        if getattr(request.accepted_renderer, "format", None) != ColumnarRenderer.format:
+            return super().list(request, *args, **kwargs)
+
+        fields = self.get_columnar_fields()
+        rows = self.filter_queryset(self.get_queryset()).values_list(*COLUMNAR_KEYS, *fields, named=True)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(to_columns(self.prepare_columnar_rows(page), fields))
+
+        return Response(to_columns(self.prepare_columnar_rows(rows), fields))
+
+    def prepare_columnar_rows(self, rows) -> list:
+        return list(rows)
+
+    def get_columnar_fields(self):
+        fields = self.request.query_params.get("fields")
+        if not fields:
+            return self.columnar_fields
+
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+        invalid_fields = set(fields) - set(self.columnar_fields)
+        if invalid_fields:
+            raise serializers.ValidationError({"fields": [f"Unknown fields: {sorted(invalid_fields)}"]})
+
+        return ["transductor", *[field for field in fields if field != "transductor"]]
+
+
+class DownsampledListMixin:
+    """
+    Lists with `resolution` (min/max/avg/last per time bucket, from the rollups for whole hours or
+    days) or `points` (LTTB) return a downsampled time-series instead of the raw rows. See
+    `downsampled_measurements`.
+    """
+
+    def list(self, request, *args, **kwargs):
+        downsampled = downsampled_measurements(self.filter_queryset(self.get_queryset()), request.query_params)
+        if downsampled is None:
+            return super().list(request, *args, **kwargs)
+
+        return Response(downsampled)
+
+
+class MinutelyMeasurementViewSet(
+    MeasurementExportMixin,
+    DownsampledListMixin,
+    ColumnarListMixin,
+    FastReadMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     serializer_class = MinutelyMeasurementSerializer
-    queryset = MinutelyMeasurement.objects.all().order_by("-id")
+    fast_serializer_class = MinutelyMeasurementValuesSerializer
+    columnar_fields = ["transductor", *MinutelyMeasurement.measurement_fields()]
+    queryset = MinutelyMeasurementHistory.objects.all().order_by("-collection_date", "-id")
     filter_backends = [DjangoFilterBackend]
     filterset_class = MinutelyMeasurementFilter
+    pagination_class = MeasurementCursorPagination
+
+    def get_export_fields(self, queryset):
+        return [field.attname for field in MinutelyMeasurement._meta.concrete_fields]
+
+    def export_transform(self, rows):
+        return iter_step_fill(rows)
+
+    def prepare_columnar_rows(self, rows):
+        return step_fill(rows)
+
+
+class MeasurementRollupViewSet(viewsets.GenericViewSet):
+    """
+    Time-series of the minutely fields at the requested `resolution` (e.g. `hourly`, `daily`, `900`, `15m`).
+    The coarsest stored table that satisfies the resolution answers the query: hourly/daily rollups or the
+    raw minutely rows. Use `fields` (comma separated) to restrict the returned quantities.
+    """
+
+    serializer_class = MeasurementRollupSerializer
     pagination_class = PageNumberPagination
+    filter_classes = {
+        RESOLUTION_DAILY: DailyRollupFilter,
+        RESOLUTION_HOURLY: HourlyRollupFilter,
+    }
+
+    def list(self, request):
+        resolution = self.get_resolution()
+        queryset = self.get_queryset(resolution)
+
+        context = {"resolution": resolution, "fields": self.get_fields()}
+        page = self.paginate_queryset(queryset)
+
+        if page is not None:
+            serializer = self.get_serializer(self.prepare_rows(page, resolution), many=True, context=context)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(self.prepare_rows(queryset, resolution), many=True, context=context)
+        return Response(serializer.data)
+
+    def prepare_rows(self, rows, resolution):
+        """The raw minutely rows are step-filled; the rollups already hold filled aggregates."""
+        if resolution in ROLLUP_MODELS:
+            return rows
+        return step_fill(rows)
+
+    def get_queryset(self, resolution=None):
+        params = self.request.query_params
+
+        if resolution in ROLLUP_MODELS:
+            queryset = ROLLUP_MODELS[resolution].objects.order_by("transductor", "bucket")
+            return self.filter_classes[resolution](params, queryset=queryset).qs
 
+        queryset = MinutelyMeasurementHistory.objects.order_by("transductor", "collection_date")
+        return MinutelyMeasurementFilter(params, queryset=queryset).qs
 
-class QuarterlyMeasurementViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = QuarterlyMeasurement.objects.all().order_by("-id")
+    def get_resolution(self) -> str:
+        try:
+            resolution_seconds = parse_resolution(self.request.query_params.get("resolution", RESOLUTION_HOURLY))
+        except ValueError as e:
+            raise serializers.ValidationError({"resolution": [str(e)]})
+
+        return select_resolution(resolution_seconds)
+
+    def get_fields(self):
+        available_fields = MinutelyMeasurement.measurement_fields()
+        fields = self.request.query_params.get("fields")
+
+        if not fields:
+            return available_fields
+
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+        invalid_fields = set(fields) - set(available_fields)
+        if invalid_fields:
+            raise serializers.ValidationError({"fields": [f"Unknown fields: {sorted(invalid_fields)}"]})
+
+        return fields
+
+
+class QuarterlyMeasurementViewSet(
+    MeasurementExportMixin,
+    ColumnarListMixin,
+    FastReadMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
+    queryset = QuarterlyMeasurement.objects.all().order_by("-collection_date", "-id")
+    fast_serializer_class = QuarterlyListMeasurementValuesSerializer
     filter_backends = [DjangoFilterBackend]
-    pagination_class = PageNumberPagination
+    pagination_class = MeasurementCursorPagination
     filterset_class = QuarterlyMeasurementFilter
+    columnar_fields = ["transductor", "is_calculated", "tariff_post", *ENERGY_FIELDS]
 
     def get_serializer_class(self):
         if self.action in ["list", "retrieve"]:
@@ -77,41 +300,47 @@ class MonthlyMeasurementViewSet(viewsets.ReadOnlyModelViewSet):
         peak_time_start = self.request.query_params.get("peak_time_start", None)
         peak_time_end = self.request.query_params.get("peak_time_end", None)
 
+        if peak_time_start is None and peak_time_end is None:
+            # Whole months with the default peak window are precomputed at quarterly ingestion
+            if start_date is None:
+                return monthly_tariff_summary()
+
+            return range_tariff_summary(start_date, end_date or timezone.now())
+
         peak_time_end = peak_time_end or ON_PEAK_TIME_END
         peak_time_start = peak_time_start or ON_PEAK_TIME_START
 
+        # Same convention as `is_peak_time`: a measurement belongs to the minute before its collection
+        reference_time = ExpressionWrapper(F("collection_date") - timedelta(minutes=1), output_field=DateTimeField())
         peak_time = (
-            Q(collection_date__time__gte=peak_time_start)
-            & Q(collection_date__time__lt=peak_time_start)
-            & Q(collection_date__week_day__in=[0, 1, 2, 3, 4])
+            Q(reference_time__time__gte=peak_time_start)
+            & Q(reference_time__time__lte=peak_time_end)
+            & Q(collection_date__week_day__in=[2, 3, 4, 5, 6])  # monday to friday
         )
 
+        qs = QuarterlyMeasurement.objects.annotate(reference_time=reference_time)
+
         if start_date is not None:
             end_date = end_date or timezone.now()
-            qs = QuarterlyMeasurement.objects.filter(collection_date__range=[start_date, end_date])
+            qs = qs.filter(collection_date__range=[start_date, end_date])
             qs = qs.values("transductor")
 
         else:
-            qs = QuarterlyMeasurement.objects.annotate(month=TruncMonth("collection_date"))
+            qs = qs.annotate(month=TruncMonth("collection_date"))
             qs = qs.values("month", "transductor")
 
-        qs = qs.annotate(
-            consumption_peak_time=Sum("active_consumption", filter=peak_time),
-            consumption_off_peak_time=Sum("active_consumption", filter=~peak_time),
-            generated_energy_peak_time=Sum("active_generated", filter=peak_time),
-            generated_energy_off_peak_time=Sum("active_generated", filter=~peak_time),
-            inductive_power_peak_time=Sum("reactive_inductive", filter=peak_time),
-            inductive_power_off_peak_time=Sum("reactive_inductive", filter=~peak_time),
-            capacitive_power_peak_time=Sum("reactive_capacitive", filter=peak_time),
-            capacitive_power_off_peak_time=Sum("reactive_capacitive", filter=~peak_time),
-        )
-        return qs
+        qs = qs.annotate(**tariff_annotations(peak_time, ~peak_time))
+        return qs.order_by("transductor")
 
 
 # TODO: Acredito que seria mais coerente essa viewset na API  Master.
 class RealTimeMeasurementViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = RealTimeMeasurementSerializer
 
+    @conditional_on(WATERMARK_MINUTELY, WATERMARK_TRANSDUCTOR)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def get_queryset(self):
         latest_measurements = []
         transductors = Transductor.objects.all()
@@ -122,4 +351,20 @@ class RealTimeMeasurementViewSet(viewsets.ReadOnlyModelViewSet):
             if latest_measurement:
                 latest_measurements.append(latest_measurement)
 
-        return latest_measurements
+        return step_fill(latest_measurements)
+
+    @action(detail=False, methods=["get"], renderer_classes=[EventStreamRenderer])
+    def stream(self, request):
+        """
+        Server-Sent Events with the latest reading of each transductor followed by every minutely
+        batch the collector saves, pushed without querying the database again.
+        """
+        latest = MinutelyMeasurement.objects.order_by("transductor", "-collection_date").distinct("transductor")
+        snapshot = encode_readings(RealTimeMeasurementSerializer(step_fill(latest), many=True).data)
+
+        response = StreamingHttpResponse(
+            event_stream(get_hub(), snapshot), content_type=EventStreamRenderer.media_type
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
@@ -0,0 +1,21 @@
+from django.contrib import admin
+
+from replication.models import OutboxEntry, OutboxOffset, SyncCheckpoint
+
+
+@admin.register(SyncCheckpoint)
+class SyncCheckpointAdmin(admin.ModelAdmin):
+    list_display = ["consumer", "positions", "acknowledged_at"]
+    readonly_fields = ("acknowledged_at",)
+
+
+@admin.register(OutboxEntry)
+class OutboxEntryAdmin(admin.ModelAdmin):
+    list_display = ["id", "table", "created_at"]
+    list_filter = ("table",)
+
+
+@admin.register(OutboxOffset)
+class OutboxOffsetAdmin(admin.ModelAdmin):
+    list_display = ["destination", "last_id", "attempts", "next_attempt_at", "updated_at"]
+    readonly_fields = ("updated_at",)
@@ -0,0 +1,63 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection
+
+from replication.outbox import OutboxSender
+
+logger = logging.getLogger("tasks")
+
+# pg_try_advisory_lock key: only one sender drains the outbox at a time
+OUTBOX_LOCK_ID = 7_300_032
+
+
+class Command(BaseCommand):
+    """
+    Pushes the measurement outbox to the master (`REPLICATION_PUSH_URL`). Run it from cron to drain
+    the outbox once, or with `--loop` as a long running sender.
+    """
+
+    help = "Sends the pending outbox entries to the master server in compressed batches"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--url", type=str, default=None, help="Destination (default: REPLICATION_PUSH_URL)")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Entries per request")
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many requests")
+        parser.add_argument("--loop", action="store_true", help="Keep sending until interrupted")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds between polls with --loop")
+
+    def handle(self, *args, **options) -> None:
+        url = options["url"] or settings.REPLICATION_PUSH_URL
+        if not url:
+            logger.info("Outbox: REPLICATION_PUSH_URL not configured, push replication disabled.")
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [OUTBOX_LOCK_ID])
+            if not cursor.fetchone()[0]:
+                logger.info("Outbox: another sender is running.")
+                return
+
+        try:
+            self.send(OutboxSender(url, batch_size=options["batch_size"]), options)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [OUTBOX_LOCK_ID])
+
+    def send(self, sender: OutboxSender, options) -> None:
+        while True:
+            start_time = time.perf_counter()
+            delivered = sender.send_pending(max_batches=options["max_batches"])
+
+            if delivered:
+                elapsed_time = time.perf_counter() - start_time
+                logger.info(f"Outbox: {delivered} entries delivered in {elapsed_time:.2f} seconds.")
+
+            if not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(f"{delivered} outbox entries delivered."))
+                return
+
+            if not delivered:
+                time.sleep(options["interval"])
@@ -0,0 +1,64 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class SyncCheckpoint(models.Model):
+    """
+    Last sync position acknowledged by a consumer (usually the master server). Rows up to
+    these watermarks are shipped: a sync without cursor resumes right after them.
+    """
+
+    consumer = models.CharField(max_length=64, unique=True)
+    positions = models.JSONField(default=dict)
+    acknowledged_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Sync Checkpoint"
+        verbose_name_plural = "Sync Checkpoints"
+
+    def __str__(self) -> str:
+        return f"{self.consumer} - {self.acknowledged_at}"
+
+
+class OutboxEntry(models.Model):
+    """
+    Measurement row waiting to be pushed to the master. Written in the same transaction as the
+    measurement itself, so a committed measurement is always shipped and a rolled back one never is.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    table = models.CharField(max_length=20)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Outbox Entry"
+        verbose_name_plural = "Outbox Entries"
+
+    def __str__(self) -> str:
+        return f"{self.table} - {self.id}"
+
+
+class OutboxOffset(models.Model):
+    """
+    Delivery position of the outbox for a destination, with the retry state of the sender.
+    `seen_id` and `seen_at` (microseconds since the epoch) hold a gap in the entry ids after
+    `last_id` until it is final (see `replication.sync.IdWatermarkTable`).
+    """
+
+    destination = models.CharField(max_length=255, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    seen_id = models.BigIntegerField(default=0)
+    seen_at = models.BigIntegerField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Outbox Offset"
+        verbose_name_plural = "Outbox Offsets"
+
+    def __str__(self) -> str:
+        return f"{self.destination} - {self.last_id}"
@@ -0,0 +1,129 @@
+import gzip
+import json
+import logging
+from datetime import timedelta
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from replication.models import OutboxEntry, OutboxOffset
+from replication.sync import IdWatermarkTable, current_xid_fence
+
+logger = logging.getLogger("tasks")
+
+OUTBOX_TABLE = IdWatermarkTable(OutboxEntry)
+
+
+def enqueue(table: str, instances) -> None:
+    """
+    Adds measurement rows to the push outbox. Must run inside the transaction that saves the
+    instances. Does nothing while push replication is not configured (`REPLICATION_PUSH_URL`).
+    """
+    if not settings.REPLICATION_PUSH_URL:
+        return
+
+    OutboxEntry.objects.bulk_create(
+        OutboxEntry(
+            table=table,
+            payload={field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields},
+        )
+        for instance in instances
+    )
+
+
+class OutboxSender:
+    """
+    Drains the outbox to the master in gzip compressed batches of `batch_size` rows.
+
+    The offset (last entry delivered) of each destination only moves after it answers with 2xx,
+    and the entries delivered to every destination are then deleted; delete the offset of a
+    destination no longer used to release the entries it holds. A failed batch is retried with
+    exponential backoff, so a batch can be delivered more than once: the master must ignore
+    entries whose id it already has.
+    """
+
+    def __init__(self, url: str, batch_size: int = 2000, timeout: float = 30, backoff_base=5, backoff_max=600):
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def get_offset(self) -> OutboxOffset:
+        offset, _ = OutboxOffset.objects.get_or_create(destination=self.url)
+        return offset
+
+    def send_pending(self, max_batches: int = None) -> int:
+        """Pushes the pending entries and returns how many were delivered."""
+        offset = self.get_offset()
+        if offset.next_attempt_at and offset.next_attempt_at > timezone.now():
+            logger.debug(f"Outbox: waiting backoff until {offset.next_attempt_at}")
+            return 0
+
+        delivered, batches = 0, 0
+        while max_batches is None or batches < max_batches:
+            position = [offset.last_id, offset.seen_id, offset.seen_at]
+            entries, position, has_more = OUTBOX_TABLE.read(position, current_xid_fence(), self.batch_size)
+            if not entries:
+                # the gap the entries wait for must keep the time it was first seen
+                offset.seen_id, offset.seen_at = position[1:]
+                offset.save(update_fields=["seen_id", "seen_at", "updated_at"])
+                break
+
+            try:
+                self.post(entries)
+            except OSError as e:  # URLError, HTTPError, timeouts and connection errors
+                self.record_failure(offset, e)
+                break
+
+            self.record_delivery(offset, position)
+            delivered += len(entries)
+            batches += 1
+
+            if not has_more:
+                break
+
+        return delivered
+
+    def post(self, entries) -> None:
+        body = {
+            "first_id": entries[0]["id"],
+            "last_id": entries[-1]["id"],
+            "entries": [{"id": entry["id"], "table": entry["table"], "data": entry["payload"]} for entry in entries],
+        }
+        data = gzip.compress(json.dumps(body, cls=DjangoJSONEncoder).encode())
+
+        request = Request(
+            self.url,
+            data=data,
+            method="POST",
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+        with urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def record_delivery(self, offset: OutboxOffset, position: list) -> None:
+        last_id = position[0]
+        with transaction.atomic():
+            offset.last_id, offset.seen_id, offset.seen_at = position
+            offset.attempts = 0
+            offset.next_attempt_at = None
+            offset.last_error = ""
+            offset.save()
+            delivered_id = OutboxOffset.objects.aggregate(Min("last_id"))["last_id__min"]
+            OutboxEntry.objects.filter(id__lte=delivered_id).delete()
+
+        logger.debug(f"Outbox: delivered up to entry {last_id}")
+
+    def record_failure(self, offset: OutboxOffset, error: Exception) -> None:
+        offset.attempts += 1
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (offset.attempts - 1))
+        offset.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        offset.last_error = str(error)
+        offset.save()
+
+        logger.warning(f"Outbox: push failed ({error}), attempt {offset.attempts}, retrying in {delay}s")
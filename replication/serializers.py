@@ -0,0 +1,14 @@
+from rest_framework import serializers
+
+from replication.sync import decode_cursor
+
+
+class SyncAckSerializer(serializers.Serializer):
+    consumer = serializers.CharField(max_length=64, default="master")
+    cursor = serializers.CharField()
+
+    def validate_cursor(self, value):
+        try:
+            return decode_cursor(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
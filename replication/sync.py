@@ -0,0 +1,237 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from events.models import (
+    CriticalVoltageEvent,
+    Event,
+    FailedConnectionTransductorEvent,
+    PhaseDropEvent,
+    PrecariousVoltageEvent,
+)
+from measurement.deadband import step_fill
+from measurement.models import (
+    MinutelyMeasurement,
+    MonthlyMeasurement,
+    QuarterlyMeasurement,
+)
+
+XID_MODULO = 2**32
+XID_HALF_RANGE = 2**31
+
+
+def current_xid_fence() -> int:
+    """
+    Oldest transaction still running (`pg_snapshot_xmin`), as a 32-bit xid. Every row whose
+    `xmin` precedes it was written by a committed (or aborted) transaction, so no row with an
+    older `xmin` can still show up later.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text")
+        return int(cursor.fetchone()[0]) % XID_MODULO
+
+
+def transaction_clock() -> tuple[int, int]:
+    """
+    Clock of the database and start of the oldest transaction open in another session (None
+    without one), in microseconds since the epoch. Unlike an xid, the start of a transaction is
+    known before it writes: it precedes every id the transaction took from a sequence. Only the
+    sessions of the database user of the slave are seen unless it is a superuser.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT
+                (extract(epoch FROM clock_timestamp()) * 1000000)::bigint,
+                (extract(epoch FROM min(xact_start)) * 1000000)::bigint
+            FROM pg_stat_activity
+            WHERE pid <> pg_backend_pid() AND backend_type = 'client backend'
+            """
+        )
+        return cursor.fetchone()
+
+
+def xid_precedes(xid: int, fence: int) -> bool:
+    """Modulo-2^32 comparison, the same PostgreSQL uses for transaction ids."""
+    return 0 < (fence - xid) % XID_MODULO < XID_HALF_RANGE
+
+
+class IdWatermarkTable:
+    """
+    Insert-only table followed by primary key. The position is `[last_id, seen_id, seen_at]`:
+    the last id shipped and, while the ids after it have a gap, the highest id read when the gap
+    was first seen and the time it was seen (see `transaction_clock`).
+
+    A sequence hands out ids before the inserting transaction commits, so a gap in the ids is
+    either a row still being written or one that never will be (a rolled back or deleted row).
+    The watermark stops at a gap until every transaction open when it was seen has ended; the
+    gaps up to `seen_id` are then final and skipped. With no transaction open, that is right away.
+    """
+
+    def __init__(self, model, transform=None):
+        self.model = model
+        self.fields = [field.attname for field in model._meta.concrete_fields]
+        self.transform = transform
+
+    def initial_position(self, fence: int):
+        return [0, 0, None]
+
+    def is_valid_position(self, position) -> bool:
+        # a plain id is the position of the cursors issued before the gaps were tracked
+        if isinstance(position, int):
+            return position >= 0
+        return (
+            isinstance(position, list)
+            and len(position) == 3
+            and all(isinstance(value, int) and value >= 0 for value in position[:2])
+            and (position[2] is None or isinstance(position[2], int) and position[2] >= 0)
+        )
+
+    def read(self, position, fence: int, limit: int):
+        if isinstance(position, int):
+            position = [position, 0, None]
+        last_id, seen_id, seen_at = position
+
+        queryset = self.model.objects.filter(id__gt=last_id).order_by("id")
+        rows = list(queryset.values(*self.fields)[: limit + 1])
+        has_more = len(rows) > limit
+
+        shipped, now = [], None
+        for row in rows[:limit]:
+            if row["id"] != last_id + 1:
+                if now is None:
+                    # read after the rows: a transaction that took a missing id started before `now`
+                    now, oldest = transaction_clock()
+                if row["id"] > seen_id:
+                    seen_id, seen_at = rows[-1]["id"], now
+                if oldest is not None and oldest <= seen_at:
+                    has_more = False
+                    break
+
+            shipped.append(row)
+            last_id = row["id"]
+
+        if last_id >= seen_id:
+            seen_id, seen_at = 0, None
+
+        if self.transform is not None:
+            shipped = self.transform(shipped)
+        return shipped, [last_id, seen_id, seen_at], has_more
+
+
+class XminWatermarkTable:
+    """
+    Table whose rows are also updated (events get `ended_at` later), followed by the `xmin` of
+    the row version. The position is `[window_start, window_end, last_id]`: rows whose `xmin` lies
+    in the window are paged by id; once the window is drained, the next one runs from its end to
+    the current xid fence. An updated row gets a new `xmin` and is shipped again.
+    """
+
+    def __init__(self, model, subclasses):
+        self.model = model
+        self.subclasses = subclasses
+        self.fields = [field.attname for field in model._meta.concrete_fields]
+
+    def initial_position(self, fence: int):
+        # every row written by the last 2^31 transactions, i.e. the whole table
+        start = (fence - XID_HALF_RANGE + 1) % XID_MODULO
+        return [start, fence, 0]
+
+    def is_valid_position(self, position) -> bool:
+        return (
+            isinstance(position, list)
+            and len(position) == 3
+            and all(isinstance(value, int) and 0 <= value for value in position)
+        )
+
+    def read(self, position, fence: int, limit: int):
+        start, end, last_id = position
+        if start == end:
+            start, end, last_id = end, fence, 0
+
+        window = (end - start) % XID_MODULO
+        xid_offset = RawSQL(
+            f'("{self.model._meta.db_table}".xmin::text::bigint - %s + %s) %% %s',
+            [start, XID_MODULO, XID_MODULO],
+        )
+
+        queryset = self.model.objects.annotate(xid_offset=xid_offset)
+        queryset = queryset.filter(xid_offset__lt=window, id__gt=last_id).order_by("id")
+
+        rows = list(queryset.values(*self.fields)[: limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        self.add_types(rows)
+
+        if has_more:
+            return rows, [start, end, rows[-1]["id"]], True
+        return rows, [end, end, 0], False
+
+    def add_types(self, rows) -> None:
+        ids = [row["id"] for row in rows]
+        types = {}
+        for subclass in self.subclasses:
+            for pk in subclass._base_manager.filter(pk__in=ids).values_list("pk", flat=True):
+                types.setdefault(pk, subclass.__name__)
+
+        for row in rows:
+            row["type"] = types.get(row["id"], self.model.__name__)
+
+
+SYNC_TABLES = {
+    "minutely": IdWatermarkTable(MinutelyMeasurement, transform=step_fill),
+    "quarterly": IdWatermarkTable(QuarterlyMeasurement),
+    "monthly": IdWatermarkTable(MonthlyMeasurement),
+    "events": XminWatermarkTable(
+        Event,
+        subclasses=[
+            CriticalVoltageEvent,
+            PrecariousVoltageEvent,
+            PhaseDropEvent,
+            FailedConnectionTransductorEvent,
+        ],
+    ),
+}
+
+
+def encode_cursor(positions: dict) -> str:
+    return urlsafe_b64encode(json.dumps(positions, separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        positions = json.loads(urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(positions, dict) or set(positions) - set(SYNC_TABLES):
+        raise ValueError("Invalid cursor")
+
+    for name, position in positions.items():
+        if not SYNC_TABLES[name].is_valid_position(position):
+            raise ValueError("Invalid cursor")
+    return positions
+
+
+def read_changes(positions: dict, limit: int, tables=None) -> dict:
+    """
+    Rows of each table after its position, up to `limit` rows per table. Returns the rows, the
+    cursor for the next call and whether any table has more rows ready.
+    """
+    fence = current_xid_fence()
+    positions = dict(positions)
+
+    changes, has_more = {}, False
+    for name in tables or SYNC_TABLES:
+        table = SYNC_TABLES[name]
+        position = positions.get(name)
+        if position is None:
+            position = table.initial_position(fence)
+
+        rows, positions[name], table_has_more = table.read(position, fence, limit)
+        changes[name] = rows
+        has_more = has_more or table_has_more
+
+    return {"cursor": encode_cursor(positions), "has_more": has_more, "tables": changes}
@@ -0,0 +1,147 @@
+import gzip
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from data_collector.models import MemoryMap
+from measurement.serializers import MinutelyMeasurementSerializer
+from replication.models import OutboxEntry, OutboxOffset
+from replication.outbox import OutboxSender
+from transductor.models import Transductor
+
+
+class MasterStandIn(BaseHTTPRequestHandler):
+    """Collects the pushed batches; answers `status` (class attribute) to every request."""
+
+    status = 200
+    batches = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.status == 200:
+            self.batches.append(json.loads(gzip.decompress(body)))
+
+        self.send_response(self.status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+# The sender only reads outbox rows of committed transactions
+class OutboxTestCase(TransactionTestCase):
+    def setUp(self):
+        MasterStandIn.status = 200
+        MasterStandIn.batches = []
+
+        self.server = HTTPServer(("127.0.0.1", 0), MasterStandIn)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/replication/"
+
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+    def save_minutely(self, count):
+        start = timezone.now() - timedelta(minutes=count)
+        data = [
+            {
+                "transductor": self.transductor.id,
+                "voltage_a": 220,
+                "collection_date": start + timedelta(minutes=minute),
+            }
+            for minute in range(count)
+        ]
+        serializer = MinutelyMeasurementSerializer(data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_outbox_disabled_without_url(self):
+        self.save_minutely(2)
+        self.assertFalse(OutboxEntry.objects.exists())
+
+    def test_push_in_batches(self):
+        with override_settings(REPLICATION_PUSH_URL=self.url):
+            measurements = self.save_minutely(5)
+
+        self.assertEqual(5, OutboxEntry.objects.count())
+
+        delivered = OutboxSender(self.url, batch_size=2).send_pending()
+
+        self.assertEqual(5, delivered)
+        self.assertEqual(3, len(MasterStandIn.batches))
+        pushed = [entry["data"]["id"] for batch in MasterStandIn.batches for entry in batch["entries"]]
+        self.assertEqual([measurement.id for measurement in measurements], pushed)
+        self.assertEqual({"minutely"}, {entry["table"] for entry in MasterStandIn.batches[0]["entries"]})
+
+        self.assertFalse(OutboxEntry.objects.exists())
+        self.assertEqual(MasterStandIn.batches[-1]["last_id"], OutboxOffset.objects.get(destination=self.url).last_id)
+
+    def test_entries_are_kept_until_every_destination_has_them(self):
+        with override_settings(REPLICATION_PUSH_URL=self.url):
+            self.save_minutely(3)
+
+        backup = f"{self.url}backup/"
+        OutboxOffset.objects.create(destination=backup)
+
+        self.assertEqual(3, OutboxSender(self.url).send_pending())
+        self.assertEqual(3, OutboxEntry.objects.count())
+
+        self.assertEqual(3, OutboxSender(backup).send_pending())
+        self.assertFalse(OutboxEntry.objects.exists())
+
+    def test_failed_push_backs_off(self):
+        with override_settings(REPLICATION_PUSH_URL=self.url):
+            self.save_minutely(3)
+
+        MasterStandIn.status = 500
+        sender = OutboxSender(self.url, backoff_base=60)
+
+        self.assertEqual(0, sender.send_pending())
+        offset = OutboxOffset.objects.get(destination=self.url)
+        self.assertEqual(1, offset.attempts)
+        self.assertEqual(0, offset.last_id)
+        self.assertGreater(offset.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(3, OutboxEntry.objects.count())
+
+        # still backing off: nothing is sent even though the master is back
+        MasterStandIn.status = 200
+        self.assertEqual(0, sender.send_pending())
+        self.assertEqual([], MasterStandIn.batches)
+
+        OutboxOffset.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(3, sender.send_pending())
+        self.assertEqual(0, OutboxOffset.objects.get(destination=self.url).attempts)
+
+    def test_push_outbox_command(self):
+        with override_settings(REPLICATION_PUSH_URL=self.url):
+            self.save_minutely(2)
+            out = StringIO()
+            call_command("push_outbox", stdout=out)
+
+        self.assertIn("2 outbox entries delivered", out.getvalue())
+        self.assertEqual(1, len(MasterStandIn.batches))
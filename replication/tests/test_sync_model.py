@@ -0,0 +1,165 @@
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from data_collector.models import MemoryMap
+from events.models import Event, FailedConnectionTransductorEvent
+from measurement.models import MinutelyMeasurement
+from replication.models import SyncCheckpoint
+from replication.sync import xid_precedes
+from transductor.models import Transductor
+
+
+# The sync only ships rows of committed transactions, so the rows must not live in the test transaction
+@override_settings(DEBUG_TOOLBAR_CONFIG={"SHOW_TOOLBAR_CALLBACK": lambda request: False})
+class SyncTestCase(TransactionTestCase):
+    def setUp(self):
+        self.memory_map = MemoryMap.objects.create(
+            id=1,
+            model_transductor="TR4020",
+            minutely=[],
+            quarterly=[],
+            monthly=[],
+        )
+
+        self.transductor = Transductor.objects.create(
+            id=1,
+            serial_number="87654321",
+            ip_address="111.111.111.11",
+            port="1234",
+            model="TR4020",
+            firmware_version="12.1.3215",
+            geolocation_longitude=-24.4556,
+            geolocation_latitude=-24.45996,
+            memory_map=self.memory_map,
+        )
+
+        self.start = timezone.make_aware(datetime(2023, 6, 5, 14, 0, 0))
+
+    def create_minutely(self, count):
+        return MinutelyMeasurement.objects.bulk_create(
+            MinutelyMeasurement(
+                transductor=self.transductor,
+                voltage_a=220,
+                collection_date=self.start + timedelta(minutes=minute),
+            )
+            for minute in range(count)
+        )
+
+    def sync(self, **params):
+        response = self.client.get(reverse("sync-list"), params)
+        self.assertEqual(200, response.status_code)
+        return json.loads(response.content)
+
+    def test_xid_precedes_wraps_around(self):
+        self.assertTrue(xid_precedes(10, 20))
+        self.assertFalse(xid_precedes(20, 20))
+        self.assertTrue(xid_precedes(2**32 - 5, 3))
+        self.assertFalse(xid_precedes(3, 2**32 - 5))
+
+    def test_sync_pages_until_drained(self):
+        measurements = self.create_minutely(5)
+
+        data = self.sync(limit=2, tables="minutely")
+        ids = [row["id"] for row in data["tables"]["minutely"]]
+        self.assertTrue(data["has_more"])
+
+        while data["has_more"]:
+            data = self.sync(limit=2, tables="minutely", cursor=data["cursor"])
+            ids += [row["id"] for row in data["tables"]["minutely"]]
+
+        self.assertEqual([measurement.id for measurement in measurements], ids)
+
+        data = self.sync(tables="minutely", cursor=data["cursor"])
+        self.assertEqual([], data["tables"]["minutely"])
+
+        new_measurement = self.create_minutely(1)[0]
+        data = self.sync(tables="minutely", cursor=data["cursor"])
+        self.assertEqual([new_measurement.id], [row["id"] for row in data["tables"]["minutely"]])
+
+    def test_rows_committed_late_below_the_watermark_are_shipped(self):
+        self.create_minutely(1)
+        data = self.sync(tables="minutely")
+
+        # another transaction takes the next id, and only gets its xid after a later row committed
+        table = MinutelyMeasurement._meta.db_table
+        other = connections.create_connection(DEFAULT_DB_ALIAS)
+        other.set_autocommit(False)
+        try:
+            with other.cursor() as cursor:
+                cursor.execute(f"SELECT nextval(pg_get_serial_sequence('{table}', 'id'))")
+                late_id = cursor.fetchone()[0]
+                committed_id = MinutelyMeasurement.objects.create(
+                    transductor=self.transductor, voltage_a=220, collection_date=self.start + timedelta(minutes=1)
+                ).id
+                cursor.execute(
+                    f'INSERT INTO "{table}" (id, transductor_id, collection_date, slave_collection_date, voltage_a)'
+                    " VALUES (%s, %s, %s, now(), 220)",
+                    [late_id, self.transductor.id, self.start - timedelta(minutes=1)],
+                )
+
+            data = self.sync(tables="minutely", cursor=data["cursor"])
+            self.assertEqual([], data["tables"]["minutely"])
+
+            other.commit()
+        finally:
+            other.close()
+
+        data = self.sync(tables="minutely", cursor=data["cursor"])
+        self.assertEqual([late_id, committed_id], [row["id"] for row in data["tables"]["minutely"]])
+
+    def test_watermark_skips_the_ids_never_committed(self):
+        measurements = self.create_minutely(3)
+        MinutelyMeasurement.objects.filter(id=measurements[1].id).delete()
+
+        # no transaction that could still write the missing id is running
+        data = self.sync(tables="minutely")
+        self.assertEqual([measurements[0].id, measurements[2].id], [row["id"] for row in data["tables"]["minutely"]])
+
+    def test_ack_resumes_from_checkpoint(self):
+        self.create_minutely(3)
+
+        data = self.sync(limit=2)
+        response = self.client.post(reverse("sync-ack"), {"consumer": "master", "cursor": data["cursor"]})
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(SyncCheckpoint.objects.filter(consumer="master").exists())
+
+        data = self.sync()
+        self.assertEqual(1, len(data["tables"]["minutely"]))
+
+        # other consumers keep their own position
+        data = self.sync(consumer="backup")
+        self.assertEqual(3, len(data["tables"]["minutely"]))
+
+    def test_events_are_shipped_again_after_update(self):
+        event = FailedConnectionTransductorEvent.objects.create(transductor=self.transductor, data="timeout")
+
+        data = self.sync(tables="events")
+        self.assertEqual(["FailedConnectionTransductorEvent"], [row["type"] for row in data["tables"]["events"]])
+
+        data = self.sync(tables="events", cursor=data["cursor"])
+        self.assertEqual([], data["tables"]["events"])
+
+        Event.objects.filter(id=event.id).update(ended_at=timezone.now())
+        data = self.sync(tables="events", cursor=data["cursor"])
+        self.assertEqual([event.id], [row["id"] for row in data["tables"]["events"]])
+        self.assertIsNotNone(data["tables"]["events"][0]["ended_at"])
+
+    def test_gzip_response(self):
+        self.create_minutely(2)
+
+        response = self.client.get(reverse("sync-list"), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual("gzip", response["Content-Encoding"])
+        self.assertEqual(2, len(json.loads(gzip.decompress(response.content))["tables"]["minutely"]))
+
+    def test_invalid_params(self):
+        response = self.client.get(reverse("sync-list"), {"cursor": "invalid"})
+        self.assertEqual(400, response.status_code)
+
+        response = self.client.get(reverse("sync-list"), {"tables": "unknown"})
+        self.assertEqual(400, response.status_code)
@@ -0,0 +1,8 @@
+from rest_framework import routers
+
+from replication.views import SyncViewSet
+
+app_name = "replication"
+
+router = routers.DefaultRouter()
+router.register(r"sync", SyncViewSet, basename="sync")
@@ -0,0 +1,83 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.text import compress_string
+from rest_framework import serializers, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from replication.models import SyncCheckpoint
+from replication.serializers import SyncAckSerializer
+from replication.sync import SYNC_TABLES, decode_cursor, read_changes
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    Incremental replication for the master server.
+
+    `GET /sync/` returns the minutely, quarterly, monthly and event rows written after the cursor,
+    up to `limit` rows per table, and the cursor of the next call. Without `cursor` the sync resumes
+    from the last position acknowledged by `consumer` (`POST /sync/ack/`). The body is gzip
+    compressed when the client accepts it. Keep calling while `has_more` is true.
+    """
+
+    default_limit = 5000
+    max_limit = 50000
+
+    def list(self, request):
+        params = request.query_params
+        consumer = params.get("consumer", "master")
+
+        try:
+            limit = min(int(params.get("limit", self.default_limit)), self.max_limit)
+        except ValueError:
+            raise serializers.ValidationError({"limit": ["A valid integer is required."]})
+
+        if limit <= 0:
+            raise serializers.ValidationError({"limit": ["Must be greater than zero."]})
+
+        tables = self.get_tables()
+
+        if "cursor" in params:
+            try:
+                positions = decode_cursor(params["cursor"])
+            except ValueError as e:
+                raise serializers.ValidationError({"cursor": [str(e)]})
+        else:
+            checkpoint = SyncCheckpoint.objects.filter(consumer=consumer).first()
+            positions = checkpoint.positions if checkpoint else {}
+
+        content = json.dumps(read_changes(positions, limit, tables), cls=DjangoJSONEncoder).encode()
+        response = HttpResponse(content_type="application/json")
+        response["Vary"] = "Accept-Encoding"
+
+        if "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", ""):
+            content = compress_string(content)
+            response["Content-Encoding"] = "gzip"
+
+        response.content = content
+        return response
+
+    @action(detail=False, methods=["post"])
+    def ack(self, request):
+        serializer = SyncAckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        checkpoint, _ = SyncCheckpoint.objects.get_or_create(consumer=serializer.validated_data["consumer"])
+        checkpoint.positions = {**checkpoint.positions, **serializer.validated_data["cursor"]}
+        checkpoint.save()
+
+        return Response({"consumer": checkpoint.consumer, "acknowledged_at": checkpoint.acknowledged_at})
+
+    def get_tables(self):
+        tables = self.request.query_params.get("tables")
+        if not tables:
+            return list(SYNC_TABLES)
+
+        tables = [table.strip() for table in tables.split(",") if table.strip()]
+        invalid_tables = set(tables) - set(SYNC_TABLES)
+        if invalid_tables:
+            raise serializers.ValidationError({"tables": [f"Unknown tables: {sorted(invalid_tables)}"]})
+
+        return tables
@@ -15,5 +15,8 @@ python3 manage.py migrate
 echo '======= STARTING CRON'
 cron
 
+# Optional high-rate sampler (takes over the minutely collection while it runs)
+# python3 manage.py sample_high_rate >> logs/cron_output.log 2>&1 &
+
 echo '======= RUNNING SERVER'
 python3 manage.py runserver 0.0.0.0:8000
@@ -4,6 +4,7 @@ Generated by 'django-admin startproject' using Django 4.2.1.
 """
 
 import os
+import socket
 from pathlib import Path
 
 import environ
@@ -56,6 +57,8 @@ LOCAL_APPS = [
     "measurement",
     "debouncers",
     "data_collector",
+    "tariff",
+    "replication",
 ]
 
 INSTALLED_APPS = DJANGO_APPS + EXTERNAL_APPS + LOCAL_APPS
@@ -163,6 +166,78 @@ STATICFILES_FINDERS = (
 # ---------------------------------------------------------------------------------------------------------------------
 CONTRACTED_VOLTAGE = float(os.getenv("CONTRACTED_VOLTAGE", 220))
 
+# Blue/green tariffs only have peak and off-peak posts; the white tariff adds the intermediate post
+TARIFF_INTERMEDIATE_POST = env.bool("TARIFF_INTERMEDIATE_POST", default=False)
+# Seconds a process uses its tariff calendar before checking the holidays watermark for admin changes
+TARIFF_CALENDAR_TTL = env.int("TARIFF_CALENDAR_TTL", default=60)
+
+# Master endpoint that receives the measurement outbox (`push_outbox`); empty disables push replication
+REPLICATION_PUSH_URL = env("REPLICATION_PUSH_URL", default="")
+
+# Unix sockets through which the collector publishes each minutely batch to the realtime stream
+REALTIME_SOCKET_DIR = env("REALTIME_SOCKET_DIR", default="/tmp/sige-realtime")
+
+# `sample_high_rate`: seconds between samples, sampled minutely attributes and seconds kept in memory
+HIGH_RATE_INTERVAL = env.float("HIGH_RATE_INTERVAL", default=5)
+HIGH_RATE_ATTRIBUTES = env.list(
+    "HIGH_RATE_ATTRIBUTES",
+    default=["voltage_a", "voltage_b", "voltage_c", "frequency_a", "frequency_b", "frequency_c"],
+)
+HIGH_RATE_RETENTION = env.int("HIGH_RATE_RETENTION", default=15 * 60)
+
+# Minutely deadband: `field=tolerance;field=tolerance` (e.g. `frequency_a=0.05;total_power_factor=0.01`).
+# A value within tolerance of the last stored one is saved as NULL and step-filled when read; a full
+# value is stored at least every DEADBAND_KEYFRAME_MINUTES. Empty disables the policy. Suppression is not
+# recorded: a deadbanded field the meter did not return (NULL) is step-filled too, for up to a keyframe interval.
+MINUTELY_DEADBANDS = env.dict("MINUTELY_DEADBANDS", cast={"value": float}, default={})
+DEADBAND_KEYFRAME_MINUTES = env.int("DEADBAND_KEYFRAME_MINUTES", default=60)
+
+# `pack_minutely_measurements` packs the closed hours of minutely data older than this
+MINUTELY_PACK_AFTER_HOURS = env.int("MINUTELY_PACK_AFTER_HOURS", default=24)
+
+# `archive_measurements` writes the measurements older than MEASUREMENT_ARCHIVE_AFTER_DAYS to Arrow files in
+# this directory; when set, `delete_old_measurements` archives before deleting. Requires pyarrow.
+MEASUREMENT_ARCHIVE_DIR = env("MEASUREMENT_ARCHIVE_DIR", default="")
+MEASUREMENT_ARCHIVE_AFTER_DAYS = env.int("MEASUREMENT_ARCHIVE_AFTER_DAYS", default=30)
+
+# `delete_old_measurements`: days kept per table as `table=days;table=days` (0 keeps forever), merged into the
+# defaults below. Rows are deleted by batches of RETENTION_BATCH_SIZE with RETENTION_PAUSE seconds between them.
+MEASUREMENT_RETENTION = {
+    "minutely": 30,
+    "quarterly": 30,
+    "monthly": 30,
+    "reference": 30,
+    "hourly_rollup": 365,
+    "daily_rollup": 0,
+    "collection_report": 30,
+    **env.dict("MEASUREMENT_RETENTION", cast={"value": int}, default={}),
+}
+RETENTION_BATCH_SIZE = env.int("RETENTION_BATCH_SIZE", default=5000)
+RETENTION_PAUSE = env.float("RETENTION_PAUSE", default=0.5)
+
+# Collector instances sharing this database split the active transductors; an instance whose last
+# `collect_data` run is older than COLLECTOR_INSTANCE_TTL seconds is considered dead
+COLLECTOR_INSTANCE = env("COLLECTOR_INSTANCE", default=socket.gethostname())
+COLLECTOR_INSTANCE_TTL = env.int("COLLECTOR_INSTANCE_TTL", default=180)
+
+# `collect_scheduled` and `collect_data`: worker processes polling the transductors, each one reading up to
+# COLLECTOR_WORKER_CONCURRENCY gateways at a time from an asyncio event loop; 0 polls them from threads of the
+# collector process
+COLLECTOR_PROCESSES = env.int("COLLECTOR_PROCESSES", default=0)
+COLLECTOR_WORKER_CONCURRENCY = env.int("COLLECTOR_WORKER_CONCURRENCY", default=32)
+# `collect_scheduled`: gateway lanes polled at a time, tuned at each run from the duration and failures of the
+# previous ones (`data_collector.autotune`) within these bounds; equal bounds fix it
+COLLECTOR_CONCURRENCY_MIN = env.int("COLLECTOR_CONCURRENCY_MIN", default=2)
+COLLECTOR_CONCURRENCY_MAX = env.int("COLLECTOR_CONCURRENCY_MAX", default=64)
+# Requests on the wire of a gateway endpoint (ip:port) at a time; Modbus TCP to RS-485 gateways serve one
+COLLECTOR_GATEWAY_CONCURRENCY = env.int("COLLECTOR_GATEWAY_CONCURRENCY", default=1)
+# Modbus TCP pipelining per transductor model as `model=depth;model=depth` (e.g. `md30=8`): up to `depth` block
+# requests are in flight on the connection. Overrides the `pipeline_depth` of CONFIG_TRANSDUCTOR (1, disabled)
+MODBUS_PIPELINE_DEPTH = env.dict("MODBUS_PIPELINE_DEPTH", cast={"value": int}, default={})
+# Derive the quarterly measurements from the energy counters read with the minutely data, instead of a separate
+# quarterly collection, for the transductors whose quarterly map has them
+QUARTERLY_FROM_MINUTELY = env.bool("QUARTERLY_FROM_MINUTELY", default=False)
+
 
 # DJANGO REST FRAMEWORK
 # ---------------------------------------------------------------------------------------------------------------------
@@ -172,6 +247,10 @@ REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_FILTER_BACKENDS": ("django_filters.rest_framework.DjangoFilterBackend",),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_RENDERER_CLASSES": (
+        "measurement.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
     "PAGE_SIZE": 60,
 }
 
@@ -7,6 +7,7 @@ from rest_framework.routers import DefaultRouter
 
 from events import urls as events_routes
 from measurement import urls as measurements_routes
+from replication import urls as replication_routes
 from transductor import urls as transductors_routes
 
 router = DefaultRouter()
@@ -14,6 +15,7 @@ router = DefaultRouter()
 router.registry.extend(measurements_routes.router.registry)
 router.registry.extend(transductors_routes.router.registry)
 router.registry.extend(events_routes.router.registry)
+router.registry.extend(replication_routes.router.registry)
 
 urlpatterns = [
     path("", include(router.urls)),
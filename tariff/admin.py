@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from tariff.models import Holiday
+
+
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    list_display = ["date", "name", "active"]
+    list_filter = ("active",)
+    search_fields = ("name",)
+    ordering = ("-date",)
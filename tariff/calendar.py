@@ -0,0 +1,240 @@
+import calendar
+import threading
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from time import monotonic
+from typing import Iterable, Optional
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from data_collector.modbus.settings import (
+    INTERMEDIATE_TIME_END,
+    INTERMEDIATE_TIME_START,
+    ON_PEAK_TIME_END,
+    ON_PEAK_TIME_START,
+    TariffPosts,
+)
+from measurement.watermarks import WATERMARK_HOLIDAY, watermark_version
+from tariff.models import Holiday
+
+SLOT_MINUTES = 15
+SLOT_SECONDS = SLOT_MINUTES * 60
+SLOTS_PER_HOUR = 60 // SLOT_MINUTES
+
+# A measurement is collected at the end of its interval: the 18:00 reading covers 17:45-18:00
+# and is billed in the post of the minute before the collection.
+MEASUREMENT_OFFSET = timedelta(minutes=1)
+
+
+def easter_sunday(year: int) -> date:
+    """Gregorian Easter (anonymous algorithm), the base of the movable holidays."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    weekday_offset = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * weekday_offset) // 451
+    month, day = divmod(h + weekday_offset - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def national_holidays(year: int) -> dict[date, str]:
+    """National holidays billed as off-peak by the distribution companies."""
+    easter = easter_sunday(year)
+    holidays = {
+        date(year, 1, 1): "Confraternização Universal",
+        easter - timedelta(days=47): "Carnaval",
+        easter - timedelta(days=2): "Paixão de Cristo",
+        date(year, 4, 21): "Tiradentes",
+        date(year, 5, 1): "Dia do Trabalho",
+        easter + timedelta(days=60): "Corpus Christi",
+        date(year, 9, 7): "Independência do Brasil",
+        date(year, 10, 12): "Nossa Senhora Aparecida",
+        date(year, 11, 2): "Finados",
+        date(year, 11, 15): "Proclamação da República",
+        date(year, 12, 25): "Natal",
+    }
+
+    if year >= 2024:
+        holidays[date(year, 11, 20)] = "Dia Nacional de Zumbi e da Consciência Negra"
+
+    return holidays
+
+
+def window_slots(start: time, end: time) -> tuple[int, int]:
+    """Slot range [first, last) of a daily window whose `end` is inclusive (e.g. 18:00:00 - 20:59:59)."""
+    first = (start.hour * 60 + start.minute) // SLOT_MINUTES
+    last = (end.hour * 60 + end.minute) // SLOT_MINUTES + 1
+    return first, last
+
+
+class TariffCalendar:
+    """
+    Classifies instants into tariff posts (peak, intermediate, off-peak).
+
+    For each UTC year a lookup table with the post of every 15-minute slot is built once,
+    taking weekends, holidays and the local time zone (including historical DST) into account.
+    Classifying a timestamp is then a single array index, and a NumPy array of timestamps
+    is classified with one vectorized lookup per year.
+    """
+
+    def __init__(
+        self,
+        peak: tuple[time, time] = (ON_PEAK_TIME_START, ON_PEAK_TIME_END),
+        intermediate: Optional[tuple[time, time]] = None,
+        holidays: Optional[Iterable[date]] = None,
+    ):
+        self.peak_slots = window_slots(*peak)
+        self.intermediate_slots = window_slots(*intermediate) if intermediate else None
+        self.holidays = set(holidays) if holidays is not None else None
+        self._tables: dict[int, np.ndarray] = {}
+
+    def get_holidays(self, year: int) -> set[date]:
+        if self.holidays is not None:
+            return {day for day in self.holidays if day.year == year}
+
+        holidays = set(national_holidays(year))
+        for day, active in Holiday.objects.filter(date__year=year).values_list("date", "active"):
+            if active:
+                holidays.add(day)
+            else:
+                holidays.discard(day)
+        return holidays
+
+    def table(self, year: int) -> np.ndarray:
+        """Post of every slot of the UTC year, indexed by (seconds since Jan 1st 00:00 UTC) // 900."""
+        if year not in self._tables:
+            self._tables[year] = self._build_table(year)
+        return self._tables[year]
+
+    def _build_table(self, year: int) -> np.ndarray:
+        start = datetime(year, 1, 1, tzinfo=dt_timezone.utc)
+        hours = (datetime(year + 1, 1, 1, tzinfo=dt_timezone.utc) - start) // timedelta(hours=1)
+
+        # UTC offsets only change on the hour, so one zoneinfo lookup per hour is enough
+        local_timezone = timezone.get_default_timezone()
+        offsets = [(start + timedelta(hours=hour)).astimezone(local_timezone).utcoffset() for hour in range(hours)]
+        offsets = np.repeat(np.array([offset // timedelta(minutes=1) for offset in offsets]), SLOTS_PER_HOUR)
+
+        utc_slots = np.datetime64(f"{year}-01-01T00:00", "m") + np.arange(hours * SLOTS_PER_HOUR) * SLOT_MINUTES
+        local_slots = utc_slots + offsets.astype("timedelta64[m]")
+        local_days = local_slots.astype("datetime64[D]")
+        slot_of_day = (local_slots - local_days).astype("int64") // SLOT_MINUTES
+
+        # 1970-01-01 was a thursday: shifting by 3 makes monday = 0
+        weekday = (local_days.astype("int64") + 3) % 7
+
+        holidays = self.get_holidays(year - 1) | self.get_holidays(year) | self.get_holidays(year + 1)
+        holidays = np.array(sorted(holidays), dtype="datetime64[D]")
+        business_day = (weekday < 5) & ~np.isin(local_days, holidays)
+
+        table = np.full(local_slots.shape, TariffPosts.OFF_PEAK, dtype=np.uint8)
+
+        if self.intermediate_slots:
+            first, last = self.intermediate_slots
+            table[business_day & (slot_of_day >= first) & (slot_of_day < last)] = TariffPosts.INTERMEDIATE
+
+        first, last = self.peak_slots
+        table[business_day & (slot_of_day >= first) & (slot_of_day < last)] = TariffPosts.PEAK
+
+        return table
+
+    def classify(self, instant: datetime) -> int:
+        """Tariff post in force at `instant` (naive values are taken as local time)."""
+        if timezone.is_naive(instant):
+            instant = timezone.make_aware(instant)
+
+        year = instant.astimezone(dt_timezone.utc).year
+        index = int(instant.timestamp() - calendar.timegm((year, 1, 1, 0, 0, 0))) // SLOT_SECONDS
+        return int(self.table(year)[index])
+
+    def classify_many(self, instants) -> np.ndarray:
+        """
+        Vectorized `classify`. Accepts a NumPy datetime64 array (UTC) or an iterable of datetimes
+        and returns an uint8 array of tariff posts.
+        """
+        seconds = self.to_epoch_seconds(instants)
+        years = seconds.astype("datetime64[s]").astype("datetime64[Y]").astype("int64") + 1970
+
+        posts = np.empty(seconds.shape, dtype=np.uint8)
+        for year in np.unique(years):
+            mask = years == year
+            index = (seconds[mask] - calendar.timegm((int(year), 1, 1, 0, 0, 0))) // SLOT_SECONDS
+            posts[mask] = self.table(int(year))[index]
+
+        return posts
+
+    def classify_measurements(self, collection_dates) -> np.ndarray:
+        """Vectorized classification of measurements by their collection date (see MEASUREMENT_OFFSET)."""
+        seconds = self.to_epoch_seconds(collection_dates)
+        return self.classify_many((seconds - MEASUREMENT_OFFSET.seconds).astype("datetime64[s]"))
+
+    @staticmethod
+    def to_epoch_seconds(instants) -> np.ndarray:
+        if isinstance(instants, np.ndarray) and instants.dtype.kind == "M":
+            return instants.astype("datetime64[s]").astype("int64")
+
+        return np.array(
+            [
+                (timezone.make_aware(instant) if timezone.is_naive(instant) else instant).timestamp()
+                for instant in instants
+            ],
+            dtype="float64",
+        ).astype("int64")
+
+
+class CalendarCache:
+    """
+    Process wide calendar, rebuilt when the holidays watermark moves. Every process (the API, the
+    collectors, the high-rate sampler) checks the watermark at most once per TARIFF_CALENDAR_TTL
+    seconds, so a holiday edited in the admin reaches the long-running ones within that delay.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.calendar = None
+        self.version = None
+        self.checked_at = 0.0
+
+    def get(self) -> TariffCalendar:
+        now = monotonic()
+        if self.calendar is not None and now - self.checked_at < settings.TARIFF_CALENDAR_TTL:
+            return self.calendar
+
+        with self.lock:
+            version = watermark_version(WATERMARK_HOLIDAY)
+            if self.calendar is None or version != self.version:
+                self.calendar = build_calendar()
+                self.version = version
+            self.checked_at = now
+            return self.calendar
+
+
+def build_calendar() -> TariffCalendar:
+    """Calendar configured by the project settings."""
+    intermediate = None
+    if settings.TARIFF_INTERMEDIATE_POST:
+        intermediate = (INTERMEDIATE_TIME_START, INTERMEDIATE_TIME_END)
+
+    return TariffCalendar(intermediate=intermediate)
+
+
+_calendar_cache = CalendarCache()
+
+
+def get_calendar() -> TariffCalendar:
+    """Process wide calendar configured by the project settings (see `CalendarCache`)."""
+    return _calendar_cache.get()
+
+
+def reset_calendar() -> None:
+    """Drops the cached lookup tables of this process, e.g. after the holidays table changes."""
+    _calendar_cache.clear()
@@ -0,0 +1,40 @@
+from django.db import models
+from django.utils import timezone
+
+from measurement.watermarks import WATERMARK_HOLIDAY, bump_watermarks
+
+
+class Holiday(models.Model):
+    """
+    Days billed entirely as off-peak. The national holidays are built into the tariff calendar;
+    rows in this table add local holidays or, with `active=False`, cancel a built-in one.
+    """
+
+    date = models.DateField(unique=True)
+    name = models.CharField(max_length=100)
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        ordering = ["date"]
+        verbose_name = "Holiday"
+        verbose_name_plural = "Holidays"
+
+    def __str__(self) -> str:
+        return f"{self.date:%d/%m/%Y} - {self.name}"
+
+    # The other processes rebuild their tariff calendar when they see the bumped watermark
+    def save(self, *args, **kwargs):
+        from tariff.calendar import reset_calendar
+
+        super().save(*args, **kwargs)
+        bump_watermarks(WATERMARK_HOLIDAY)
+        reset_calendar()
+
+    def delete(self, *args, **kwargs):
+        from tariff.calendar import reset_calendar
+
+        result = super().delete(*args, **kwargs)
+        bump_watermarks(WATERMARK_HOLIDAY)
+        reset_calendar()
+        return result
@@ -0,0 +1,125 @@
+import random
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from data_collector.modbus.helpers import get_tariff_post
+from data_collector.modbus.settings import (
+    INTERMEDIATE_TIME_END,
+    INTERMEDIATE_TIME_START,
+    ON_PEAK_TIME_END,
+    ON_PEAK_TIME_START,
+    TariffPosts,
+)
+from measurement.watermarks import WATERMARK_HOLIDAY, bump_watermarks
+from tariff.calendar import (
+    TariffCalendar,
+    easter_sunday,
+    get_calendar,
+    national_holidays,
+    reset_calendar,
+)
+from tariff.models import Holiday
+
+
+class TariffCalendarTestCase(TestCase):
+    def setUp(self):
+        reset_calendar()
+        self.addCleanup(reset_calendar)
+
+    def local(self, *args):
+        return timezone.make_aware(datetime(*args))
+
+    def test_easter_and_movable_holidays(self):
+        self.assertEqual(date(2023, 4, 9), easter_sunday(2023))
+        self.assertEqual(date(2024, 3, 31), easter_sunday(2024))
+
+        holidays = national_holidays(2023)
+        self.assertIn(date(2023, 2, 21), holidays)  # carnaval
+        self.assertIn(date(2023, 4, 7), holidays)  # paixão de cristo
+        self.assertIn(date(2023, 6, 8), holidays)  # corpus christi
+        self.assertNotIn(date(2023, 11, 20), holidays)
+        self.assertIn(date(2024, 11, 20), national_holidays(2024))
+
+    def test_classify_business_day_weekend_and_holiday(self):
+        calendar = get_calendar()
+
+        # 05/06/2023 is a monday
+        self.assertEqual(TariffPosts.PEAK, calendar.classify(self.local(2023, 6, 5, 18, 0)))
+        self.assertEqual(TariffPosts.PEAK, calendar.classify(self.local(2023, 6, 5, 20, 59)))
+        self.assertEqual(TariffPosts.OFF_PEAK, calendar.classify(self.local(2023, 6, 5, 21, 0)))
+        self.assertEqual(TariffPosts.OFF_PEAK, calendar.classify(self.local(2023, 6, 5, 17, 59)))
+        self.assertEqual(TariffPosts.OFF_PEAK, calendar.classify(self.local(2023, 6, 10, 19, 0)))  # saturday
+        self.assertEqual(TariffPosts.OFF_PEAK, calendar.classify(self.local(2023, 4, 21, 19, 0)))  # tiradentes
+
+    def test_get_tariff_post_uses_minute_before_collection(self):
+        self.assertEqual(TariffPosts.OFF_PEAK, get_tariff_post(self.local(2023, 6, 5, 18, 0)))
+        self.assertEqual(TariffPosts.PEAK, get_tariff_post(self.local(2023, 6, 5, 21, 0)))
+        self.assertEqual(TariffPosts.PEAK, get_tariff_post(self.local(2023, 6, 5, 19, 0).astimezone(ZoneInfo("UTC"))))
+
+    @override_settings(TARIFF_INTERMEDIATE_POST=True)
+    def test_intermediate_post(self):
+        reset_calendar()
+        calendar = get_calendar()
+
+        self.assertEqual(TariffPosts.INTERMEDIATE, calendar.classify(self.local(2023, 6, 5, 17, 30)))
+        self.assertEqual(TariffPosts.PEAK, calendar.classify(self.local(2023, 6, 5, 19, 0)))
+        self.assertEqual(TariffPosts.INTERMEDIATE, calendar.classify(self.local(2023, 6, 5, 21, 45)))
+        self.assertEqual(TariffPosts.OFF_PEAK, calendar.classify(self.local(2023, 6, 5, 22, 0)))
+        self.assertEqual(TariffPosts.OFF_PEAK, calendar.classify(self.local(2023, 6, 10, 17, 30)))
+
+    def test_holiday_table_adds_and_cancels_holidays(self):
+        monday = self.local(2023, 6, 5, 19, 0)
+        corpus_christi = self.local(2023, 6, 8, 19, 0)
+
+        Holiday.objects.create(date=date(2023, 6, 5), name="Aniversário da cidade")
+        Holiday.objects.create(date=date(2023, 6, 8), name="Corpus Christi", active=False)
+
+        self.assertEqual(TariffPosts.OFF_PEAK, get_calendar().classify(monday))
+        self.assertEqual(TariffPosts.PEAK, get_calendar().classify(corpus_christi))
+
+    @override_settings(TARIFF_CALENDAR_TTL=0)
+    def test_holiday_edits_reach_other_processes_through_the_watermark(self):
+        monday = self.local(2023, 6, 5, 19, 0)
+        self.assertEqual(TariffPosts.PEAK, get_calendar().classify(monday))
+
+        # saved by another process: this one only sees the holidays watermark move
+        Holiday.objects.bulk_create([Holiday(date=date(2023, 6, 5), name="Aniversário da cidade")])
+        self.assertEqual(TariffPosts.PEAK, get_calendar().classify(monday))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_watermarks(WATERMARK_HOLIDAY)
+        self.assertEqual(TariffPosts.OFF_PEAK, get_calendar().classify(monday))
+
+    def test_classify_many_matches_local_time_rules(self):
+        local_timezone = timezone.get_default_timezone()
+        calendar = TariffCalendar(
+            intermediate=(INTERMEDIATE_TIME_START, INTERMEDIATE_TIME_END),
+            holidays=[day for year in range(2016, 2026) for day in national_holidays(year)],
+        )
+
+        # covers the years with daylight saving time in São Paulo (until 2019)
+        start = datetime(2017, 1, 1, tzinfo=ZoneInfo("UTC"))
+        rng = random.Random(42)
+        instants = [start + timedelta(minutes=rng.randrange(8 * 365 * 24 * 60)) for _ in range(5000)]
+
+        expected = []
+        for instant in instants:
+            local = instant.astimezone(local_timezone)
+            business_day = local.weekday() < 5 and local.date() not in calendar.get_holidays(local.year)
+
+            if business_day and ON_PEAK_TIME_START <= local.time() <= ON_PEAK_TIME_END:
+                expected.append(TariffPosts.PEAK)
+            elif business_day and INTERMEDIATE_TIME_START <= local.time() <= INTERMEDIATE_TIME_END:
+                expected.append(TariffPosts.INTERMEDIATE)
+            else:
+                expected.append(TariffPosts.OFF_PEAK)
+
+        self.assertEqual(expected, calendar.classify_many(instants).tolist())
+
+        as_numpy = np.array([instant.replace(tzinfo=None) for instant in instants], dtype="datetime64[s]")
+        self.assertEqual(expected, calendar.classify_many(as_numpy).tolist())
+        self.assertEqual(expected[:50], [calendar.classify(instant) for instant in instants[:50]])
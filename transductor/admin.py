@@ -20,6 +20,7 @@ class TransductorAdmin(admin.ModelAdmin):
         "serial_number",
         "ip_address",
         "port",
+        "slave_id",
         "installation_date",
         "active",
         "broken",
@@ -1,9 +1,11 @@
+import ast
 import datetime
 
 from django.db import models
 from django.utils import timezone
 
-from data_collector.modbus.data_reader import ModbusDataReader
+from data_collector.modbus.data_reader import create_reader
+from data_collector.modbus.helpers import default_slave_id, pipeline_depth
 from data_collector.models import MemoryMap
 from debouncers.data_classes import VoltageState
 from debouncers.debouncers import VoltageEventDebouncer
@@ -17,8 +19,10 @@ class Transductor(models.Model):
 
     id = models.IntegerField(primary_key=True)
     serial_number = models.CharField(max_length=8, unique=True)
-    ip_address = models.GenericIPAddressField(unique=True, protocol="IPv4")
+    ip_address = models.GenericIPAddressField(protocol="IPv4")
     port = models.PositiveIntegerField()
+    # transductors behind a Modbus TCP gateway share its endpoint and differ by slave id
+    slave_id = models.PositiveSmallIntegerField(null=True, blank=True)
     model = models.CharField(max_length=50, blank=False, null=False)
     active = models.BooleanField(default=True)
     broken = models.BooleanField(default=False)
@@ -32,21 +36,63 @@ class Transductor(models.Model):
     last_clock_battery_change = models.DateTimeField(blank=True, default=timezone.now)
     memory_map = models.ForeignKey(MemoryMap, on_delete=models.DO_NOTHING, related_name="+")
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["ip_address", "port", "slave_id"], name="unique_transductor_endpoint")
+        ]
+
     def __str__(self) -> str:
         return f"{self.ip_address} - {self.model}"
 
-    def collect_data(self, data_group, slave_id):
-        register_map = getattr(self.memory_map, data_group)
+    @property
+    def modbus_slave_id(self) -> int:
+        return self.slave_id if self.slave_id is not None else default_slave_id(self.model)
 
-        collector = ModbusDataReader(
-            ip_address=self.ip_address,
-            port=self.port,
-            slave_id=slave_id,
-        )
+    @property
+    def pipeline_depth(self) -> int:
+        return pipeline_depth(self.model)
+
+    def save(self, *args, **kwargs):
+        from measurement.watermarks import WATERMARK_TRANSDUCTOR, bump_watermarks
+
+        if self.slave_id is None:
+            self.slave_id = default_slave_id(self.model)
+        super().save(*args, **kwargs)
+        bump_watermarks(WATERMARK_TRANSDUCTOR)
+
+    def delete(self, *args, **kwargs):
+        from measurement.watermarks import WATERMARK_TRANSDUCTOR, bump_watermarks
+
+        deleted = super().delete(*args, **kwargs)
+        bump_watermarks(WATERMARK_TRANSDUCTOR)
+        return deleted
+
+    def collect_data(self, data_group, slave_id=None, reader=None):
+        """
+        Reads the registers of `data_group`. A `reader` connected to the gateway of the transductor
+        is reused, and closed on failure so the next slave starts on a clean connection.
+        """
+        register_map = getattr(self.memory_map, data_group)
+        slave_id = self.modbus_slave_id if slave_id is None else slave_id
 
         modbus_data = {"collected": {}, "erros": "", "broken": self.broken}
         try:
-            collected_data = collector.read_datagroup_blocks(register_map)
+            if reader is None:
+                collector = create_reader(
+                    ip_address=self.ip_address,
+                    port=self.port,
+                    slave_id=slave_id,
+                    pipeline_depth=self.pipeline_depth,
+                )
+                collected_data = collector.read_datagroup_blocks(register_map)
+            else:
+                try:
+                    reader.connect()
+                    collected_data = reader.read_blocks(register_map, slave_id)
+                except Exception:
+                    reader.close()
+                    raise
+
             collected_data["transductor"] = self.id
             modbus_data["collected"] = collected_data
 
@@ -194,6 +240,9 @@ class Transductor(models.Model):
                         "voltage_c": None,
                     }
                     last_event.data = data
+                elif isinstance(last_event.data, str):
+                    # `data` is a TextField: a saved event gives back the repr of the phases dict
+                    last_event.data = ast.literal_eval(last_event.data)
 
                 last_event.data[measurement_phase] = None
 
@@ -216,6 +265,8 @@ class Transductor(models.Model):
                     "voltage_c": None,
                 }
                 event.data = data
+            elif isinstance(event.data, str):
+                event.data = ast.literal_eval(event.data)
 
             event.data[measurement_phase] = measurements_value
             event.save()
@@ -3,9 +3,10 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.reverse import reverse
 
-from data_collector.modbus.helpers import reader_csv_file
+from data_collector.modbus.helpers import default_slave_id, reader_csv_file
 from data_collector.modbus.settings import CSV_DIR_PATH
 from data_collector.models import MemoryMap
+from measurement.fast import ValuesSerializer
 from transductor.models import Transductor
 from transductor.validators import validate_csv_file
 
@@ -24,6 +25,7 @@ class TransductorSerializer(serializers.ModelSerializer):
             "serial_number",
             "ip_address",
             "port",
+            "slave_id",
             "physical_location",
             "geolocation_latitude",
             "geolocation_longitude",
@@ -63,10 +65,26 @@ class TransductorSerializer(serializers.ModelSerializer):
         csv_data = reader_csv_file(csv_file_path)
 
         validate_csv_file(csv_data)
+        self.validate_endpoint(attrs)
 
         attrs["csv_data"] = csv_data
         return super().validate(attrs)
 
+    def validate_endpoint(self, attrs):
+        """Transductors may share a gateway (ip and port) but not its slave id."""
+        if attrs.get("slave_id") is None:
+            attrs["slave_id"] = default_slave_id(attrs.get("model"))
+
+        endpoint = {
+            field: attrs.get(field, getattr(self.instance, field, None))
+            for field in ("ip_address", "port", "slave_id")
+        }
+        duplicates = Transductor.objects.filter(**endpoint)
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise ValidationError({"slave_id": "Já existe um transdutor com este IP, porta e slave id."})
+
     def create(self, validated_data):
         id = validated_data.get("id")
         if Transductor.objects.filter(id=id).exists():
@@ -89,6 +107,48 @@ class TransductorSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class TransductorValuesSerializer(ValuesSerializer):
+    """
+    Same output as `TransductorSerializer`. Each related URL is reversed once per response with a
+    placeholder pk, instead of four `reverse()` calls per transductor.
+    """
+
+    serializer_class = TransductorSerializer
+    extra_source_fields = ("id",)
+    url_names = {
+        "memory_map_url": "transductor-memorymap",
+        "minutely_measurement_url": "transductor-minutely",
+        "quarterly_measurement_url": "transductor-quarterly",
+        "monthly_measurement_url": "transductor-monthly",
+    }
+    pk_placeholder = "__pk__"
+
+    def __init__(self, context=None):
+        super().__init__(context)
+        request = self.context.get("request")
+
+        self.url_templates = {}
+        for field, name in self.url_names.items():
+            if request is not None:
+                self.url_templates[field] = reverse(name, kwargs={"pk": self.pk_placeholder}, request=request)
+
+    def get_url(self, field, row):
+        template = self.url_templates.get(field)
+        return template.replace(self.pk_placeholder, str(row.id)) if template else None
+
+    def get_memory_map_url(self, row):
+        return self.get_url("memory_map_url", row)
+
+    def get_minutely_measurement_url(self, row):
+        return self.get_url("minutely_measurement_url", row)
+
+    def get_quarterly_measurement_url(self, row):
+        return self.get_url("quarterly_measurement_url", row)
+
+    def get_monthly_measurement_url(self, row):
+        return self.get_url("monthly_measurement_url", row)
+
+
 class ActiveTransductorsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transductor
@@ -5,24 +5,34 @@ from rest_framework.response import Response
 
 from data_collector.modbus.settings import CSV_DIR_PATH
 from data_collector.serializers import MemoryMapSerializer
-from measurement.models import MinutelyMeasurement, QuarterlyMeasurement
+from measurement.downsampling import downsampled_measurements
+from measurement.fast import FastReadMixin
+from measurement.filters import MinutelyMeasurementFilter
+from measurement.models import (
+    MinutelyMeasurementHistory,
+    MonthlyTariffRollup,
+    QuarterlyMeasurement,
+)
+from measurement.pagination import MeasurementCursorPagination
+from measurement.rollups import monthly_tariff_summary
 from measurement.serializers import (
-    MinutelyMeasurementSerializer,
+    MinutelyMeasurementValuesSerializer,
     MonthlyListMeasurementSerializer,
-    QuarterlyListMeasurementSerializer,
+    QuarterlyListMeasurementValuesSerializer,
 )
-from measurement.views import MonthlyMeasurementViewSet
 from transductor.models import Transductor
 from transductor.serializers import (
     ActiveTransductorsSerializer,
     BrokenTransductorsSerializer,
     TransductorSerializer,
+    TransductorValuesSerializer,
 )
 
 
-class TransductorViewSet(viewsets.ModelViewSet):
+class TransductorViewSet(FastReadMixin, viewsets.ModelViewSet):
     queryset = Transductor.objects.all().order_by("-id")
     serializer_class = TransductorSerializer
+    fast_serializer_class = TransductorValuesSerializer
 
     def create(self, request, *args, **kwargs):
         model = request.data.get("model")
@@ -65,23 +75,31 @@ class TransductorViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["get"], url_path="minutely-measurements")
     def minutely(self, request, pk=None):
         transductor = get_object_or_404(Transductor, pk=pk)
-        measurements = MinutelyMeasurement.objects.filter(transductor=transductor)[:100]
-        serializer = MinutelyMeasurementSerializer(measurements, many=True)
-        return Response(serializer.data)
+        measurements = MinutelyMeasurementHistory.objects.filter(transductor=transductor)
+
+        filtered = MinutelyMeasurementFilter(request.query_params, queryset=measurements).qs
+        downsampled = downsampled_measurements(filtered, request.query_params, transductor=transductor)
+        if downsampled is not None:
+            return Response(downsampled)
+
+        return self.paginated_measurements(filtered, MinutelyMeasurementValuesSerializer)
 
     @action(detail=True, methods=["get"], url_path="quarterly-measurements")
     def quarterly(self, request, pk=None):
         transductor = get_object_or_404(Transductor, pk=pk)
-        measurements = QuarterlyMeasurement.objects.filter(transductor=transductor)[:100]
-        serializer = QuarterlyListMeasurementSerializer(measurements, many=True)
-        return Response(serializer.data)
+        measurements = QuarterlyMeasurement.objects.filter(transductor=transductor)
+        return self.paginated_measurements(measurements, QuarterlyListMeasurementValuesSerializer)
+
+    def paginated_measurements(self, measurements, values_serializer_class):
+        serializer = values_serializer_class(context=self.get_serializer_context())
+        paginator = MeasurementCursorPagination()
+        page = paginator.paginate_queryset(serializer.rows(measurements), self.request, view=self)
+        return paginator.get_paginated_response(serializer.many(page))
 
     @action(detail=True, methods=["get"], url_path="monthly-measurements")
     def monthly(self, request, pk=None):
         transductor = get_object_or_404(Transductor, pk=pk)
-        monthly_measurement_view = MonthlyMeasurementViewSet()
-        queryset = monthly_measurement_view.get_queryset()
-        measurements = queryset.filter(transductor=transductor)
+        measurements = monthly_tariff_summary(MonthlyTariffRollup.objects.filter(transductor=transductor))
         serializer = MonthlyListMeasurementSerializer(measurements, many=True)
         return Response(serializer.data)
 